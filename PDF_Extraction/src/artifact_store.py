@@ -0,0 +1,396 @@
+"""보고서별 묶음 산출물 저장소 (선택 기능).
+
+structured_extract/table_ocr/figure_ocr/table_diff가 만든 page_XXXX 폴더의 작은 파일 수천 개를
+보고서당 몇 개의 파일로 묶는다 (`<report>/artifacts/`).
+  - pages.parquet        : 페이지별 page.json 원문
+  - tables.parquet       : 표 메타/구조 JSON(셀 제외)/diff
+  - table_cells.parquet  : 표 셀 (열 단위 저장)
+  - ocr_tokens.parquet   : 표 OCR/PDF 텍스트 토큰
+  - figures.parquet      : 그림 설명(desc.md)
+  - images.zip           : 페이지/표/그림 PNG와 GPT용 압축본(*.gpt.webp 등) (이미 압축된 형식이라 무압축 저장, zip 목차가 경로 색인)
+  - bundle.json          : 묶을 때의 page_XXXX 폴더 지문 (파일 경로/크기/mtime)
+
+하위 단계는 `ReportArtifacts`로 읽는다. 묶음이 있으면 묶음에서, 없으면(또는 pyarrow 미설치) 기존 폴더 구조에서
+같은 형태(PageArtifact)로 돌려주므로 두 형식을 구분하지 않아도 된다.
+재실행/manifest는 폴더 구조를 기준으로 하므로 묶음은 추출 단계가 모두 끝난 뒤 만든다. 묶은 뒤 폴더가 바뀌었으면
+(지문 불일치) 묶음이 오래된 것으로 보고 폴더에서 읽는다.
+
+Usage:
+    python src/artifact_store.py --structured-dir data/pages_structured/2023_HDEC_Report
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import zipfile
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+from image_variants import find_variant
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_STRUCTURED_DIR = REPO_ROOT / "data" / "pages_structured"
+ARTIFACT_DIR = "artifacts"
+IMAGE_ARCHIVE = "images.zip"
+BUNDLE_INFO = "bundle.json"
+PARQUET_FILES = ("pages", "tables", "table_cells", "ocr_tokens", "figures")
+CELL_FIELDS = ("row", "col", "text", "row_span", "col_span", "row_header", "column_header")
+
+
+@dataclass
+class TableArtifact:
+    meta: Dict[str, Any]
+    data: Optional[Dict[str, Any]] = None
+    diff: Optional[Dict[str, Any]] = None
+    ocr_tokens: Optional[List[Dict[str, Any]]] = None
+
+    @property
+    def id(self) -> str:
+        return self.meta.get("id")
+
+
+@dataclass
+class FigureArtifact:
+    meta: Dict[str, Any]
+    description: Optional[str] = None
+
+    @property
+    def id(self) -> str:
+        return self.meta.get("id")
+
+
+@dataclass
+class PageArtifact:
+    page_no: int
+    meta: Dict[str, Any]
+    tables: List[TableArtifact] = field(default_factory=list)
+    figures: List[FigureArtifact] = field(default_factory=list)
+
+
+def _read_json(path: Path) -> Any:
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return None
+
+
+def _read_text(path: Path) -> Optional[str]:
+    if path.exists():
+        return path.read_text(encoding="utf-8")
+    return None
+
+
+def _dumps(value: Any) -> Optional[str]:
+    return None if value is None else json.dumps(value, ensure_ascii=False)
+
+
+def _loads(value: Optional[str]) -> Any:
+    return None if value is None else json.loads(value)
+
+
+def read_page_dir(report_root: Path, page_dir: Path) -> Optional[PageArtifact]:
+    """page_XXXX 폴더 하나를 PageArtifact로 읽는다 (page.json이 없으면 None)."""
+    meta = _read_json(page_dir / "page.json")
+    if meta is None:
+        return None
+
+    tables_dir = page_dir / "tables"
+    tables: List[TableArtifact] = []
+    for tbl_meta in meta.get("tables", []):
+        table_id = tbl_meta.get("id")
+        data = None
+        ocr_path = tbl_meta.get("ocr_path")
+        # VLM 재파싱 결과(.vlm.json)가 있으면 그것을 표 구조의 기준으로 삼는다.
+        if ocr_path and ocr_path.endswith(".vlm.json"):
+            vlm_path = report_root / ocr_path
+            if vlm_path.exists():
+                print(f"    [Info] Using VLM result for table {table_id}")
+                data = _read_json(vlm_path)
+            else:
+                print(f"    [Warn] VLM path {vlm_path} missing, falling back to Docling.")
+        if data is None:
+            data = _read_json(tables_dir / f"{table_id}.json")
+        ocr_tokens = None
+        if ocr_path and not ocr_path.endswith(".vlm.json"):
+            ocr_tokens = _read_json(report_root / ocr_path)
+        tables.append(
+            TableArtifact(
+                meta=tbl_meta,
+                data=data,
+                diff=_read_json(tables_dir / f"{table_id}.diff.json"),
+                ocr_tokens=ocr_tokens,
+            )
+        )
+
+    figures_dir = page_dir / "figures"
+    figures = [
+        FigureArtifact(meta=fig_meta, description=_read_text(figures_dir / f"{fig_meta.get('id')}.desc.md"))
+        for fig_meta in meta.get("figures", [])
+    ]
+    return PageArtifact(page_no=meta.get("page_number"), meta=meta, tables=tables, figures=figures)
+
+
+def iter_page_dirs(report_root: Path) -> List[Path]:
+    return sorted(d for d in report_root.iterdir() if d.is_dir() and d.name.startswith("page_"))
+
+
+def source_fingerprint(report_root: Path) -> str:
+    """page_XXXX 폴더 안 모든 파일의 (상대 경로, 크기, mtime)으로 만든 지문. 내용을 읽지 않아 빠르다."""
+    digest = hashlib.sha1()
+    for page_dir in iter_page_dirs(report_root):
+        for path in sorted(page_dir.rglob("*")):
+            if not path.is_file():
+                continue
+            stat = path.stat()
+            entry = f"{path.relative_to(report_root).as_posix()}|{stat.st_size}|{stat.st_mtime_ns}\n"
+            digest.update(entry.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def collect_image_paths(page: PageArtifact) -> List[str]:
+    rel_paths = [page.meta.get("page_image_path")]
+    rel_paths.extend(table.meta.get("image_path") for table in page.tables)
+    rel_paths.extend(figure.meta.get("image_path") for figure in page.figures)
+    return [rel for rel in dict.fromkeys(rel_paths) if rel]
+
+
+def _write_parquet(rows: List[Dict[str, Any]], path: Path) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    pq.write_table(pa.Table.from_pylist(rows), tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+
+def pack_report(report_root: Path) -> Path:
+    """page_XXXX 폴더 산출물을 artifacts/ 아래 Parquet 5개 + images.zip으로 묶는다."""
+    if not HAS_PYARROW:
+        raise RuntimeError("pyarrow가 설치되어 있지 않아 묶음 산출물을 만들 수 없습니다. (pip install pyarrow)")
+
+    store_dir = report_root / ARTIFACT_DIR
+    store_dir.mkdir(parents=True, exist_ok=True)
+    # 묶는 도중 중단되면 지문이 없어 읽는 쪽이 폴더로 돌아가도록 지문을 먼저 지우고 마지막에 쓴다.
+    info_path = store_dir / BUNDLE_INFO
+    if info_path.exists():
+        info_path.unlink()
+    fingerprint = source_fingerprint(report_root)
+    rows: Dict[str, List[Dict[str, Any]]] = {name: [] for name in PARQUET_FILES}
+
+    archive_path = store_dir / IMAGE_ARCHIVE
+    archive_tmp = archive_path.with_name(archive_path.name + ".tmp")
+    page_count = image_count = 0
+    with zipfile.ZipFile(archive_tmp, "w", compression=zipfile.ZIP_STORED) as archive:
+        for page_dir in iter_page_dirs(report_root):
+            page = read_page_dir(report_root, page_dir)
+            if page is None:
+                continue
+            page_count += 1
+            rows["pages"].append({"page_number": page.page_no, "page_json": _dumps(page.meta)})
+
+            for table_index, table in enumerate(page.tables, start=1):
+                data = dict(table.data) if table.data else None
+                cells = data.pop("cells", None) if data else None
+                rows["tables"].append(
+                    {
+                        "page_number": page.page_no,
+                        "table_index": table_index,
+                        "table_id": table.id,
+                        "table_json": _dumps(data),
+                        "has_cells": cells is not None,
+                        "diff_json": _dumps(table.diff),
+                        "has_ocr_tokens": table.ocr_tokens is not None,
+                    }
+                )
+                for row in cells or []:
+                    for cell in row:
+                        cell_row = {"page_number": page.page_no, "table_index": table_index}
+                        cell_row.update({key: cell.get(key) for key in CELL_FIELDS})
+                        rows["table_cells"].append(cell_row)
+                for token_index, token in enumerate(table.ocr_tokens or []):
+                    rows["ocr_tokens"].append(
+                        {
+                            "page_number": page.page_no,
+                            "table_index": table_index,
+                            "token_index": token_index,
+                            "text": token.get("text"),
+                            "box": token.get("box"),
+                        }
+                    )
+
+            for figure_index, figure in enumerate(page.figures, start=1):
+                rows["figures"].append(
+                    {
+                        "page_number": page.page_no,
+                        "figure_index": figure_index,
+                        "figure_id": figure.id,
+                        "description": figure.description,
+                    }
+                )
+
+            for rel_path in collect_image_paths(page):
+                image_path = report_root / rel_path
+                if image_path.exists():
+                    archive.write(image_path, arcname=rel_path)
+                    image_count += 1
+                variant = find_variant(image_path)
+                if variant is not None:
+                    archive.write(variant, arcname=str(variant.relative_to(report_root)))
+    os.replace(archive_tmp, archive_path)
+
+    for name in PARQUET_FILES:
+        _write_parquet(rows[name], store_dir / f"{name}.parquet")
+    info_tmp = info_path.with_name(info_path.name + ".tmp")
+    info_tmp.write_text(json.dumps({"source_fingerprint": fingerprint}), encoding="utf-8")
+    os.replace(info_tmp, info_path)
+    print(
+        f"📦 [Pack] {page_count}페이지, 표 {len(rows['tables'])}개(셀 {len(rows['table_cells'])}개), "
+        f"그림 {len(rows['figures'])}개, 이미지 {image_count}개 -> {store_dir}"
+    )
+    return store_dir
+
+
+class ReportArtifacts:
+    """보고서 산출물 읽기 API. 최신 묶음(artifacts/)이 있으면 묶음에서, 없으면 page_XXXX 폴더에서 읽는다."""
+
+    def __init__(self, report_root: Path, prefer_packed: bool = True):
+        self.root = report_root
+        self.store_dir = report_root / ARTIFACT_DIR
+        self.packed = (
+            prefer_packed
+            and HAS_PYARROW
+            and all((self.store_dir / f"{name}.parquet").exists() for name in PARQUET_FILES)
+            and self.is_fresh()
+        )
+        self._archive: Optional[zipfile.ZipFile] = None
+
+    def is_fresh(self) -> bool:
+        """묶음 이후 page_XXXX 폴더가 바뀌지 않았으면 True. 폴더가 없으면(묶음만 남긴 경우) 묶음을 믿는다."""
+        info = _read_json(self.store_dir / BUNDLE_INFO) or {}
+        if not iter_page_dirs(self.root):
+            return True
+        if info.get("source_fingerprint") == source_fingerprint(self.root):
+            return True
+        print(f"⚠️ 묶음 산출물이 page_XXXX 폴더보다 오래되어 폴더에서 읽습니다: {self.store_dir}")
+        return False
+
+    def iter_pages(self) -> Iterator[PageArtifact]:
+        if not self.packed:
+            for page_dir in iter_page_dirs(self.root):
+                page = read_page_dir(self.root, page_dir)
+                if page is not None:
+                    yield page
+            return
+        yield from self._iter_packed_pages()
+
+    def _read_rows(self, name: str) -> List[Dict[str, Any]]:
+        return pq.read_table(self.store_dir / f"{name}.parquet").to_pylist()
+
+    def _iter_packed_pages(self) -> Iterator[PageArtifact]:
+        cells_by_table: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+        for cell in self._read_rows("table_cells"):
+            cells_by_table[(cell["page_number"], cell["table_index"])].append(cell)
+        tokens_by_table: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+        for token in self._read_rows("ocr_tokens"):
+            tokens_by_table[(token["page_number"], token["table_index"])].append(token)
+        tables_by_page: Dict[int, Dict[int, Dict[str, Any]]] = defaultdict(dict)
+        for table in self._read_rows("tables"):
+            tables_by_page[table["page_number"]][table["table_index"]] = table
+        descriptions: Dict[tuple, Optional[str]] = {
+            (figure["page_number"], figure["figure_index"]): figure["description"]
+            for figure in self._read_rows("figures")
+        }
+
+        for page_row in sorted(self._read_rows("pages"), key=lambda row: row["page_number"]):
+            page_no = page_row["page_number"]
+            meta = _loads(page_row["page_json"])
+            tables: List[TableArtifact] = []
+            for table_index, tbl_meta in enumerate(meta.get("tables", []), start=1):
+                key = (page_no, table_index)
+                table_row = tables_by_page[page_no].get(table_index) or {}
+                data = _loads(table_row.get("table_json"))
+                if data is not None and table_row.get("has_cells"):
+                    data["cells"] = _cells_to_grid(cells_by_table.get(key, []))
+                tokens = None
+                if table_row.get("has_ocr_tokens"):
+                    ordered = sorted(tokens_by_table.get(key, []), key=lambda token: token["token_index"])
+                    tokens = [{"text": token["text"], "box": token["box"]} for token in ordered]
+                tables.append(
+                    TableArtifact(
+                        meta=tbl_meta,
+                        data=data,
+                        diff=_loads(table_row.get("diff_json")),
+                        ocr_tokens=tokens,
+                    )
+                )
+            figures = [
+                FigureArtifact(meta=fig_meta, description=descriptions.get((page_no, figure_index)))
+                for figure_index, fig_meta in enumerate(meta.get("figures", []), start=1)
+            ]
+            yield PageArtifact(page_no=page_no, meta=meta, tables=tables, figures=figures)
+
+    def read_image(self, rel_path: str) -> Optional[bytes]:
+        """page.json에 적힌 상대 경로로 이미지 바이트를 읽는다 (묶음이면 images.zip에서)."""
+        if not rel_path:
+            return None
+        if self.packed:
+            if self._archive is None:
+                self._archive = zipfile.ZipFile(self.store_dir / IMAGE_ARCHIVE)
+            try:
+                return self._archive.read(rel_path)
+            except KeyError:
+                return None
+        path = self.root / rel_path
+        return path.read_bytes() if path.exists() else None
+
+    def close(self) -> None:
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+
+
+def _cells_to_grid(cells: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    grid: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    for cell in sorted(cells, key=lambda item: (item["row"], item["col"])):
+        grid[cell["row"]].append({key: cell[key] for key in CELL_FIELDS})
+    return [grid[row] for row in sorted(grid)]
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="page_XXXX 폴더 산출물을 보고서별 Parquet + 이미지 zip 묶음으로 만든다.",
+    )
+    parser.add_argument(
+        "--structured-dir",
+        type=Path,
+        default=DEFAULT_STRUCTURED_DIR,
+        help="보고서 구조화 폴더 (page_XXXX 폴더가 있는 경로).",
+    )
+    return parser
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+
+    report_root = args.structured_dir.resolve()
+    if not report_root.exists():
+        parser.error(f"구조화 폴더를 찾을 수 없습니다: {report_root}")
+    if not HAS_PYARROW:
+        print("⚠️ pyarrow가 설치되어 있지 않아 묶음을 만들지 않습니다. 하위 단계는 폴더 구조를 그대로 읽습니다.")
+        return 1
+
+    pack_report(report_root)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,332 @@
+"""여러 ESG 보고서 PDF를 한 번에 처리하는 배치 적재 스크립트.
+
+입력 폴더의 PDF를 SQLite 작업 테이블에 등록하고, N개의 워커 스레드가 보고서를 동시에 처리한다.
+보고서마다 `run_pipeline.build_stages()`와 같은 단계 구성을 쓰되 단계는 별도 프로세스로 실행하고,
+단계의 자원 종류(cpu: Docling/OCR, gpt: 그림 설명, db: MySQL 적재)별 세마포어로 동시 실행 수를 제한한다.
+
+작업 상태(pending/running/done/failed)와 단계별 소요 시간은 작업 테이블에 남는다.
+중단 후 같은 명령을 다시 실행하면 끝나지 않은 보고서부터 이어서 처리한다.
+
+예시:
+    python src/batch_ingest.py --input-dir data/input --workers 4 --cpu-slots 2 --gpt-slots 4 --load-db
+    python src/batch_ingest.py --status
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from run_pipeline import (
+    STAGE_RESOURCES,
+    Stage,
+    build_arg_parser as build_pipeline_arg_parser,
+    build_stages,
+    resolve_page_selection,
+    stage_command,
+    topological_order,
+)
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_INPUT_DIR = REPO_ROOT / "data" / "input"
+DEFAULT_JOB_DB = REPO_ROOT / "data" / "batch_jobs.sqlite3"
+DEFAULT_LOG_DIR = REPO_ROOT / "logs" / "batch_ingest"
+PAGES_STRUCTURED_DIR = REPO_ROOT / "data" / "pages_structured"
+JOB_STATUSES = ("pending", "running", "done", "failed")
+
+JOB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pdf_path TEXT NOT NULL UNIQUE,
+    doc_name TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    current_stage TEXT,
+    stage_seconds TEXT NOT NULL DEFAULT '{}',
+    error TEXT,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+)
+"""
+
+
+class JobStore:
+    """SQLite 작업 테이블. 워커 스레드가 공유하므로 모든 쿼리를 하나의 락으로 직렬화한다."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(JOB_SCHEMA)
+
+    def enqueue(self, pdf_path: Path, doc_name: str) -> bool:
+        """이미 등록된 PDF는 건너뛰고, 새로 등록했으면 True."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (pdf_path, doc_name, enqueued_at) VALUES (?, ?, ?)",
+                (str(pdf_path), doc_name, time.time()),
+            )
+        return cursor.rowcount > 0
+
+    def recover_interrupted(self) -> int:
+        """이전 실행이 중단되어 running으로 남은 작업을 pending으로 되돌린다."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'pending', current_stage = NULL WHERE status = 'running'"
+            )
+        return cursor.rowcount
+
+    def retry_failed(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("UPDATE jobs SET status = 'pending', error = NULL WHERE status = 'failed'")
+        return cursor.rowcount
+
+    def claim(self) -> Optional[sqlite3.Row]:
+        """가장 먼저 등록된 pending 작업 하나를 running으로 바꿔 돌려준다."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, current_stage = NULL, "
+                "stage_seconds = '{}', error = NULL, started_at = ?, finished_at = NULL WHERE id = ?",
+                (time.time(), row["id"]),
+            )
+            return row
+
+    def set_stage(self, job_id: int, stage_name: str) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET current_stage = ? WHERE id = ?", (stage_name, job_id))
+
+    def record_stage(self, job_id: int, stage_name: str, seconds: float) -> None:
+        with self._lock:
+            row = self._conn.execute("SELECT stage_seconds FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            timings = json.loads(row["stage_seconds"] or "{}")
+            timings[stage_name] = round(seconds, 2)
+            self._conn.execute(
+                "UPDATE jobs SET stage_seconds = ? WHERE id = ?",
+                (json.dumps(timings, ensure_ascii=False), job_id),
+            )
+
+    def finish(self, job_id: int, status: str, error: str | None = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, current_stage = NULL, finished_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id),
+            )
+
+    def list_jobs(self) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute("SELECT * FROM jobs ORDER BY id").fetchall()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def is_sanitized_copy(pdf_path: Path) -> bool:
+    """pdf_text_extractor가 만든 보정본은 원본 작업에서 자동으로 쓰이므로 따로 등록하지 않는다."""
+    return "_sanitized" in pdf_path.name or ".sanitized" in pdf_path.name
+
+
+def scan_input_dir(input_dir: Path) -> List[Path]:
+    return sorted(path.resolve() for path in input_dir.glob("*.pdf") if not is_sanitized_copy(path))
+
+
+def pipeline_argv(args: argparse.Namespace, pdf_path: Path, doc_name: str) -> List[str]:
+    """보고서 하나에 대한 run_pipeline 인자 (벡터 DB 구축은 배치 끝에서 한 번만 한다)."""
+    argv = ["--pdf", str(pdf_path), "--doc-name", doc_name, "--extract-workers", str(args.extract_workers)]
+    if args.skip_sanitize:
+        argv.append("--skip-sanitize")
+    if args.skip_gpt:
+        argv.append("--skip-gpt")
+    if args.load_db:
+        argv.append("--load-db")
+    return argv
+
+
+def run_stage_logged(stage: Stage, log_handle) -> int:
+    log_handle.write(f"\n{'='*60}\n🚀 [Batch] Starting: {stage.description}\n")
+    log_handle.write(f"   Command: {' '.join(stage_command(stage))}\n{'='*60}\n")
+    log_handle.flush()
+    return subprocess.run(stage_command(stage), stdout=log_handle, stderr=subprocess.STDOUT).returncode
+
+
+def run_job(
+    job: sqlite3.Row,
+    args: argparse.Namespace,
+    store: JobStore,
+    limits: Dict[str, threading.Semaphore],
+) -> None:
+    pdf_path = Path(job["pdf_path"])
+    doc_name = job["doc_name"]
+    log_path = args.log_dir / f"{doc_name}.log"
+    started = time.perf_counter()
+    print(f"▶️  [Batch] 시작: {doc_name} (로그: {log_path})")
+
+    try:
+        pipeline_args = build_pipeline_arg_parser().parse_args(pipeline_argv(args, pdf_path, doc_name))
+        page_selection = resolve_page_selection(pdf_path, None)
+        stages = build_stages(pipeline_args, pdf_path, doc_name, page_selection, PAGES_STRUCTURED_DIR / doc_name)
+        with log_path.open("a", encoding="utf-8") as log_handle:
+            for stage in topological_order(stages):
+                store.set_stage(job["id"], stage.name)
+                with limits[stage.resource]:
+                    stage_started = time.perf_counter()
+                    return_code = run_stage_logged(stage, log_handle)
+                store.record_stage(job["id"], stage.name, time.perf_counter() - stage_started)
+                if return_code != 0:
+                    raise RuntimeError(f"{stage.name} 단계 실패 (exit {return_code})")
+    except Exception as exc:  # pylint: disable=broad-except
+        store.finish(job["id"], "failed", str(exc))
+        print(f"❌ [Batch] 실패: {doc_name} - {exc} (로그: {log_path})")
+        return
+
+    store.finish(job["id"], "done")
+    print(f"✅ [Batch] 완료: {doc_name} ({time.perf_counter() - started:.1f}s)")
+
+
+def worker_loop(args: argparse.Namespace, store: JobStore, limits: Dict[str, threading.Semaphore]) -> None:
+    while True:
+        job = store.claim()
+        if job is None:
+            return
+        run_job(job, args, store, limits)
+
+
+def build_vector_db_once(args: argparse.Namespace) -> int:
+    """완료된 보고서를 모아 벡터 DB를 한 번 갱신한다. 체크포인트(--resume)로 이미 넣은 문서는 건너뛴다."""
+    cmd_vector = ["--resume"]
+    if args.remote_host:
+        cmd_vector.extend(["--remote-host", args.remote_host])
+    if args.remote_port:
+        cmd_vector.extend(["--remote-port", str(args.remote_port)])
+    stage = Stage("vector_db", "Vector DB Build (batch)", "build_vector_db", cmd_vector)
+    print(f"\n🚀 [Batch] {stage.description}")
+    return subprocess.run(stage_command(stage)).returncode
+
+
+def format_timestamp(value: float | None) -> str:
+    if not value:
+        return "-"
+    return datetime.fromtimestamp(value).strftime("%m-%d %H:%M:%S")
+
+
+def print_status(store: JobStore) -> None:
+    jobs = store.list_jobs()
+    if not jobs:
+        print("등록된 작업이 없습니다.")
+        return
+
+    counts = {status: 0 for status in JOB_STATUSES}
+    print(f"{'doc_name':<32} {'status':<8} {'try':>3} {'started':<15} {'elapsed':>9}  stage / error")
+    for job in jobs:
+        counts[job["status"]] = counts.get(job["status"], 0) + 1
+        elapsed = "-"
+        if job["started_at"]:
+            end = job["finished_at"] or time.time()
+            elapsed = f"{end - job['started_at']:.1f}s"
+        if job["status"] == "failed":
+            detail = job["error"] or ""
+        elif job["status"] == "running":
+            detail = job["current_stage"] or ""
+        else:
+            timings = json.loads(job["stage_seconds"] or "{}")
+            detail = ", ".join(f"{name}={seconds}s" for name, seconds in timings.items())
+        print(
+            f"{job['doc_name'][:32]:<32} {job['status']:<8} {job['attempts']:>3} "
+            f"{format_timestamp(job['started_at']):<15} {elapsed:>9}  {detail}"
+        )
+    print("\n" + ", ".join(f"{status}={count}" for status, count in counts.items()))
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="입력 폴더의 ESG 보고서 PDF를 작업 큐로 등록해 병렬 처리한다.")
+    parser.add_argument("--input-dir", type=Path, default=DEFAULT_INPUT_DIR, help="PDF를 찾을 폴더 (기본: data/input)")
+    parser.add_argument("--job-db", type=Path, default=DEFAULT_JOB_DB, help="작업 상태를 저장할 SQLite 파일")
+    parser.add_argument("--log-dir", type=Path, default=DEFAULT_LOG_DIR, help="보고서별 실행 로그 폴더")
+    parser.add_argument("--status", action="store_true", help="작업 상태/소요 시간만 출력하고 종료")
+    parser.add_argument("--retry-failed", action="store_true", help="failed 상태 작업을 다시 대기열에 넣는다")
+    parser.add_argument("--workers", type=int, default=4, help="동시에 처리할 보고서 수")
+    parser.add_argument("--cpu-slots", type=int, default=2, help="동시에 실행할 CPU 단계(Docling/OCR/diff) 수")
+    parser.add_argument("--gpt-slots", type=int, default=4, help="동시에 실행할 GPT 단계(그림 설명) 수")
+    parser.add_argument("--db-slots", type=int, default=1, help="동시에 실행할 DB 적재 단계 수")
+    parser.add_argument("--extract-workers", type=int, default=1, help="보고서별 Docling 추출 프로세스 수")
+
+    # run_pipeline과 같은 의미의 플래그
+    parser.add_argument("--skip-sanitize", action="store_true", help="PDF 인코딩 보정 단계 건너뛰기")
+    parser.add_argument("--skip-gpt", action="store_true", help="GPT 그림 설명 단계 건너뛰기")
+    parser.add_argument("--load-db", action="store_true", help="처리 후 MySQL 적재")
+    parser.add_argument("--build-vector-db", action="store_true", help="모든 보고서 처리 후 벡터 DB를 한 번 갱신")
+    parser.add_argument("--remote-host", type=str, default=None, help="원격 Chroma 서버 호스트")
+    parser.add_argument("--remote-port", type=int, default=None, help="원격 Chroma 서버 포트")
+    return parser
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+
+    store = JobStore(args.job_db.resolve())
+    try:
+        if args.status:
+            print_status(store)
+            return 0
+
+        if not args.input_dir.exists():
+            parser.error(f"입력 폴더를 찾을 수 없습니다: {args.input_dir}")
+
+        recovered = store.recover_interrupted()
+        if recovered:
+            print(f"♻️  [Batch] 중단된 작업 {recovered}건을 다시 대기열에 넣었습니다.")
+        if args.retry_failed:
+            print(f"♻️  [Batch] 실패한 작업 {store.retry_failed()}건을 다시 대기열에 넣었습니다.")
+
+        added = sum(store.enqueue(pdf_path, pdf_path.stem) for pdf_path in scan_input_dir(args.input_dir))
+        pending = sum(1 for job in store.list_jobs() if job["status"] == "pending")
+        print(f"📥 [Batch] 새로 등록 {added}건, 처리 대기 {pending}건 (workers={args.workers})")
+
+        args.log_dir = args.log_dir.resolve()
+        args.log_dir.mkdir(parents=True, exist_ok=True)
+        slot_counts = {"cpu": args.cpu_slots, "gpt": args.gpt_slots, "db": args.db_slots}
+        limits = {resource: threading.Semaphore(max(1, slot_counts[resource])) for resource in STAGE_RESOURCES}
+
+        threads = [
+            threading.Thread(target=worker_loop, args=(args, store, limits), name=f"batch-worker-{idx}", daemon=True)
+            for idx in range(max(1, args.workers))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        print()
+        print_status(store)
+        failed = sum(1 for job in store.list_jobs() if job["status"] == "failed")
+
+        if args.build_vector_db:
+            return_code = build_vector_db_once(args)
+            if return_code != 0:
+                return return_code
+    finally:
+        store.close()
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,13 +3,14 @@
 from __future__ import annotations
 
 import argparse
-import base64
 import json
 import os
 from collections import defaultdict
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Iterable, List
+from typing import Any, Dict, Iterable, Iterator, List, Set
 
 import chromadb
 from langchain_text_splitters import RecursiveCharacterTextSplitter
@@ -18,6 +19,10 @@ from sentence_transformers import SentenceTransformer
 # GPT 요약을 위해 OpenAI 클라이언트 사용
 from openai import OpenAI
 
+from chunk_dedup import DEDUP_INDEX_NAME, DEDUP_MODES, NEAR_DUP_THRESHOLD, ChunkDedupIndex
+from image_variants import image_data_url
+from kiwi_tokens import KiwiTokenizerPool, TokenCacheWriter, load_vocab
+import pipeline_metrics
 from load_to_db import get_connection
 
 # ===== 설정 =====
@@ -30,6 +35,15 @@ EMBEDDING_MODEL = os.getenv("RAG_EMBEDDING_MODEL", "BAAI/bge-m3")
 CHUNK_SIZE = 512
 CHUNK_OVERLAP = 50
 BATCH_SIZE = 32
+# 길이 버킷 배치: 배치 크기 x 최장 문서 길이(문자)가 이 값을 넘지 않도록 나눈다.
+MAX_BATCH_ITEMS = BATCH_SIZE * 4
+MAX_BATCH_PADDED_CHARS = BATCH_SIZE * CHUNK_SIZE
+POOL_BATCHES_PER_WORKER = 4
+ENCODE_WORKERS = int(os.getenv("RAG_ENCODE_WORKERS", "0"))
+# 스트리밍 빌드에서 컬렉션별로 임베딩 전까지 메모리에 쌓아 두는 최대 레코드 수
+STREAM_WINDOW = 256
+CHECKPOINT_NAME = "build_checkpoint.jsonl"
+TOKEN_CACHE_NAME = "chunk_tokens"
 PAGE_SUMMARY_PROMPT = """
 You are an assistant tasked with summarizing images for retrieval.
 These summaries will be embedded and used to retrieve the raw image.
@@ -200,9 +214,12 @@ def get_or_create_collections(client: chromadb.PersistentClient, reset: bool):
     return page_col, chunk_col
 
 
-def build_doc_filters(company: str | None, year: int | None) -> tuple[str, List]:
+def build_doc_filters(company: str | None, year: int | None, doc_id: int | None = None) -> tuple[str, List]:
     clauses: List[str] = []
     params: List = []
+    if doc_id is not None:
+        clauses.append("d.id = %s")
+        params.append(doc_id)
     if company:
         clauses.append("d.company_name = %s")
         params.append(company)
@@ -214,7 +231,29 @@ def build_doc_filters(company: str | None, year: int | None) -> tuple[str, List]
     return "", params
 
 
-def fetch_pages(conn, company: str | None, year: int | None) -> List[Dict[str, Any]]:
+def fetch_documents(conn, company: str | None, year: int | None) -> List[Dict[str, Any]]:
+    sql = """
+        SELECT d.id AS doc_id,
+               d.filename,
+               d.company_name,
+               d.report_year
+        FROM documents d
+        WHERE 1 = 1 {extra}
+        ORDER BY d.id
+    """
+    extra, params = build_doc_filters(company, year)
+    query = sql.format(extra=extra)
+    with conn.cursor() as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+
+def fetch_pages(
+    conn,
+    company: str | None,
+    year: int | None,
+    doc_id: int | None = None,
+) -> List[Dict[str, Any]]:
     sql = """
         SELECT d.id AS doc_id,
                d.filename,
@@ -229,14 +268,19 @@ def fetch_pages(conn, company: str | None, year: int | None) -> List[Dict[str, A
         WHERE p.full_markdown IS NOT NULL AND p.full_markdown != '' {extra}
         ORDER BY d.id, p.page_no
     """
-    extra, params = build_doc_filters(company, year)
+    extra, params = build_doc_filters(company, year, doc_id)
     query = sql.format(extra=extra)
     with conn.cursor() as cursor:
         cursor.execute(query, params)
         return cursor.fetchall()
 
 
-def fetch_figures(conn, company: str | None, year: int | None) -> List[Dict[str, Any]]:
+def fetch_figures(
+    conn,
+    company: str | None,
+    year: int | None,
+    doc_id: int | None = None,
+) -> List[Dict[str, Any]]:
     sql = """
         SELECT f.id AS figure_id,
                f.doc_id,
@@ -253,14 +297,19 @@ def fetch_figures(conn, company: str | None, year: int | None) -> List[Dict[str,
         JOIN documents d ON f.doc_id = d.id
         WHERE f.description IS NOT NULL AND CHAR_LENGTH(f.description) > 0 {extra}
     """
-    extra, params = build_doc_filters(company, year)
+    extra, params = build_doc_filters(company, year, doc_id)
     query = sql.format(extra=extra)
     with conn.cursor() as cursor:
         cursor.execute(query, params)
         return cursor.fetchall()
 
 
-def fetch_tables(conn, company: str | None, year: int | None) -> List[Dict[str, Any]]:
+def fetch_tables(
+    conn,
+    company: str | None,
+    year: int | None,
+    doc_id: int | None = None,
+) -> List[Dict[str, Any]]:
     sql = """
         SELECT t.id AS table_id,
                t.doc_id,
@@ -277,7 +326,7 @@ def fetch_tables(conn, company: str | None, year: int | None) -> List[Dict[str,
         {extra}
         ORDER BY t.doc_id, t.page_no, t.id
     """
-    extra, params = build_doc_filters(company, year)
+    extra, params = build_doc_filters(company, year, doc_id)
     if extra:
         where_clause = "WHERE " + extra.strip()[4:]
         query = sql.format(extra=where_clause)
@@ -355,11 +404,11 @@ def summarize_page_with_gpt(client: OpenAI, page_no: int, context: str, image_pa
     )
     content_payload: list[dict] = [{"type": "input_text", "text": user_content}]
     if image_path and image_path.exists():
-        image_b64 = encode_image_base64(image_path)
         content_payload.append(
             {
                 "type": "input_image",
-                "image_url": f"data:image/png;base64,{image_b64}",
+                # structured_extract가 만든 GPT용 압축본(*.gpt.webp)이 있으면 그것을 보낸다.
+                "image_url": image_data_url(image_path),
             }
         )
     resp = client.responses.create(
@@ -368,6 +417,7 @@ def summarize_page_with_gpt(client: OpenAI, page_no: int, context: str, image_pa
         temperature=0.3,
         max_output_tokens=800,
     )
+    pipeline_metrics.record_gpt_usage(resp)
     for item in resp.output or []:
         for content in getattr(item, "content", []) or []:
             text = getattr(content, "text", None)
@@ -398,20 +448,339 @@ def chunk_text(text: str, splitter: RecursiveCharacterTextSplitter) -> List[str]
     return splitter.split_text(text)
 
 
-def encode_image_base64(image_path: Path) -> str:
-    data = image_path.read_bytes()
-    return base64.b64encode(data).decode("utf-8")
-
+def plan_length_batches(
+    documents: List[str],
+    max_items: int = MAX_BATCH_ITEMS,
+    max_padded_chars: int = MAX_BATCH_PADDED_CHARS,
+) -> List[List[int]]:
+    """문서 길이 오름차순으로 정렬한 뒤 패딩 비용(배치 크기 x 최장 길이) 한도 안에서 배치를 나눈다.
 
-def embed_and_upsert(collection, model, ids, documents, metadatas):
+    짧은 본문 청크는 한 배치에 많이, 긴 표 텍스트는 적게 담겨 패딩 낭비가 줄어든다.
+    반환값은 원본 documents의 인덱스 목록(배치 단위)이다.
+    """
+    order = sorted(range(len(documents)), key=lambda idx: len(documents[idx] or ""))
+    batches: List[List[int]] = []
+    current: List[int] = []
+    for idx in order:
+        length = max(1, len(documents[idx] or ""))
+        # 오름차순이므로 현재 문서가 배치의 최장 길이가 된다.
+        if current and (len(current) >= max_items or length * (len(current) + 1) > max_padded_chars):
+            batches.append(current)
+            current = []
+        current.append(idx)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def start_encode_pool(model, workers: int):
+    """SentenceTransformer 멀티프로세스 인코딩 풀을 띄운다. workers<=1이면 None."""
+    if workers <= 1:
+        return None
+    print(f"🧵 멀티프로세스 인코딩 풀 시작 (workers={workers})")
+    return model.start_multi_process_pool(target_devices=["cpu"] * workers)
+
+
+def stop_encode_pool(model, pool) -> None:
+    if pool is not None:
+        model.stop_multi_process_pool(pool)
+
+
+def encode_documents(model, documents: List[str], pool=None) -> List[List[float]]:
+    if pool is not None:
+        return model.encode_multi_process(documents, pool, batch_size=BATCH_SIZE).tolist()
+    return model.encode(documents, batch_size=len(documents)).tolist()
+
+
+def embed_and_upsert(collection, model, ids, documents, metadatas, pool=None):
+    """길이 버킷 배치로 임베딩하고, 다음 배치 인코딩과 이전 배치 upsert를 겹쳐 실행한다."""
     if not ids:
         return
-    for start in range(0, len(ids), BATCH_SIZE):
-        batch_ids = ids[start:start + BATCH_SIZE]
-        batch_docs = documents[start:start + BATCH_SIZE]
-        batch_metas = metadatas[start:start + BATCH_SIZE]
-        embeddings = model.encode(batch_docs).tolist()
-        collection.upsert(ids=batch_ids, documents=batch_docs, embeddings=embeddings, metadatas=batch_metas)
+    pipeline_metrics.count("vectors", len(ids))
+    # 멀티프로세스 풀은 호출마다 워커에 작업을 나눠주므로 한 번에 더 큰 묶음을 넘긴다.
+    scale = len(pool["processes"]) * POOL_BATCHES_PER_WORKER if pool is not None else 1
+    batches = plan_length_batches(documents, MAX_BATCH_ITEMS * scale, MAX_BATCH_PADDED_CHARS * scale)
+
+    pending = None
+    with ThreadPoolExecutor(max_workers=1) as upserter:
+        for batch in batches:
+            batch_ids = [ids[idx] for idx in batch]
+            batch_docs = [documents[idx] for idx in batch]
+            batch_metas = [metadatas[idx] for idx in batch]
+            embeddings = encode_documents(model, batch_docs, pool)
+            if pending is not None:
+                pending.result()
+            pending = upserter.submit(
+                collection.upsert,
+                ids=batch_ids,
+                documents=batch_docs,
+                embeddings=embeddings,
+                metadatas=batch_metas,
+            )
+        if pending is not None:
+            pending.result()
+
+
+@dataclass
+class DocumentBundle:
+    """문서 1건 분량의 페이지/그림/표/셀 데이터. 스트리밍 빌드에서 한 번에 하나만 메모리에 둔다."""
+
+    doc: Dict[str, Any]
+    pages: List[Dict[str, Any]]
+    figures_by_page: Dict[int, List[Dict[str, Any]]]
+    tables_by_page: Dict[int, List[Dict[str, Any]]]
+    table_cells: Dict[int, List[Dict[str, Any]]]
+
+
+def iter_document_bundles(
+    conn,
+    company: str | None,
+    year: int | None,
+    skip_doc_ids: Set[int] | None = None,
+) -> Iterator[DocumentBundle]:
+    """필터에 맞는 문서를 하나씩 조회해 DocumentBundle로 돌려준다."""
+    for doc in fetch_documents(conn, company, year):
+        doc_id = doc["doc_id"]
+        if skip_doc_ids and doc_id in skip_doc_ids:
+            continue
+        pages = fetch_pages(conn, None, None, doc_id=doc_id)
+        if not pages:
+            continue
+        figures_by_page: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        for fig in fetch_figures(conn, None, None, doc_id=doc_id):
+            figures_by_page[fig["page_id"]].append(fig)
+        tables_by_page: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        table_ids: List[int] = []
+        for tbl in fetch_tables(conn, None, None, doc_id=doc_id):
+            tables_by_page[tbl["page_id"]].append(tbl)
+            table_ids.append(tbl["table_id"])
+        yield DocumentBundle(
+            doc=doc,
+            pages=pages,
+            figures_by_page=figures_by_page,
+            tables_by_page=tables_by_page,
+            table_cells=fetch_table_cells(conn, table_ids),
+        )
+
+
+def build_page_record(
+    bundle: DocumentBundle,
+    page: Dict[str, Any],
+    gpt_client: OpenAI,
+) -> tuple[str, str, Dict[str, Any]]:
+    """페이지 대표 텍스트(GPT 요약) 레코드를 만든다."""
+    fig_texts: List[str] = []
+    fig_ids: List[int] = []
+    for fig in bundle.figures_by_page.get(page["page_id"], []):
+        desc = (fig.get("description") or "").strip()
+        if desc:
+            fig_texts.append(f"- {desc}")
+        fig_ids.append(fig["figure_id"])
+
+    table_titles = []
+    tbl_ids = []
+    for tbl in bundle.tables_by_page.get(page["page_id"], []):
+        title = tbl.get("title") or f"표 {tbl['table_id']}"
+        table_titles.append(title)
+        tbl_ids.append(tbl["table_id"])
+
+    doc_folder = Path(page["filename"]).stem
+    image_rel = page.get("image_path")
+    image_abs = STRUCTURED_ROOT / doc_folder / image_rel if image_rel else None
+
+    context_text = build_page_context(page, fig_texts, table_titles)
+    summary_text = summarize_page_with_gpt(gpt_client, page["page_no"], context_text, image_abs)
+    return f"page_repr_{page['page_id']}", summary_text, collect_page_metadata(page, tbl_ids, fig_ids)
+
+
+def iter_chunk_records(
+    bundle: DocumentBundle,
+    page: Dict[str, Any],
+    splitter: RecursiveCharacterTextSplitter,
+) -> Iterator[tuple[str, str, Dict[str, Any]]]:
+    """페이지 본문 청크, 표 텍스트, 그림 설명 레코드를 차례로 생성한다."""
+    # 페이지 본문 청크
+    chunks = chunk_text(page["full_markdown"], splitter)
+    for idx, chunk in enumerate(chunks):
+        yield f"page_{page['page_id']}_chunk_{idx}", chunk, {
+            "source_type": "page_text",
+            "doc_id": page["doc_id"],
+            "page_id": page["page_id"],
+            "page_no": page["page_no"],
+            "chunk_index": idx,
+            "company_name": page.get("company_name") or "Unknown",
+            "report_year": page.get("report_year") or 0,
+            "filename": page["filename"],
+            "created_at": datetime.now().isoformat(),
+        }
+
+    # 페이지 내 테이블 텍스트
+    for tbl in bundle.tables_by_page.get(page["page_id"], []):
+        cells = bundle.table_cells.get(tbl["table_id"], [])
+        table_text = build_table_text(tbl, cells)
+        yield f"table_{tbl['table_id']}", table_text, {
+            "source_type": "table",
+            "doc_id": tbl["doc_id"],
+            "page_id": tbl["page_id"],
+            "page_no": tbl["page_no"],
+            "table_id": tbl["table_id"],
+            "table_title": tbl.get("title") or "",
+            "company_name": tbl.get("company_name") or "Unknown",
+            "report_year": tbl.get("report_year") or 0,
+            "filename": tbl["filename"],
+            "image_path": tbl.get("image_path") or "",
+            "diff_present": bool(tbl.get("diff_data")),
+            "created_at": datetime.now().isoformat(),
+        }
+
+    # 페이지 내 그림 설명
+    for fig in bundle.figures_by_page.get(page["page_id"], []):
+        desc = (fig.get("description") or "").strip()
+        if not desc:
+            continue
+        figure_text = f"캡션: {fig.get('caption') or ''}\n\n{desc}"
+        yield f"figure_{fig['figure_id']}", figure_text, {
+            "source_type": "figure",
+            "doc_id": fig["doc_id"],
+            "page_id": fig["page_id"],
+            "page_no": fig["page_no"],
+            "figure_id": fig["figure_id"],
+            "company_name": fig.get("company_name") or "Unknown",
+            "report_year": fig.get("report_year") or 0,
+            "filename": fig["filename"],
+            "image_path": fig.get("image_path") or "",
+            "created_at": datetime.now().isoformat(),
+        }
+
+
+def default_checkpoint_path(remote_host: str | None, remote_port: int | None) -> Path:
+    """적재 대상(로컬/원격 Chroma)별로 체크포인트 파일을 분리한다."""
+    if remote_host:
+        return BASE_DIR / f"build_checkpoint_{remote_host}_{remote_port or 8000}.jsonl"
+    return BASE_DIR / CHECKPOINT_NAME
+
+
+class BuildCheckpoint:
+    """upsert가 끝난 페이지/문서를 JSON Lines로 기록해 --resume 시 건너뛴다.
+
+    기록은 UpsertWindow flush 직후에만 하므로, 체크포인트에 남은 단위는 항상 Chroma에 반영된 상태다.
+    파일은 --reset(컬렉션 초기화)일 때만 지운다. --resume 없이 실행한 증분 적재도 기존 기록 뒤에 이어 쓰므로,
+    이후 --resume 실행(batch_ingest 등)이 이미 넣은 문서를 다시 요약/임베딩하지 않는다.
+    """
+
+    def __init__(self, path: Path, resume: bool, reset: bool = False):
+        self.path = path
+        self.done_pages: Set[int] = set()
+        self.done_docs: Set[int] = set()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if reset and self.path.exists():
+            self.path.unlink()
+        if not resume or not self.path.exists():
+            return
+        with self.path.open(encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 기록 도중 종료되어 잘린 마지막 줄은 무시
+                    continue
+                if entry.get("unit") == "page":
+                    self.done_pages.add(int(entry["id"]))
+                elif entry.get("unit") == "doc":
+                    self.done_docs.add(int(entry["id"]))
+
+    def commit(self, page_ids: List[int], doc_ids: List[int]) -> None:
+        if not page_ids and not doc_ids:
+            return
+        now = datetime.now().isoformat()
+        with self.path.open("a", encoding="utf-8") as handle:
+            for page_id in page_ids:
+                handle.write(json.dumps({"unit": "page", "id": page_id, "at": now}) + "\n")
+            for doc_id in doc_ids:
+                handle.write(json.dumps({"unit": "doc", "id": doc_id, "at": now}) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+        self.done_pages.update(page_ids)
+        self.done_docs.update(doc_ids)
+
+
+class UpsertWindow:
+    """컬렉션별로 최대 capacity건만 모아 두었다가 임베딩/upsert하는 버퍼."""
+
+    def __init__(self, collection, model, pool, capacity: int, on_flush=None):
+        self.collection = collection
+        self.model = model
+        self.pool = pool
+        self.capacity = max(1, capacity)
+        self.on_flush = on_flush
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.duplicates: List[tuple[str, str, Dict[str, Any]]] = []
+        self.total = 0
+        self.reused = 0
+
+    def add(self, record_id: str, document: str, metadata: Dict[str, Any]) -> None:
+        self.ids.append(record_id)
+        self.documents.append(document)
+        self.metadatas.append(metadata)
+
+    def add_duplicate(self, record_id: str, document: str, metadata: Dict[str, Any], canonical_id: str) -> None:
+        """중복 청크도 자기 문서의 메타데이터(회사/연도/페이지)로 저장하되, 임베딩은 대표 청크 벡터를 복사한다."""
+        self.duplicates.append((record_id, document, {**metadata, "duplicate_of": canonical_id}))
+
+    def is_full(self) -> bool:
+        return len(self.ids) + len(self.duplicates) >= self.capacity
+
+    def flush(self) -> None:
+        if not self.ids and not self.duplicates:
+            return
+        embed_and_upsert(self.collection, self.model, self.ids, self.documents, self.metadatas, self.pool)
+        # 대표 청크는 같은 창에서 먼저 upsert되었거나 이전 flush에서 이미 저장되어 있다.
+        self.upsert_duplicates()
+        if self.on_flush is not None:
+            self.on_flush(
+                self.ids + [record_id for record_id, _, _ in self.duplicates],
+                self.documents + [document for _, document, _ in self.duplicates],
+            )
+        self.total += len(self.ids)
+        self.reused += len(self.duplicates)
+        self.ids, self.documents, self.metadatas = [], [], []
+        self.duplicates = []
+
+    def upsert_duplicates(self) -> None:
+        if not self.duplicates:
+            return
+        canonical_ids = list(dict.fromkeys(metadata["duplicate_of"] for _, _, metadata in self.duplicates))
+        stored = self.collection.get(ids=canonical_ids, include=["embeddings"])
+        vectors = dict(zip(stored["ids"], stored["embeddings"]))
+        ids, documents, metadatas, embeddings = [], [], [], []
+        missing: List[tuple[str, str, Dict[str, Any]]] = []
+        for record_id, document, metadata in self.duplicates:
+            vector = vectors.get(metadata["duplicate_of"])
+            if vector is None:
+                missing.append((record_id, document, metadata))
+                continue
+            ids.append(record_id)
+            documents.append(document)
+            metadatas.append(metadata)
+            embeddings.append([float(value) for value in vector])
+        if ids:
+            pipeline_metrics.count("vectors_reused", len(ids))
+            self.collection.upsert(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+        if missing:
+            # 대표 벡터를 찾지 못하면(컬렉션만 따로 지운 경우 등) 직접 임베딩한다.
+            embed_and_upsert(
+                self.collection,
+                self.model,
+                [record_id for record_id, _, _ in missing],
+                [document for _, document, _ in missing],
+                [metadata for _, _, metadata in missing],
+                self.pool,
+            )
 
 
 def build_vector_db(
@@ -420,6 +789,15 @@ def build_vector_db(
     remote_port: int | None = None,
     company: str | None = None,
     report_year: int | None = None,
+    encode_workers: int = ENCODE_WORKERS,
+    window_size: int = STREAM_WINDOW,
+    resume: bool = False,
+    checkpoint_path: Path | None = None,
+    dedup_mode: str = "off",
+    near_dup_threshold: float = NEAR_DUP_THRESHOLD,
+    token_cache: bool = False,
+    tokenize_workers: int | None = None,
+    model: SentenceTransformer | None = None,
 ) -> None:
     print(f"🚀 2단계 벡터 DB 구축 시작 (모델: {EMBEDDING_MODEL})")
     if company or report_year:
@@ -433,8 +811,19 @@ def build_vector_db(
         print(f"📁 로컬 Chroma 경로 사용: {BASE_DIR.resolve()}")
     page_collection, chunk_collection = get_or_create_collections(client, reset)
 
-    print("📦 임베딩 모델 로딩 중...")
-    model = SentenceTransformer(EMBEDDING_MODEL)
+    if reset and resume:
+        print("⚠️ --reset과 --resume이 함께 지정되어 체크포인트를 무시하고 처음부터 구축합니다.")
+        resume = False
+    checkpoint = BuildCheckpoint(checkpoint_path or default_checkpoint_path(remote_host, remote_port), resume, reset)
+    if resume:
+        print(
+            f"♻️ 체크포인트 이어서 진행: 완료 문서 {len(checkpoint.done_docs)}건 / "
+            f"완료 페이지 {len(checkpoint.done_pages)}건 ({checkpoint.path})"
+        )
+
+    if model is None:
+        print("📦 임베딩 모델 로딩 중...")
+        model = SentenceTransformer(EMBEDDING_MODEL)
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=CHUNK_SIZE,
         chunk_overlap=CHUNK_OVERLAP,
@@ -446,144 +835,145 @@ def build_vector_db(
         raise RuntimeError("OPENAI_API_KEY가 필요합니다 (페이지 GPT 요약 단계).")
     gpt_client = OpenAI(api_key=api_key)
 
+    dedup = ChunkDedupIndex(
+        checkpoint.path.with_name(DEDUP_INDEX_NAME),
+        mode=dedup_mode,
+        threshold=near_dup_threshold,
+        reset=reset,
+    )
+    if dedup.enabled:
+        print(f"🧬 청크 중복 제거 사용 (mode={dedup_mode}, 기존 대표 청크 {len(dedup.exact)}건)")
+
+    tokenizer_pool: KiwiTokenizerPool | None = None
+    token_writer: TokenCacheWriter | None = None
+    on_chunk_flush = None
+    if token_cache:
+        # search_vector_db.get_token_cache는 벡터 DB 폴더에서 찾으므로 --checkpoint 위치와 상관없이 그곳에 둔다.
+        token_prefix = BASE_DIR.resolve() / TOKEN_CACHE_NAME
+        # 체크포인트와 같이 --reset일 때만 캐시를 비우고, 그 외에는 기존 어휘/토큰 뒤에 이어 쓴다.
+        vocab = None if reset else load_vocab(token_prefix)
+        tokenizer_pool = KiwiTokenizerPool(workers=tokenize_workers, vocab=vocab)
+        token_writer = TokenCacheWriter(token_prefix, tokenizer_pool.vocab, append=not reset)
+        print(f"🔤 청크 토큰 캐시 생성 (Kiwi workers={tokenizer_pool.workers}, {token_prefix})")
+
+        def on_chunk_flush(ids: List[str], documents: List[str]) -> None:
+            token_writer.append(ids, tokenizer_pool.tokenize(documents), documents)
+
+    encode_pool = start_encode_pool(model, encode_workers)
+    page_window = UpsertWindow(page_collection, model, encode_pool, window_size)
+    chunk_window = UpsertWindow(chunk_collection, model, encode_pool, window_size, on_flush=on_chunk_flush)
+
+    pending_pages: List[int] = []
+    pending_docs: List[int] = []
+
+    def flush_windows() -> None:
+        page_window.flush()
+        chunk_window.flush()
+        dedup.commit()
+        checkpoint.commit(pending_pages, pending_docs)
+        pending_pages.clear()
+        pending_docs.clear()
+
+    print(f"🌊 문서 단위 스트리밍 빌드 (window={window_size})")
+    doc_count = 0
+    page_count = 0
+    skipped_pages = 0
+    duplicate_chunks = 0
     conn = get_connection()
     try:
-        pages = fetch_pages(conn, company, report_year)
-        figures = fetch_figures(conn, company, report_year)
-        tables = fetch_tables(conn, company, report_year)
+        for bundle in iter_document_bundles(conn, company, report_year, checkpoint.done_docs):
+            doc_count += 1
+            print(f"📄 [{bundle.doc['filename']}] 페이지 {len(bundle.pages)}건 처리")
+            for page in bundle.pages:
+                if page["page_id"] in checkpoint.done_pages:
+                    skipped_pages += 1
+                    continue
+                page_window.add(*build_page_record(bundle, page, gpt_client))
+                for record_id, document, metadata in iter_chunk_records(bundle, page, splitter):
+                    match = dedup.check(record_id, document, metadata["source_type"])
+                    if match is not None:
+                        duplicate_chunks += 1
+                        chunk_window.add_duplicate(record_id, document, metadata, match.canonical_id)
+                        continue
+                    chunk_window.add(record_id, document, metadata)
+                pending_pages.append(page["page_id"])
+                page_count += 1
+                if page_window.is_full() or chunk_window.is_full():
+                    flush_windows()
+            pending_docs.append(bundle.doc["doc_id"])
+        flush_windows()
     finally:
         conn.close()
-
-    if not pages:
-        print("MySQL에서 페이지 데이터를 찾을 수 없습니다. load_to_db.py 실행 여부를 확인하세요.")
+        stop_encode_pool(model, encode_pool)
+        if tokenizer_pool is not None:
+            tokenizer_pool.close()
+
+    if skipped_pages:
+        print(f"⏭️ 체크포인트로 건너뛴 페이지 {skipped_pages}건")
+    if duplicate_chunks:
+        print(f"🧬 대표 청크 벡터를 재사용한 중복 청크 {duplicate_chunks}건 (매핑: {dedup.path})")
+    if not page_count:
+        if resume and checkpoint.done_pages:
+            print("✅ 체크포인트 기준으로 남은 작업이 없습니다.")
+        else:
+            print("MySQL에서 페이지 데이터를 찾을 수 없습니다. load_to_db.py 실행 여부를 확인하세요.")
         return
 
-    print(f"📄 페이지 {len(pages)}건 / 그림 {len(figures)}건 / 표 {len(tables)}건 로드 완료")
-
-    figures_by_page: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
-    for fig in figures:
-        figures_by_page[fig["page_id"]].append(fig)
-
-    tables_by_page: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
-    for tbl in tables:
-        tables_by_page[tbl["page_id"]].append(tbl)
-
-    # 페이지 대표 텍스트 생성
-    page_ids: List[str] = []
-    page_docs: List[str] = []
-    page_metas: List[Dict[str, Any]] = []
-
-    for page in pages:
-        fig_texts: List[str] = []
-        fig_ids: List[int] = []
-        for fig in figures_by_page.get(page["page_id"], []):
-            desc = (fig.get("description") or "").strip()
-            if desc:
-                fig_texts.append(f"- {desc}")
-            fig_ids.append(fig["figure_id"])
-
-        table_titles = []
-        tbl_ids = []
-        for tbl in tables_by_page.get(page["page_id"], []):
-            title = tbl.get("title") or f"표 {tbl['table_id']}"
-            table_titles.append(title)
-            tbl_ids.append(tbl["table_id"])
-
-        doc_folder = Path(page["filename"]).stem
-        image_rel = page.get("image_path")
-        image_abs = STRUCTURED_ROOT / doc_folder / image_rel if image_rel else None
-
-        context_text = build_page_context(page, fig_texts, table_titles)
-        summary_text = summarize_page_with_gpt(gpt_client, page["page_no"], context_text, image_abs)
-        page_ids.append(f"page_repr_{page['page_id']}")
-        page_docs.append(summary_text)
-        page_metas.append(collect_page_metadata(page, tbl_ids, fig_ids))
-
-    print(f"🧾 페이지 대표 텍스트 {len(page_ids)}건 임베딩")
-    embed_and_upsert(page_collection, model, page_ids, page_docs, page_metas)
-
-    # 정밀 청크 처리
-    chunk_ids: List[str] = []
-    chunk_docs: List[str] = []
-    chunk_metas: List[Dict[str, Any]] = []
-
-    for page in pages:
-        # 페이지 본문 청크
-        chunks = chunk_text(page["full_markdown"], splitter)
-        for idx, chunk in enumerate(chunks):
-            chunk_ids.append(f"page_{page['page_id']}_chunk_{idx}")
-            chunk_docs.append(chunk)
-            chunk_metas.append({
-                "source_type": "page_text",
-                "doc_id": page["doc_id"],
-                "page_id": page["page_id"],
-                "page_no": page["page_no"],
-                "chunk_index": idx,
-                "company_name": page.get("company_name") or "Unknown",
-                "report_year": page.get("report_year") or 0,
-                "filename": page["filename"],
-                "created_at": datetime.now().isoformat(),
-            })
-
-        # 페이지 내 테이블 텍스트
-        page_tables = tables_by_page.get(page["page_id"], [])
-        table_cells_map = fetch_table_cells(get_connection(), [tbl["table_id"] for tbl in page_tables])
-        for tbl in page_tables:
-            cells = table_cells_map.get(tbl["table_id"], [])
-            table_text = build_table_text(tbl, cells)
-            chunk_ids.append(f"table_{tbl['table_id']}")
-            chunk_docs.append(table_text)
-            chunk_metas.append({
-                "source_type": "table",
-                "doc_id": tbl["doc_id"],
-                "page_id": tbl["page_id"],
-                "page_no": tbl["page_no"],
-                "table_id": tbl["table_id"],
-                "table_title": tbl.get("title") or "",
-                "company_name": tbl.get("company_name") or "Unknown",
-                "report_year": tbl.get("report_year") or 0,
-                "filename": tbl["filename"],
-                "image_path": tbl.get("image_path") or "",
-                "diff_present": bool(tbl.get("diff_data")),
-                "created_at": datetime.now().isoformat(),
-            })
-
-        # 페이지 내 그림 설명
-        for fig in figures_by_page.get(page["page_id"], []):
-            desc = (fig.get("description") or "").strip()
-            if not desc:
-                continue
-            figure_text = f"캡션: {fig.get('caption') or ''}\n\n{desc}"
-            chunk_ids.append(f"figure_{fig['figure_id']}")
-            chunk_docs.append(figure_text)
-            chunk_metas.append({
-                "source_type": "figure",
-                "doc_id": fig["doc_id"],
-                "page_id": fig["page_id"],
-                "page_no": fig["page_no"],
-                "figure_id": fig["figure_id"],
-                "company_name": fig.get("company_name") or "Unknown",
-                "report_year": fig.get("report_year") or 0,
-                "filename": fig["filename"],
-                "image_path": fig.get("image_path") or "",
-                "created_at": datetime.now().isoformat(),
-            })
-
-    print(f"🔍 정밀 청크 {len(chunk_ids)}건 임베딩")
-    embed_and_upsert(chunk_collection, model, chunk_ids, chunk_docs, chunk_metas)
-
+    print(f"🧾 문서 {doc_count}건 / 페이지 대표 텍스트 {page_window.total}건 / 정밀 청크 {chunk_window.total}건 임베딩")
     print(f"✅ 페이지 컬렉션 벡터 수: {page_collection.count()}")
     print(f"✅ 청크 컬렉션 벡터 수: {chunk_collection.count()}")
 
 
-if __name__ == "__main__":
+def main(argv: List[str] | None = None, model: SentenceTransformer | None = None) -> int:
     parser = argparse.ArgumentParser()
     parser.add_argument("--reset", action="store_true", help="기존 벡터 DB를 초기화하고 재구축")
     parser.add_argument("--remote-host", type=str, default=None, help="원격 Chroma 서버 호스트 (예: 118.36.173.89)")
     parser.add_argument("--remote-port", type=int, default=None, help="원격 Chroma 서버 포트 (기본 8000)")
     parser.add_argument("--company", type=str, default=None, help="특정 회사명만 처리 (documents.company_name)")
     parser.add_argument("--year", type=int, default=None, help="특정 보고서 연도만 처리")
-    args = parser.parse_args()
+    parser.add_argument(
+        "--encode-workers",
+        type=int,
+        default=ENCODE_WORKERS,
+        help="임베딩 멀티프로세스 워커 수 (0/1이면 단일 프로세스, 기본: 환경변수 RAG_ENCODE_WORKERS)",
+    )
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=STREAM_WINDOW,
+        help="컬렉션별로 임베딩 전까지 모아 둘 최대 레코드 수 (메모리 상한)",
+    )
+    parser.add_argument("--resume", action="store_true", help="체크포인트에 기록된 완료 문서/페이지를 건너뛰고 이어서 구축")
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        default=None,
+        help="체크포인트 파일 경로 (기본: vector_db/build_checkpoint*.jsonl)",
+    )
+    parser.add_argument(
+        "--dedup",
+        choices=DEDUP_MODES,
+        default="off",
+        help="청크 중복 제거 방식 (exact: 정규화 텍스트 해시, near: 해시 + MinHash 근사 중복)",
+    )
+    parser.add_argument(
+        "--near-dup-threshold",
+        type=float,
+        default=NEAR_DUP_THRESHOLD,
+        help="near 모드에서 중복으로 볼 MinHash 유사도 하한",
+    )
+    parser.add_argument(
+        "--token-cache",
+        action="store_true",
+        help="청크를 Kiwi로 토큰화해 vector_db/chunk_tokens.* 캐시(공용 어휘 + uint32 토큰 id)로 저장",
+    )
+    parser.add_argument(
+        "--tokenize-workers",
+        type=int,
+        default=None,
+        help="Kiwi 토큰화 워커 프로세스 수 (기본: CPU 코어 수)",
+    )
+    args = parser.parse_args(argv)
 
     build_vector_db(
         reset=args.reset,
@@ -591,34 +981,18 @@ if __name__ == "__main__":
         remote_port=args.remote_port,
         company=args.company,
         report_year=args.year,
+        encode_workers=args.encode_workers,
+        window_size=args.window,
+        resume=args.resume,
+        checkpoint_path=args.checkpoint,
+        dedup_mode=args.dedup,
+        near_dup_threshold=args.near_dup_threshold,
+        token_cache=args.token_cache,
+        tokenize_workers=args.tokenize_workers,
+        model=model,
     )
-def summarize_page_with_gpt(client: OpenAI, page_no: int, context: str, image_path: Path | None) -> str:
-    """GPT-4o에게 페이지 요약을 요청한다. 이미지도 함께 첨부."""
-    if client is None:
-        raise RuntimeError("OPENAI_API_KEY가 설정되어 있지 않습니다.")
-    user_content = (
-        f"{PAGE_SUMMARY_PROMPT}\n\n"
-        f"[페이지 번호]\n{page_no}\n\n"
-        f"[페이지 본문 및 부가 정보]\n{context}"
-    )
-    content_payload: list[dict] = [{"type": "text", "text": user_content}]
-    if image_path and image_path.exists():
-        image_b64 = encode_image_base64(image_path)
-        content_payload.append(
-            {
-                "type": "input_image",
-                "image_url": {"url": f"data:image/png;base64,{image_b64}"},
-            }
-        )
-    resp = client.responses.create(
-        model="gpt-4o-mini",
-        input=[{"role": "user", "content": content_payload}],
-        temperature=0.3,
-        max_output_tokens=800,
-    )
-    for item in resp.output or []:
-        for content in getattr(item, "content", []) or []:
-            text = getattr(content, "text", None)
-            if text:
-                return text
-    raise RuntimeError(f"GPT 응답이 비었습니다. 페이지 {page_no}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,241 @@
+"""벡터 DB 구축용 청크 중복 제거 인덱스.
+
+보고서마다 반복되는 GRI 인덱스, 면책 문구, 섹션 헤더 같은 보일러플레이트를 한 번만 임베딩하기 위해
+정규화 텍스트 해시(정확 일치)와 선택적으로 MinHash(근사 중복)로 청크를 비교한다.
+중복으로 판정된 청크는 다시 임베딩하지 않고 `중복 id -> 대표 id` 매핑을 JSON Lines 파일에 남긴다.
+build_vector_db는 중복 청크도 자기 문서의 메타데이터와 `duplicate_of`로 저장하고 벡터만 대표 청크에서 복사하므로,
+회사/연도 필터 검색에서도 각 보고서의 청크가 그대로 잡힌다.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+DEDUP_INDEX_NAME = "chunk_dedup.jsonl"
+DEDUP_MODES = ("off", "exact", "near")
+NEAR_DUP_THRESHOLD = 0.9
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16
+SHINGLE_SIZE = 5
+# 숫자 구성이 다른 청크(연도별 수치 표 등)는 근사 중복으로 묶지 않는다.
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+# 표는 제목/구조가 같아도 수치가 다를 수 있으므로 정확 일치만 허용한다.
+NEAR_DUP_EXCLUDED_TYPES = {"table"}
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _permutation_params() -> List[tuple[int, int]]:
+    params: List[tuple[int, int]] = []
+    for idx in range(MINHASH_PERMUTATIONS):
+        digest = hashlib.blake2b(f"minhash-{idx}".encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "big") % _MERSENNE_PRIME or 1
+        b = int.from_bytes(digest[8:], "big") % _MERSENNE_PRIME
+        params.append((a, b))
+    return params
+
+
+_PERMUTATIONS = _permutation_params()
+
+
+def normalize_chunk_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "")
+    text = re.sub(r"\s+", " ", text)
+    return text.strip().lower()
+
+
+def exact_key(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def number_signature(normalized: str) -> str:
+    numbers = sorted(NUMBER_PATTERN.findall(normalized))
+    return hashlib.sha1("|".join(numbers).encode("utf-8")).hexdigest()
+
+
+def minhash_signature(normalized: str) -> List[int]:
+    if len(normalized) <= SHINGLE_SIZE:
+        shingles = {normalized}
+    else:
+        shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+    hashed = [
+        int.from_bytes(hashlib.blake2b(sh.encode("utf-8"), digest_size=4).digest(), "big")
+        for sh in shingles
+    ]
+    return [
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashed)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def _band_keys(signature: List[int]) -> List[str]:
+    rows = MINHASH_PERMUTATIONS // MINHASH_BANDS
+    return [
+        f"{band}:" + ",".join(str(v) for v in signature[band * rows:(band + 1) * rows])
+        for band in range(MINHASH_BANDS)
+    ]
+
+
+def estimate_jaccard(sig_a: List[int], sig_b: List[int]) -> float:
+    same = sum(1 for a, b in zip(sig_a, sig_b) if a == b)
+    return same / max(1, len(sig_a))
+
+
+@dataclass
+class DedupMatch:
+    canonical_id: str
+    kind: str
+    similarity: float = 1.0
+
+
+class ChunkDedupIndex:
+    """대표 청크 해시/MinHash를 보관하고 새 청크가 기존 대표와 중복인지 판정한다.
+
+    판정 결과는 commit() 전까지 메모리에만 두었다가 upsert가 끝난 뒤 파일에 반영한다.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        mode: str = "exact",
+        threshold: float = NEAR_DUP_THRESHOLD,
+        reset: bool = False,
+    ):
+        if mode not in DEDUP_MODES:
+            raise ValueError(f"지원하지 않는 dedup 모드입니다: {mode}")
+        self.path = path
+        self.mode = mode
+        self.threshold = threshold
+        self.exact: Dict[str, str] = {}
+        # 대표 id -> 현재 등록된 해시 (같은 id가 다른 텍스트로 다시 들어오면 이전 해시를 지운다)
+        self._key_of: Dict[str, str] = {}
+        self.signatures: Dict[str, tuple[List[int], str]] = {}
+        self.bands: Dict[str, Set[str]] = defaultdict(set)
+        self.duplicates: Dict[str, str] = {}
+        self._pending: List[dict] = []
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if reset and self.path.exists():
+            self.path.unlink()
+        self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        with self.path.open(encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self._apply(entry)
+
+    def _apply(self, entry: dict) -> None:
+        if entry.get("type") == "canonical":
+            record_id = entry["id"]
+            self._drop_canonical(record_id)
+            if self.exact.setdefault(entry["key"], record_id) == record_id:
+                self._key_of[record_id] = entry["key"]
+            if entry.get("sig"):
+                self._add_signature(record_id, entry["sig"], entry.get("num", ""))
+        elif entry.get("type") == "duplicate":
+            self._drop_canonical(entry["id"])
+            self.duplicates[entry["id"]] = entry["canonical"]
+
+    def _drop_canonical(self, record_id: str) -> None:
+        """record_id가 예전 텍스트로 등록한 해시/MinHash를 지워, 그 텍스트의 청크가 바뀐 id를 대표로 잡지 않게 한다."""
+        key = self._key_of.pop(record_id, None)
+        if key is not None and self.exact.get(key) == record_id:
+            del self.exact[key]
+        self.signatures.pop(record_id, None)
+
+    def _add_signature(self, record_id: str, signature: List[int], num_sig: str) -> None:
+        self.signatures[record_id] = (signature, num_sig)
+        for band in _band_keys(signature):
+            self.bands[band].add(record_id)
+
+    def _find_near(self, record_id: str, signature: List[int], num_sig: str) -> Optional[DedupMatch]:
+        candidates: Set[str] = set()
+        for band in _band_keys(signature):
+            candidates.update(self.bands.get(band, ()))
+        best: Optional[DedupMatch] = None
+        for cand_id in candidates:
+            if cand_id == record_id:
+                continue
+            if cand_id not in self.signatures:
+                continue  # 다른 텍스트로 바뀌었거나 중복이 된 이전 대표 (밴드에는 남아 있다)
+            cand_sig, cand_num = self.signatures[cand_id]
+            if cand_num != num_sig:
+                continue
+            similarity = estimate_jaccard(signature, cand_sig)
+            if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                best = DedupMatch(cand_id, "near", similarity)
+        return best
+
+    def check(self, record_id: str, text: str, source_type: str = "") -> Optional[DedupMatch]:
+        """중복이면 대표 청크 정보를, 아니면 None을 돌려주고 대표로 등록한다."""
+        if not self.enabled:
+            return None
+        normalized = normalize_chunk_text(text)
+        if not normalized:
+            return None
+        key = exact_key(normalized)
+        canonical = self.exact.get(key)
+        if canonical is not None and canonical != record_id:
+            return self._record_duplicate(record_id, DedupMatch(canonical, "exact"))
+
+        use_near = self.mode == "near" and source_type not in NEAR_DUP_EXCLUDED_TYPES
+        signature: List[int] = []
+        num_sig = ""
+        if use_near:
+            signature = minhash_signature(normalized)
+            num_sig = number_signature(normalized)
+            match = self._find_near(record_id, signature, num_sig)
+            if match is not None:
+                return self._record_duplicate(record_id, match)
+
+        entry = {"type": "canonical", "id": record_id, "key": key}
+        if use_near:
+            entry["sig"] = signature
+            entry["num"] = num_sig
+        self._apply(entry)
+        self.duplicates.pop(record_id, None)
+        self._pending.append(entry)
+        return None
+
+    def _record_duplicate(self, record_id: str, match: DedupMatch) -> DedupMatch:
+        entry = {
+            "type": "duplicate",
+            "id": record_id,
+            "canonical": match.canonical_id,
+            "kind": match.kind,
+            "similarity": round(match.similarity, 4),
+        }
+        self._apply(entry)
+        self._pending.append(entry)
+        return match
+
+    def commit(self) -> None:
+        if not self._pending:
+            return
+        with self.path.open("a", encoding="utf-8") as handle:
+            for entry in self._pending:
+                handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+        self._pending.clear()
@@ -0,0 +1,154 @@
+"""그림 지각 해시(dHash) 색인. 보고서/실행을 넘어 같은 그림의 GPT 설명을 재사용한다 (figure_ocr --dedupe).
+
+로고·아이콘·반복 인포그래픽은 한 보고서 안에서도, 같은 회사의 연도별 보고서 사이에서도 되풀이된다.
+figure_ocr는 GPT에 보내기 전에 그림 crop의 64비트 dHash와 RapidOCR 텍스트 서명을 계산해, 색인에서 해시가
+같고(기본 해밍 거리 0) 가로세로 비율이 비슷하며 그림 속 글자/숫자까지 같은 그림을 찾으면 그 설명을 그대로 쓴다.
+8x8 dHash는 배치가 같고 숫자만 다른 차트끼리도 겹치므로 해시만으로는 재사용하지 않는다.
+새로 설명한 그림은 색인에 추가한다.
+
+색인은 SQLite 파일 하나이며(기본 data/figure_index.sqlite3), 배치 적재처럼 여러 프로세스가 동시에 써도 된다.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+
+from PIL import Image
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_INDEX_PATH = REPO_ROOT / "data" / "figure_index.sqlite3"
+DEFAULT_MAX_DISTANCE = 0
+ASPECT_TOLERANCE = 0.1
+HASH_SIZE = 8
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS figures (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dhash TEXT NOT NULL,
+    aspect REAL NOT NULL,
+    model TEXT NOT NULL,
+    description TEXT NOT NULL,
+    source TEXT,
+    created_at REAL NOT NULL,
+    text_sig TEXT
+)
+"""
+
+
+def dhash(image_path: Path) -> tuple[int, float] | None:
+    """(64비트 difference hash, 가로/세로 비율). 이미지를 열 수 없으면 None."""
+    try:
+        with Image.open(image_path) as img:
+            width, height = img.size
+            gray = img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+    except OSError:
+        return None
+    pixels = list(gray.getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | int(pixels[offset + col] < pixels[offset + col + 1])
+    return value, width / max(1, height)
+
+
+def is_informative_hash(value: int) -> bool:
+    """단색/그라데이션 이미지는 모두 0(또는 전부 1) 근처로 모여 서로 다른 그림끼리 겹치므로 쓰지 않는다."""
+    bits = value.bit_count()
+    return 4 <= bits <= HASH_SIZE * HASH_SIZE - 4
+
+
+def hash_distance(first: tuple[int, float], second: tuple[int, float]) -> int | None:
+    """두 (dHash, 비율)의 해밍 거리. 비율 차이가 ASPECT_TOLERANCE를 넘으면 None."""
+    (value_a, aspect_a), (value_b, aspect_b) = first, second
+    if abs(aspect_a - aspect_b) > ASPECT_TOLERANCE * max(aspect_a, aspect_b):
+        return None
+    return (value_a ^ value_b).bit_count()
+
+
+def text_signature(texts: list[str]) -> str:
+    """OCR로 읽은 그림 속 글자/숫자의 서명. 공백·대소문자·전각 차이는 무시하고 순서는 유지한다."""
+    normalized = unicodedata.normalize("NFKC", "|".join(texts or []))
+    normalized = re.sub(r"\s+", "", normalized).lower()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def is_near_duplicate(first: tuple[int, float], second: tuple[int, float], max_distance: int) -> bool:
+    if not is_informative_hash(first[0]):
+        return False
+    distance = hash_distance(first, second)
+    return distance is not None and distance <= max_distance
+
+
+@dataclass
+class IndexedFigure:
+    dhash: int
+    aspect: float
+    description: str
+    source: str | None
+    text_sig: str | None = None
+
+
+class FigureHashIndex:
+    """모델별 dHash → 설명 색인. 시작할 때 해당 모델 항목을 메모리로 읽어 선형 검색한다."""
+
+    def __init__(self, path: Path, model: str, max_distance: int = DEFAULT_MAX_DISTANCE):
+        self.path = path
+        self.model = model
+        self.max_distance = max_distance
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(INDEX_SCHEMA)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(figures)")}
+            if "text_sig" not in columns:
+                # 텍스트 서명 없이 쌓인 이전 항목은 NULL로 남아 더 이상 재사용되지 않는다.
+                self._conn.execute("ALTER TABLE figures ADD COLUMN text_sig TEXT")
+            rows = self._conn.execute(
+                "SELECT dhash, aspect, description, source, text_sig FROM figures WHERE model = ?", (model,)
+            ).fetchall()
+        self._entries = [IndexedFigure(int(row[0], 16), row[1], row[2], row[3], row[4]) for row in rows]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, value: int, aspect: float, text_sig: str) -> IndexedFigure | None:
+        """해밍 거리가 max_distance 이하이고 비율이 비슷하며 OCR 텍스트 서명이 같은 항목 중 가장 가까운 것."""
+        if not is_informative_hash(value):
+            return None
+        best: IndexedFigure | None = None
+        best_distance = self.max_distance + 1
+        with self._lock:
+            entries = list(self._entries)
+        for entry in entries:
+            if entry.text_sig is None or entry.text_sig != text_sig:
+                continue
+            distance = hash_distance((entry.dhash, entry.aspect), (value, aspect))
+            if distance is not None and distance < best_distance:
+                best, best_distance = entry, distance
+                if distance == 0:
+                    break
+        return best
+
+    def add(self, value: int, aspect: float, text_sig: str, description: str, source: str | None = None) -> None:
+        if not is_informative_hash(value):
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO figures (dhash, aspect, model, description, source, created_at, text_sig)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (f"{value:016x}", aspect, self.model, description, source, time.time(), text_sig),
+            )
+            self._entries.append(IndexedFigure(value, aspect, description, source, text_sig))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -3,18 +3,34 @@
 from __future__ import annotations
 
 import argparse
-import base64
-import json
+import asyncio
+import multiprocessing
 import os
+import random
 import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Iterable, List
 
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import APIConnectionError, APITimeoutError, AsyncOpenAI, InternalServerError, RateLimitError
 from PIL import Image, ImageStat
 from rapidocr import RapidOCR
 
+from image_variants import image_data_url
+from figure_index import (
+    DEFAULT_INDEX_PATH,
+    DEFAULT_MAX_DISTANCE,
+    FigureHashIndex,
+    dhash,
+    is_informative_hash,
+    is_near_duplicate,
+    text_signature,
+)
+import pipeline_metrics
+from page_metadata import PageMetadata
+from stage_manifest import StageManifest, hash_payload, hash_text
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 DEFAULT_STRUCTURED_DIR = REPO_ROOT / "data" / "pages_structured"
@@ -23,6 +39,12 @@ MIN_AREA_RATIO = 0.01
 HEADER_RATIO = 0.12
 FIGURE_TEXT_MIN_TOKENS = 1
 TEXT_TOKEN_PATTERN = re.compile(r"[0-9A-Za-z가-힣]")
+STAGE_VERSION = "1"
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 4
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
 
 load_dotenv()
 
@@ -67,10 +89,6 @@ def parse_pages_arg(expr: str, available: Iterable[int]) -> list[int]:
     return final
 
 
-def encode_image_base64(path: Path) -> str:
-    return base64.b64encode(path.read_bytes()).decode("utf-8")
-
-
 def estimate_page_dims(page_data: dict) -> tuple[float | None, float | None]:
     dims = page_data.get("page_dimensions") or {}
     width = dims.get("width")
@@ -88,27 +106,25 @@ def estimate_page_dims(page_data: dict) -> tuple[float | None, float | None]:
     return (max_right or None, max_top or None)
 
 
-def describe_figure(client: OpenAI, model: str, image_path: Path, prompt: str) -> str:
-    image_b64 = encode_image_base64(image_path)
-    image_url = f"data:image/png;base64,{image_b64}"
-
-    completion = client.chat.completions.create(
-        model=model,
-        temperature=0.2,
-        messages=[
-            {
-                "role": "system",
-                "content": "당신은 ESG 보고서 그림을 해석하는 분석가입니다.",
-            },
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": image_url}},
-                ],
-            },
-        ],
-    )
+def build_figure_messages(image_path: Path, prompt: str) -> list[dict]:
+    # structured_extract가 만든 GPT용 압축본(*.gpt.webp)이 있으면 그것을 보낸다.
+    image_url = image_data_url(image_path)
+    return [
+        {
+            "role": "system",
+            "content": "당신은 ESG 보고서 그림을 해석하는 분석가입니다.",
+        },
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": {"url": image_url}},
+            ],
+        },
+    ]
+
+
+def completion_text(completion) -> str:
     choices = getattr(completion, "choices", [])
     if not choices:
         return ""
@@ -124,6 +140,30 @@ def describe_figure(client: OpenAI, model: str, image_path: Path, prompt: str) -
     return "".join(chunks).strip()
 
 
+async def describe_figure_async(
+    client: AsyncOpenAI,
+    model: str,
+    image_path: Path,
+    prompt: str,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+) -> str:
+    """일시적 오류(429/5xx/연결/시간 초과)는 지수 백오프(+지터)로 max_retries번까지 다시 시도한다."""
+    messages = build_figure_messages(image_path, prompt)
+    for attempt in range(max_retries + 1):
+        try:
+            completion = await client.chat.completions.create(model=model, temperature=0.2, messages=messages)
+            pipeline_metrics.record_gpt_usage(completion)
+            return completion_text(completion)
+        except RETRYABLE_ERRORS as exc:
+            if attempt >= max_retries:
+                raise
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)) * (0.5 + random.random())
+            print(f"[RETRY] {image_path.name} {type(exc).__name__} -> {delay:.1f}s 후 재시도 ({attempt + 1}/{max_retries})")
+            pipeline_metrics.count("gpt_retries")
+            await asyncio.sleep(delay)
+    return ""
+
+
 def is_photo_like(image_path: Path) -> bool:
     try:
         img = Image.open(image_path).convert("RGB")
@@ -138,16 +178,311 @@ def is_photo_like(image_path: Path) -> bool:
     return color_ratio > 0.28 and sat_mean > 55
 
 
-def update_page_metadata(page_json_path: Path, figure_id: str, desc_rel_path: str) -> None:
-    data = json.loads(page_json_path.read_text(encoding="utf-8"))
-    changed = False
-    for figure in data.get("figures", []):
-        if figure.get("id") == figure_id:
-            figure["description_path"] = desc_rel_path
-            changed = True
-            break
-    if changed:
-        page_json_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+_WORKER_DETECTOR: RapidOCR | None = None
+
+
+def figure_texts(text_detector: RapidOCR, image_path: Path) -> list[str]:
+    detected = text_detector(str(image_path))
+    return [txt for txt in (detected.txts or []) if txt]
+
+
+def has_figure_text(texts: list[str]) -> bool:
+    return sum(1 for txt in texts if TEXT_TOKEN_PATTERN.search(txt)) >= FIGURE_TEXT_MIN_TOKENS
+
+
+def figure_text_signature(text_detector: RapidOCR, image_path: Path) -> str:
+    """그림 속 글자/숫자 서명. 배치가 같고 수치만 다른 차트를 같은 그림으로 보지 않기 위해 쓴다."""
+    return text_signature(figure_texts(text_detector, image_path))
+
+
+def inspect_figure(text_detector: RapidOCR, image_path: Path) -> tuple[bool, str]:
+    """RapidOCR 한 번으로 (텍스트 없는 사진 여부, 텍스트 서명)을 함께 구한다."""
+    texts = figure_texts(text_detector, image_path)
+    textless = not has_figure_text(texts) and is_photo_like(image_path)
+    return textless, text_signature(texts)
+
+
+def _init_filter_worker() -> None:
+    global _WORKER_DETECTOR
+    _WORKER_DETECTOR = RapidOCR()
+
+
+def _inspect_figure(image_path: str) -> tuple[bool, str]:
+    """워커 프로세스 진입점."""
+    return inspect_figure(_WORKER_DETECTOR, Path(image_path))
+
+
+def inspect_figures(
+    image_paths: list[Path],
+    text_detector: RapidOCR | None,
+    workers: int,
+) -> dict[Path, tuple[bool, str]]:
+    """그림마다 (텍스트 없는 사진 여부, 텍스트 서명). workers > 1이면 프로세스 풀에서 나눠 처리한다."""
+    if not image_paths:
+        return {}
+    if workers <= 1 or len(image_paths) <= 1:
+        if text_detector is None:
+            text_detector = RapidOCR()
+        return {path: inspect_figure(text_detector, path) for path in image_paths}
+
+    worker_count = min(workers, len(image_paths))
+    print(f"🧩 [Filter] 그림 {len(image_paths)}개를 {worker_count}개 프로세스로 검사합니다.")
+    # 워커끼리 onnxruntime 스레드를 나눠 쓰게 하되, 풀이 끝나면 되돌려 runner 프로세스 환경에 남기지 않는다.
+    previous_threads = os.environ.get("OMP_NUM_THREADS")
+    if previous_threads is None:
+        os.environ["OMP_NUM_THREADS"] = str(max(1, (os.cpu_count() or 1) // worker_count))
+    try:
+        with ProcessPoolExecutor(
+            max_workers=worker_count,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_filter_worker,
+        ) as executor:
+            results = executor.map(_inspect_figure, [str(path) for path in image_paths], chunksize=4)
+            return dict(zip(image_paths, results))
+    finally:
+        if previous_threads is None:
+            os.environ.pop("OMP_NUM_THREADS", None)
+
+
+@dataclass
+class FigureJob:
+    """GPT 설명 후보 그림 1건과 결과를 기록할 위치."""
+
+    page_meta: PageMetadata
+    figure_id: str
+    image_path: Path
+    desc_path: Path
+    rel_path: str
+    input_hash: str
+    prompt: str
+    fingerprint: tuple[int, float] | None = None
+    text_sig: str | None = None
+
+    @property
+    def dedupe_candidate(self) -> bool:
+        """dHash가 정보량이 있어 같은 그림 판정/재사용 대상이 되는지."""
+        return self.fingerprint is not None and is_informative_hash(self.fingerprint[0])
+
+
+def build_figure_prompt(context_text: str) -> str:
+    return (
+        "다음은 해당 페이지 본문 일부입니다. 이 문맥을 참고하여 그림이 전달하는 인사이트를 설명하세요.\n"
+        f"[본문]\n{context_text}\n"
+        "\n"
+        "- 그림 안의 모든 텍스트를 반드시 언급하고, 특히 숫자들은 정확하게 언급하세요 .\n"
+        "- 축/범례/강조 영역은 실제로 보일 때만 언급하고, 없으면 언급하지 마세요."
+    )
+
+
+def collect_page_figures(
+    structured_dir: Path,
+    page_dir: Path,
+    page_meta: PageMetadata,
+    args: argparse.Namespace,
+    manifest: StageManifest,
+) -> list[FigureJob]:
+    """아이콘/헤더 그림을 거르고, 입력이 바뀌지 않은 그림은 메타데이터만 다시 연결한 뒤 나머지를 돌려준다."""
+    figures_dir = page_dir / "figures"
+    page_width, page_height = estimate_page_dims(page_meta.data)
+    header_cutoff = page_height * (1 - HEADER_RATIO) if page_height else None
+
+    page_md_path = page_dir / "page.md"
+    context_text = page_md_path.read_text(encoding="utf-8")[:2000] if page_md_path.exists() else ""
+
+    jobs: list[FigureJob] = []
+    for figure in page_meta.items("figures"):
+        figure_id = figure.get("id")
+        if not figure_id:
+            continue
+        image_path = figures_dir / f"{figure_id}.png"
+        if not image_path.exists():
+            continue
+
+        bbox = figure.get("bbox") or {}
+        skip = False
+        if page_width and page_height:
+            width = max(0.0, bbox.get("right", 0) - bbox.get("left", 0))
+            height = max(0.0, bbox.get("top", 0) - bbox.get("bottom", 0))
+            area_ratio = (width * height) / (page_width * page_height)
+            if area_ratio < MIN_AREA_RATIO:
+                print(f"[SKIP ICON] {image_path} (area ratio={area_ratio:.4f})")
+                skip = True
+            elif header_cutoff and bbox.get("bottom", 0) >= header_cutoff:
+                print(f"[SKIP HEADER] {image_path} (within header zone)")
+                skip = True
+        if skip:
+            continue
+
+        desc_path = image_path.with_suffix(".desc.md")
+        rel_path = str(desc_path.relative_to(structured_dir))
+        input_hash = hash_payload(
+            "figure_ocr", STAGE_VERSION, args.model, manifest.file_digest(image_path), hash_text(context_text)
+        )
+        if not args.overwrite and desc_path.exists() and not manifest.has_entry("figure_ocr", rel_path):
+            # manifest 도입 전에 만든 설명은 GPT 비용을 아끼기 위해 현재 입력 기준으로 그대로 채택한다.
+            manifest.record("figure_ocr", rel_path, input_hash, [desc_path])
+        if not args.overwrite and manifest.is_fresh("figure_ocr", rel_path, input_hash):
+            page_meta.update_item("figures", figure_id, description_path=rel_path)
+            print(f"[SKIP] {desc_path} (입력 변경 없음)")
+            pipeline_metrics.count("figures_skipped")
+            continue
+
+        jobs.append(
+            FigureJob(page_meta, figure_id, image_path, desc_path, rel_path, input_hash, build_figure_prompt(context_text))
+        )
+    return jobs
+
+
+def save_description(job: FigureJob, description: str, manifest: StageManifest) -> None:
+    job.desc_path.write_text(description, encoding="utf-8")
+    job.page_meta.update_item("figures", job.figure_id, description_path=job.rel_path)
+    manifest.record("figure_ocr", job.rel_path, job.input_hash, [job.desc_path])
+    pipeline_metrics.count("figures")
+
+
+def group_duplicate_jobs(
+    jobs: list[FigureJob],
+    figure_index: FigureHashIndex | None,
+    manifest: StageManifest,
+    text_detector: RapidOCR | None,
+) -> list[tuple[FigureJob, list[FigureJob]]]:
+    """색인에 있는 그림은 바로 설명을 재사용하고, 남은 그림은 이번 실행 안의 같은 그림끼리 묶는다.
+
+    같은 그림은 dHash(기본 거리 0)와 RapidOCR 텍스트 서명이 모두 같아야 한다. 묶음마다 대표 그림 하나만
+    GPT로 설명하고 나머지는 그 결과를 그대로 쓴다. 지문/서명은 보통 describe_pages가 미리(CPU 풀) 채워 두고,
+    비어 있을 때만 여기서 계산한다.
+    """
+    groups: list[tuple[FigureJob, list[FigureJob]]] = []
+    for job in jobs:
+        if figure_index is None:
+            groups.append((job, []))
+            continue
+        if job.fingerprint is None:
+            job.fingerprint = dhash(job.image_path)
+        if not job.dedupe_candidate:
+            groups.append((job, []))
+            continue
+        if job.text_sig is None:
+            if text_detector is None:
+                text_detector = RapidOCR()
+            job.text_sig = figure_text_signature(text_detector, job.image_path)
+        match = figure_index.lookup(*job.fingerprint, job.text_sig)
+        if match is not None:
+            save_description(job, match.description, manifest)
+            print(f"[REUSE] {job.image_path} <- {match.source} (dHash + OCR 텍스트 일치)")
+            pipeline_metrics.count("figures_reused")
+            continue
+        for leader, followers in groups:
+            if (
+                leader.fingerprint
+                and leader.text_sig == job.text_sig
+                and is_near_duplicate(job.fingerprint, leader.fingerprint, figure_index.max_distance)
+            ):
+                followers.append(job)
+                break
+        else:
+            groups.append((job, []))
+    return groups
+
+
+async def describe_groups(
+    groups: list[tuple[FigureJob, list[FigureJob]]],
+    args: argparse.Namespace,
+    client: AsyncOpenAI,
+    manifest: StageManifest,
+    figure_index: FigureHashIndex | None,
+    structured_dir: Path,
+) -> int:
+    """대표 그림을 최대 args.concurrency개씩 동시에 설명하고, 끝나는 대로 결과를 기록한다.
+
+    재시도 후에도 실패한 묶음은 기록하지 않고(다음 실행에서 다시 시도) 나머지 묶음을 계속 처리한 뒤,
+    설명하지 못한 그림 수(대표 + 같은 묶음)를 돌려준다.
+    """
+    semaphore = asyncio.Semaphore(max(1, args.concurrency))
+
+    async def run(leader: FigureJob, followers: list[FigureJob]):
+        async with semaphore:
+            try:
+                description = await describe_figure_async(
+                    client, args.model, leader.image_path, leader.prompt, args.max_retries
+                )
+            except Exception as exc:
+                print(f"⚠️ [Figure] {leader.image_path} 설명 실패: {exc}")
+                description = None
+        return leader, followers, description
+
+    failed = 0
+    for future in asyncio.as_completed([run(leader, followers) for leader, followers in groups]):
+        leader, followers, description = await future
+        if description is None:
+            failed += 1 + len(followers)
+            continue
+        if not description:
+            description = "(GPT 응답이 비었습니다.)"
+        elif figure_index is not None and leader.fingerprint and leader.text_sig is not None:
+            source = f"{structured_dir.name}/{leader.image_path.relative_to(structured_dir)}"
+            figure_index.add(*leader.fingerprint, leader.text_sig, description, source=source)
+        save_description(leader, description, manifest)
+        print(f"설명 생성: {leader.image_path} -> {leader.desc_path}")
+        for follower in followers:
+            save_description(follower, description, manifest)
+            print(f"[REUSE] {follower.image_path} <- {leader.image_path.name} (같은 실행)")
+            pipeline_metrics.count("figures_reused")
+    return failed
+
+
+def describe_pages(
+    structured_dir: Path,
+    target_pages: list[int],
+    args: argparse.Namespace,
+    client: AsyncOpenAI,
+    text_detector: RapidOCR | None,
+    manifest: StageManifest,
+    figure_index: FigureHashIndex | None = None,
+) -> int:
+    """1) 페이지별 후보 수집 2) RapidOCR 검사(CPU 풀): 텍스트 없는 사진 거르기 + --dedupe 텍스트 서명
+    3) 색인 재사용/중복 묶기 4) GPT 동시 설명.
+
+    설명하지 못한 그림 수를 돌려준다.
+    """
+    failed = 0
+    page_metas: list[PageMetadata] = []
+    try:
+        jobs: list[FigureJob] = []
+        for page_no in target_pages:
+            page_dir = structured_dir / f"page_{page_no:04d}"
+            if not (page_dir / "figures").exists():
+                continue
+            page_json_path = page_dir / "page.json"
+            if not page_json_path.exists():
+                continue
+            # page.json 수정은 페이지 단위로 모아 한 번만 저장한다.
+            page_meta = PageMetadata(page_json_path)
+            page_metas.append(page_meta)
+            jobs.extend(collect_page_figures(structured_dir, page_dir, page_meta, args, manifest))
+
+        # 사진 판정과 중복 판정용 텍스트 서명을 그림마다 OCR 한 번으로 함께 구한다.
+        if figure_index is not None:
+            for job in jobs:
+                job.fingerprint = dhash(job.image_path)
+        ocr_jobs = [job for job in jobs if args.skip_textless or (figure_index is not None and job.dedupe_candidate)]
+        inspected = inspect_figures([job.image_path for job in ocr_jobs], text_detector, args.filter_workers)
+        photos: set[Path] = set()
+        for job in ocr_jobs:
+            textless, job.text_sig = inspected[job.image_path]
+            if args.skip_textless and textless:
+                print(f"[SKIP PHOTO] {job.image_path} (textless photo)")
+                photos.add(job.image_path)
+        jobs = [job for job in jobs if job.image_path not in photos]
+
+        groups = group_duplicate_jobs(jobs, figure_index, manifest, text_detector)
+        if groups:
+            print(f"🤖 [Figure] GPT 설명 {len(groups)}건 (동시 {args.concurrency}개)")
+            failed = asyncio.run(describe_groups(groups, args, client, manifest, figure_index, structured_dir))
+    finally:
+        for page_meta in page_metas:
+            page_meta.flush()
+    return failed
 
 
 def build_arg_parser() -> argparse.ArgumentParser:
@@ -181,7 +516,7 @@ def build_arg_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--overwrite",
         action="store_true",
-        help="기존 설명 파일이 있어도 다시 생성.",
+        help="manifest 기록상 입력이 바뀌지 않은 그림도 설명을 다시 생성.",
     )
     parser.add_argument(
         "--skip-textless",
@@ -189,10 +524,49 @@ def build_arg_parser() -> argparse.ArgumentParser:
         default=False,
         help="텍스트/숫자가 감지되지 않는 사진은 설명하지 않는다 (--skip-textless로 켜기, 기본 off).",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="동시에 보낼 GPT 설명 요청 수.",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=DEFAULT_MAX_RETRIES,
+        help="429/5xx/연결 오류 시 지수 백오프로 다시 시도할 횟수.",
+    )
+    parser.add_argument(
+        "--filter-workers",
+        type=int,
+        default=1,
+        help="RapidOCR 그림 검사(--skip-textless 사진 판정, --dedupe 텍스트 서명)를 나눠 처리할 프로세스 수.",
+    )
+    parser.add_argument(
+        "--dedupe",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help=(
+            "dHash + RapidOCR 텍스트 서명이 같은 그림은 이전 설명을 재사용 (기본 off). "
+            "재사용한 설명은 다른 페이지의 본문 문맥으로 만든 것일 수 있다."
+        ),
+    )
+    parser.add_argument(
+        "--figure-index",
+        type=Path,
+        default=DEFAULT_INDEX_PATH,
+        help="보고서/실행 간에 공유하는 그림 dHash 색인(SQLite) 경로.",
+    )
+    parser.add_argument(
+        "--dedupe-distance",
+        type=int,
+        default=DEFAULT_MAX_DISTANCE,
+        help="같은 그림으로 볼 최대 dHash 해밍 거리 (64비트 중, 기본 0=완전 일치). OCR 텍스트 서명은 항상 같아야 한다.",
+    )
     return parser
 
 
-def main(argv: List[str] | None = None) -> int:
+def main(argv: List[str] | None = None, text_detector: RapidOCR | None = None) -> int:
     parser = build_arg_parser()
     args = parser.parse_args(argv)
 
@@ -210,75 +584,29 @@ def main(argv: List[str] | None = None) -> int:
         target_pages = available
 
     api_key = load_api_key(args.api_key)
-    client = OpenAI(api_key=api_key)
-    text_detector: RapidOCR | None = RapidOCR() if args.skip_textless else None
-    for page_no in target_pages:
-        page_dir = structured_dir / f"page_{page_no:04d}"
-        figures_dir = page_dir / "figures"
-        if not figures_dir.exists():
-            continue
-        page_json_path = page_dir / "page.json"
-        if not page_json_path.exists():
-            continue
-
-        page_data = json.loads(page_json_path.read_text(encoding="utf-8"))
-        page_width, page_height = estimate_page_dims(page_data)
-        header_cutoff = page_height * (1 - HEADER_RATIO) if page_height else None
-
-        page_md_path = page_dir / "page.md"
-        context_text = page_md_path.read_text(encoding="utf-8")[:2000] if page_md_path.exists() else ""
-
-        for figure in page_data.get("figures", []):
-            figure_id = figure.get("id")
-            if not figure_id:
-                continue
-            image_path = figures_dir / f"{figure_id}.png"
-            if not image_path.exists():
-                continue
-
-            bbox = figure.get("bbox") or {}
-            skip = False
-            if page_width and page_height:
-                width = max(0.0, bbox.get("right", 0) - bbox.get("left", 0))
-                height = max(0.0, bbox.get("top", 0) - bbox.get("bottom", 0))
-                area_ratio = (width * height) / (page_width * page_height)
-                if area_ratio < MIN_AREA_RATIO:
-                    print(f"[SKIP ICON] {image_path} (area ratio={area_ratio:.4f})")
-                    skip = True
-                elif header_cutoff and bbox.get("bottom", 0) >= header_cutoff:
-                    print(f"[SKIP HEADER] {image_path} (within header zone)")
-                    skip = True
-            if skip:
-                continue
-
-            if args.skip_textless and text_detector is not None:
-                detected = text_detector(str(image_path))
-                texts = [txt for txt in (detected.txts or []) if txt and TEXT_TOKEN_PATTERN.search(txt)]
-                if len(texts) < FIGURE_TEXT_MIN_TOKENS and is_photo_like(image_path):
-                    print(f"[SKIP PHOTO] {image_path} (textless photo)")
-                    continue
-
-            desc_path = image_path.with_suffix(".desc.md")
-            if desc_path.exists() and not args.overwrite:
-                print(f"[SKIP] {desc_path} (이미 존재)")
-                continue
-
-            prompt = (
-                "다음은 해당 페이지 본문 일부입니다. 이 문맥을 참고하여 그림이 전달하는 인사이트를 설명하세요.\n"
-                f"[본문]\n{context_text}\n"
-                "\n"
-                "- 그림 안의 모든 텍스트를 반드시 언급하고, 특히 숫자들은 정확하게 언급하세요 .\n"
-                "- 축/범례/강조 영역은 실제로 보일 때만 언급하고, 없으면 언급하지 마세요."
-            )
-
-            description = describe_figure(client, args.model, image_path, prompt)
-            if not description:
-                description = "(GPT 응답이 비었습니다.)"
-            desc_path.write_text(description, encoding="utf-8")
-            rel_path = desc_path.relative_to(structured_dir)
-            update_page_metadata(page_json_path, figure_id, str(rel_path))
-            print(f"설명 생성: {image_path} -> {desc_path}")
-
+    # 재시도는 describe_figure_async에서 직접 백오프하므로 클라이언트 자체 재시도는 끈다.
+    client = AsyncOpenAI(api_key=api_key, max_retries=0)
+    # 프로세스 풀로 그림을 검사할 때는 워커마다 RapidOCR를 따로 만든다.
+    if not (args.dedupe or args.skip_textless) or args.filter_workers > 1:
+        text_detector = None
+    elif text_detector is None:
+        text_detector = RapidOCR()
+    figure_index = None
+    if args.dedupe:
+        figure_index = FigureHashIndex(args.figure_index, args.model, args.dedupe_distance)
+        print(f"INFO: 그림 dHash 색인 {len(figure_index)}건 로드 ({args.figure_index})")
+    manifest = StageManifest(structured_dir)
+    try:
+        failed = describe_pages(structured_dir, target_pages, args, client, text_detector, manifest, figure_index)
+    finally:
+        manifest.save()
+        if figure_index is not None:
+            figure_index.close()
+
+    if failed:
+        pipeline_metrics.count("figures_failed", failed)
+        print(f"❌ [Figure] 그림 {failed}개의 설명을 만들지 못했습니다. 다시 실행하면 실패한 그림만 다시 시도합니다.")
+        return 1
     return 0
 
 
@@ -0,0 +1,137 @@
+"""GPT 전송용 이미지 변형본(WebP/JPEG) 유틸.
+
+structured_extract는 페이지/표/그림 PNG를 렌더링 배율 그대로 저장한다. GPT Vision은 큰 이미지를 어차피
+줄여서 보므로, 원본 PNG 옆에 긴 변을 제한한 손실 압축본(`table_001.gpt.webp` 등)을 함께 저장하고
+GPT로 보내는 코드는 변형본이 있으면 그것을 읽는다. 원본 PNG는 OCR/dHash/화면 표시용으로 그대로 둔다.
+
+변형본이 없으면(이전 실행 산출물, --image-variant none) 원본 PNG를 그대로 보낸다. 원본을 다시 저장할 때 다른
+형식의 변형본은 지우고, 원본보다 오래된 변형본은 찾지 않으므로 이전 렌더링이 GPT로 가지 않는다.
+"""
+
+from __future__ import annotations
+
+import base64
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+
+try:
+    from PIL import Image
+
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+VARIANT_TAG = "gpt"
+# 형식 이름 -> (확장자, MIME, PIL 저장 형식)
+VARIANT_FORMATS = {
+    "webp": ("webp", "image/webp", "WEBP"),
+    "jpeg": ("jpg", "image/jpeg", "JPEG"),
+}
+DEFAULT_VARIANT_FORMAT = "webp"
+# GPT Vision high detail은 긴 변 2048px 안으로 줄여 처리하므로 그보다 크게 보낼 이유가 없다.
+DEFAULT_VARIANT_MAX_SIDE = 2048
+# 표 숫자/작은 글씨가 뭉개지지 않도록 품질은 넉넉하게 둔다.
+DEFAULT_VARIANT_QUALITY = 85
+MIME_BY_SUFFIX = {
+    ".png": "image/png",
+    ".webp": "image/webp",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+}
+
+
+@dataclass(frozen=True)
+class VariantSpec:
+    fmt: str = DEFAULT_VARIANT_FORMAT
+    max_side: int = DEFAULT_VARIANT_MAX_SIDE
+    quality: int = DEFAULT_VARIANT_QUALITY
+
+
+def build_variant_spec(fmt: str, max_side: int, quality: int) -> VariantSpec | None:
+    """CLI 값으로 VariantSpec을 만든다. fmt가 "none"이면 None (변형본을 만들지 않음)."""
+    if fmt == "none":
+        return None
+    return VariantSpec(fmt, max_side, quality)
+
+
+def variant_path(image_path: Path, fmt: str) -> Path:
+    """page.png -> page.gpt.webp"""
+    suffix = VARIANT_FORMATS[fmt][0]
+    return image_path.with_name(f"{image_path.stem}.{VARIANT_TAG}.{suffix}")
+
+
+def find_variant(image_path: Path) -> Path | None:
+    """image_path의 변형본. 원본보다 먼저 저장된(이전 렌더링의) 변형본은 무시한다."""
+    try:
+        source_mtime = image_path.stat().st_mtime_ns
+    except OSError:
+        source_mtime = None
+    for fmt in VARIANT_FORMATS:
+        candidate = variant_path(image_path, fmt)
+        try:
+            candidate_mtime = candidate.stat().st_mtime_ns
+        except OSError:
+            continue
+        if source_mtime is None or candidate_mtime >= source_mtime:
+            return candidate
+    return None
+
+
+def remove_variants(image_path: Path, keep: str | None = None) -> None:
+    """image_path의 변형본 중 keep 형식이 아닌 것을 지운다 (keep이 None이면 모두)."""
+    for fmt in VARIANT_FORMATS:
+        if fmt != keep:
+            variant_path(image_path, fmt).unlink(missing_ok=True)
+
+
+def encode_variant(image, spec: VariantSpec) -> bytes:
+    """PIL 이미지를 긴 변 spec.max_side 이하로 줄여 spec.fmt로 인코딩한다."""
+    width, height = image.size
+    if spec.max_side > 0 and max(width, height) > spec.max_side:
+        ratio = spec.max_side / max(width, height)
+        image = image.resize((max(1, round(width * ratio)), max(1, round(height * ratio))), Image.LANCZOS)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, format=VARIANT_FORMATS[spec.fmt][2], quality=spec.quality)
+    return buffer.getvalue()
+
+
+def write_variant(image, image_path: Path, spec: VariantSpec | None) -> Path | None:
+    """원본 image_path 옆에 변형본을 저장한다. spec이 None이거나 Pillow가 없으면 만들지 않는다.
+
+    다른 형식(또는 만들지 않을 때는 모든 형식)의 이전 변형본은 지워 새 원본과 어긋난 이미지가 남지 않게 한다.
+    """
+    keep = spec.fmt if spec is not None and HAS_PIL else None
+    remove_variants(image_path, keep)
+    if keep is None:
+        return None
+    path = variant_path(image_path, spec.fmt)
+    path.write_bytes(encode_variant(image, spec))
+    return path
+
+
+def gpt_image_path(image_path: Path) -> Path:
+    """GPT로 보낼 파일: 변형본이 있으면 변형본, 없으면 원본."""
+    return find_variant(image_path) or image_path
+
+
+def bytes_to_data_url(data: bytes, mime: str) -> str:
+    return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def image_data_url(image_path: Path) -> str:
+    """GPT image_url에 넣을 data URL. 실제로 읽은 파일 형식에 맞는 MIME을 붙인다."""
+    path = gpt_image_path(image_path)
+    mime = MIME_BY_SUFFIX.get(path.suffix.lower(), "image/png")
+    return bytes_to_data_url(path.read_bytes(), mime)
+
+
+def pil_data_url(image, spec: VariantSpec | None) -> str:
+    """메모리의 PIL 이미지를 data URL로 만든다. spec이 없으면 PNG 그대로."""
+    if spec is None:
+        buffer = BytesIO()
+        image.save(buffer, format="PNG")
+        return bytes_to_data_url(buffer.getvalue(), "image/png")
+    return bytes_to_data_url(encode_variant(image, spec), VARIANT_FORMATS[spec.fmt][1])
@@ -0,0 +1,245 @@
+"""Kiwi 형태소 토큰화 워커 풀과 청크 토큰 캐시.
+
+`search_vector_db.tokenize()`와 같은 규칙으로 토큰을 만들되, 워커 프로세스마다 Kiwi를 하나씩 띄워
+청크 묶음 단위로 병렬 처리한다. 결과는 공용 어휘(vocab)에 대한 uint32 토큰 id 배열로 보관한다.
+
+캐시 파일 구성 (`<prefix>` 기준)
+- `<prefix>.bin`: 모든 청크의 토큰 id를 이어 붙인 uint32 배열
+- `<prefix>.idx.jsonl`: 청크 id별 `offset`/`length`/`hash`(토큰화한 텍스트 해시)
+- `<prefix>.vocab.json`: 토큰 문자열 목록 (index = 토큰 id)
+
+search_vector_db는 BM25를 계산할 때 캐시에 있고 텍스트 해시가 같은 청크는 Kiwi를 다시 돌리지 않는다.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import multiprocessing
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TOKENIZE_CHUNK_SIZE = 64
+TOKEN_TYPECODE = "I"
+
+_WORKER_KIWI = None
+
+
+def token_forms(kiwi, text: str) -> List[str]:
+    """Kiwi 토큰 중 공백이 아닌 형태만 돌려준다 (검색/색인 공통 규칙)."""
+    text = (text or "").strip()
+    if not text:
+        return []
+    return [token.form for token in kiwi.tokenize(text) if token.form.strip()]
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _create_kiwi():
+    try:
+        from kiwipiepy import Kiwi
+    except Exception as exc:  # pylint: disable=broad-except
+        raise RuntimeError("토큰화를 위해 kiwipiepy가 필요합니다. 'pip install kiwipiepy' 후 다시 실행하세요.") from exc
+    return Kiwi()
+
+
+def _init_worker() -> None:
+    global _WORKER_KIWI
+    _WORKER_KIWI = _create_kiwi()
+
+
+def _tokenize_chunk(texts: List[str]) -> Tuple[List[str], List[array]]:
+    """워커 로컬 어휘로 토큰 id를 매긴다. 부모 프로세스가 공용 어휘로 다시 매핑한다."""
+    local_vocab: Dict[str, int] = {}
+    encoded: List[array] = []
+    for text in texts:
+        ids = array(TOKEN_TYPECODE)
+        for form in token_forms(_WORKER_KIWI, text):
+            token_id = local_vocab.get(form)
+            if token_id is None:
+                token_id = len(local_vocab)
+                local_vocab[form] = token_id
+            ids.append(token_id)
+        encoded.append(ids)
+    return list(local_vocab), encoded
+
+
+class TokenVocab:
+    """토큰 문자열 <-> 정수 id 공용 어휘."""
+
+    def __init__(self, forms: Iterable[str] = ()):
+        self.forms: List[str] = []
+        self.index: Dict[str, int] = {}
+        for form in forms:
+            self.add(form)
+
+    def __len__(self) -> int:
+        return len(self.forms)
+
+    def add(self, form: str) -> int:
+        token_id = self.index.get(form)
+        if token_id is None:
+            token_id = len(self.forms)
+            self.forms.append(form)
+            self.index[form] = token_id
+        return token_id
+
+    def remap(self, local_forms: List[str], local_ids: array) -> array:
+        mapping = [self.add(form) for form in local_forms]
+        return array(TOKEN_TYPECODE, (mapping[idx] for idx in local_ids))
+
+    def decode(self, ids: Iterable[int]) -> List[str]:
+        return [self.forms[idx] for idx in ids]
+
+
+class KiwiTokenizerPool:
+    """워커마다 Kiwi 인스턴스를 하나씩 두고 텍스트를 청크 단위로 나눠 토큰화한다."""
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        chunk_size: int = TOKENIZE_CHUNK_SIZE,
+        vocab: TokenVocab | None = None,
+    ):
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.chunk_size = max(1, chunk_size)
+        self.vocab = vocab or TokenVocab()
+        self._executor: ProcessPoolExecutor | None = None
+        if self.workers > 1:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        else:
+            _init_worker()
+
+    def tokenize(self, texts: List[str]) -> List[array]:
+        """입력 순서대로 공용 어휘 기준 토큰 id 배열을 돌려준다."""
+        chunks = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+        if self._executor is not None:
+            results = self._executor.map(_tokenize_chunk, chunks)
+        else:
+            results = map(_tokenize_chunk, chunks)
+        encoded: List[array] = []
+        for local_forms, local_arrays in results:
+            encoded.extend(self.vocab.remap(local_forms, ids) for ids in local_arrays)
+        return encoded
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self) -> "KiwiTokenizerPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _cache_paths(prefix: Path) -> Tuple[Path, Path, Path]:
+    return (
+        prefix.with_name(prefix.name + ".bin"),
+        prefix.with_name(prefix.name + ".idx.jsonl"),
+        prefix.with_name(prefix.name + ".vocab.json"),
+    )
+
+
+def load_vocab(prefix: Path) -> TokenVocab:
+    _, _, vocab_path = _cache_paths(prefix)
+    if not vocab_path.exists():
+        return TokenVocab()
+    return TokenVocab(json.loads(vocab_path.read_text(encoding="utf-8")))
+
+
+class TokenCacheWriter:
+    """청크별 토큰 id 배열을 캐시 파일에 이어 쓴다. append=False면 기존 캐시를 비운다."""
+
+    def __init__(self, prefix: Path, vocab: TokenVocab, append: bool = False):
+        self.prefix = prefix
+        self.vocab = vocab
+        self.bin_path, self.idx_path, self.vocab_path = _cache_paths(prefix)
+        self.prefix.parent.mkdir(parents=True, exist_ok=True)
+        if not append:
+            for path in (self.bin_path, self.idx_path, self.vocab_path):
+                if path.exists():
+                    path.unlink()
+        self.offset = 0
+        if self.bin_path.exists():
+            itemsize = array(TOKEN_TYPECODE).itemsize
+            size = self.bin_path.stat().st_size
+            if size % itemsize:
+                # 기록 도중 중단되어 남은 불완전한 토큰은 잘라낸다.
+                with self.bin_path.open("r+b") as handle:
+                    handle.truncate(size - size % itemsize)
+            self.offset = size // itemsize
+
+    def append(self, ids: List[str], token_arrays: List[array], texts: List[str]) -> None:
+        if not ids:
+            return
+        entries: List[str] = []
+        with self.bin_path.open("ab") as bin_handle:
+            for record_id, tokens, text in zip(ids, token_arrays, texts):
+                tokens.tofile(bin_handle)
+                entry = {"id": record_id, "offset": self.offset, "length": len(tokens), "hash": text_digest(text)}
+                entries.append(json.dumps(entry, ensure_ascii=False))
+                self.offset += len(tokens)
+        # 인덱스가 가리키는 토큰 id가 항상 어휘에 존재하도록 vocab을 먼저 저장한다.
+        self.save_vocab()
+        with self.idx_path.open("a", encoding="utf-8") as idx_handle:
+            idx_handle.write("\n".join(entries) + "\n")
+
+    def save_vocab(self) -> None:
+        tmp_path = self.vocab_path.with_name(self.vocab_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(self.vocab.forms, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, self.vocab_path)
+
+
+class TokenCache:
+    """읽어 들인 청크 토큰 캐시. 텍스트 해시가 다르면(캐시 이후 청크가 바뀐 경우) 캐시를 쓰지 않는다."""
+
+    def __init__(self, vocab: TokenVocab, entries: Dict[str, Tuple[str, array]]):
+        self.vocab = vocab
+        self.entries = entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, record_id: str, text: str) -> Optional[List[str]]:
+        entry = self.entries.get(record_id)
+        if entry is None or entry[0] != text_digest(text):
+            return None
+        return self.vocab.decode(entry[1])
+
+
+def load_token_cache(prefix: Path) -> Optional[TokenCache]:
+    """캐시 전체를 읽는다. 같은 id가 여러 번 있으면 마지막 기록을 쓴다. 캐시가 없으면 None."""
+    bin_path, idx_path, _ = _cache_paths(prefix)
+    if not bin_path.exists() or not idx_path.exists():
+        return None
+    vocab = load_vocab(prefix)
+    flat = array(TOKEN_TYPECODE)
+    data = bin_path.read_bytes()
+    # 기록 도중 중단되어 남은 불완전한 토큰은 버린다.
+    flat.frombytes(data[:len(data) - len(data) % flat.itemsize])
+    entries: Dict[str, Tuple[str, array]] = {}
+    with idx_path.open(encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            start = entry["offset"]
+            if start + entry["length"] > len(flat):
+                continue
+            entries[entry["id"]] = (entry.get("hash", ""), flat[start:start + entry["length"]])
+    return TokenCache(vocab, entries)
@@ -13,11 +13,15 @@ import os
 import re
 import sys
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import List, Optional, Tuple
 
 import pymysql
 from dotenv import load_dotenv
 
+sys.path.append(str(Path(__file__).parent))
+import pipeline_metrics
+from artifact_store import FigureArtifact, PageArtifact, ReportArtifacts, TableArtifact
+
 # Load environment variables
 load_dotenv()
 
@@ -301,26 +305,12 @@ def insert_document(conn, doc_name: str, input_dir: Path) -> int:
         return cursor.lastrowid
 
 
-def load_file_content(path: Path) -> Optional[str]:
-    if path and path.exists():
-        return path.read_text(encoding="utf-8")
-    return None
-
-
-def load_json_file(path: Path) -> Any:
-    if path and path.exists():
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return None
-
-
-def load_page(conn, doc_id: int, page_dir: Path):
-    page_json_path = page_dir / "page.json"
-    if not page_json_path.exists():
-        return
-
-    data = load_json_file(page_json_path)
-    page_no = data.get("page_number")
+def load_page(conn, doc_id: int, page: PageArtifact):
+    pipeline_metrics.count("pages")
+    pipeline_metrics.count("tables", len(page.tables))
+    pipeline_metrics.count("figures", len(page.figures))
+    data = page.meta
+    page_no = page.page_no
     markdown = data.get("markdown", "")
     visual_density = data.get("visual_density", 0.0)
     needs_review = data.get("needs_visual_review", False)
@@ -328,11 +318,8 @@ def load_page(conn, doc_id: int, page_dir: Path):
 
     image_rel_path = data.get("page_image_path")
     
-    tables_list = data.get("tables", [])
-    figures_list = data.get("figures", [])
-    
-    has_tables = len(tables_list) > 0
-    has_figures = len(figures_list) > 0
+    has_tables = len(page.tables) > 0
+    has_figures = len(page.figures) > 0
 
 
     with conn.cursor() as cursor:
@@ -354,61 +341,29 @@ def load_page(conn, doc_id: int, page_dir: Path):
         page_id = cursor.fetchone()["id"]
 
         # Process Tables (with index)
-        for idx, tbl_meta in enumerate(tables_list, 1):
-            load_table(conn, doc_id, page_id, page_no, page_dir, tbl_meta, idx)
+        for idx, table in enumerate(page.tables, 1):
+            load_table(conn, doc_id, page_id, page_no, table, idx)
             
         # Process Figures (with inferred index logic inside)
-        for fig_meta in figures_list:
-            load_figure(conn, doc_id, page_id, page_no, page_dir, fig_meta)
+        for figure in page.figures:
+            load_figure(conn, doc_id, page_id, page_no, figure)
     
     conn.commit()
     print(f"Loaded Page {page_no} (ID: {page_id})")
 
 
-def load_table(conn, doc_id: int, page_id: int, page_no: int, page_dir: Path, tbl_meta: Dict[str, Any], table_index: int):
-    table_id_str = tbl_meta.get("id") # table_001
+def load_table(conn, doc_id: int, page_id: int, page_no: int, table: TableArtifact, table_index: int):
+    tbl_meta = table.meta
     title = tbl_meta.get("title")
     bbox = tbl_meta.get("bbox")
-    
-    # Resolve Paths
-    tables_dir = page_dir / "tables"
-    json_path = tables_dir / f"{table_id_str}.json"
-    diff_path = tables_dir / f"{table_id_str}.diff.json"
     image_rel_path = tbl_meta.get("image_path")
 
-    # Load Data
-    # refined logic: if we have a VLM re-parsed result (indicated by ocr_path ending in .vlm.json), use it as the source of truth.
-    ocr_path = tbl_meta.get("ocr_path")
-    
-    # If ocr_path points to a VLM result, prefer it
-    if ocr_path and ocr_path.endswith(".vlm.json"):
-        # ocr_path is relative to structured_dir usually, but let's check
-        # In structured_extract/ocr, we save it relative to structured_dir.
-        # page_dir is structured_dir/page_XXXX.
-        # ocr_path might be "page_XXXX/tables/table_001.vlm.json"
-        
-        # We need to construct full path.
-        # page_dir.parent should be structured_dir
-        # But clearer to just use page_dir / "tables" and filename if we know it?
-        # Actually ocr_path in page.json is typically "page_0017/tables/table_001.vlm.json".
-        vlm_full_path = page_dir.parent / ocr_path
-        if vlm_full_path.exists():
-            print(f"    [Info] Using VLM result for table {table_id_str}")
-            # VLM outcome is list of cells, but we need to wrap it in "cells" key if load_table expects {"cells": [...]}
-            # My table_vlm.py returns {"cells": [...]}. So it matches.
-            table_data = load_json_file(vlm_full_path)
-        else:
-             # Fallback
-             print(f"    [Warn] VLM path {vlm_full_path} missing, falling back to Docling.")
-             table_data = load_json_file(json_path)
-    else:
-        table_data = load_json_file(json_path)
-
+    # 표 구조 원본 선택(VLM 재파싱 결과 우선)은 artifact_store.read_page_dir에서 처리한다.
+    table_data = table.data
     if not table_data:
         return
 
-    diff_data = load_json_file(diff_path)
-    diff_json_str = json.dumps(diff_data) if diff_data else None
+    diff_json_str = json.dumps(table.diff) if table.diff else None
     
     cells = table_data.get("cells", [])
     global_unit, column_units = infer_table_units(cells)
@@ -469,16 +424,12 @@ def load_table(conn, doc_id: int, page_id: int, page_no: int, page_dir: Path, tb
             """, insert_data)
 
 
-def load_figure(conn, doc_id: int, page_id: int, page_no: int, page_dir: Path, fig_meta: Dict[str, Any]):
-    figure_id_str = fig_meta.get("id") # figure_001
+def load_figure(conn, doc_id: int, page_id: int, page_no: int, figure: FigureArtifact):
+    fig_meta = figure.meta
     caption = fig_meta.get("caption")
     bbox = fig_meta.get("bbox")
     image_rel_path = fig_meta.get("image_path")
-    
-    # Check for description
-    figures_dir = page_dir / "figures"
-    desc_path = figures_dir / f"{figure_id_str}.desc.md"
-    description = load_file_content(desc_path)
+    description = figure.description
     
     with conn.cursor() as cursor:
         cursor.execute("""
@@ -493,13 +444,14 @@ def load_figure(conn, doc_id: int, page_id: int, page_no: int, page_dir: Path, f
         """, (page_id, doc_id, page_no, json.dumps(bbox), caption, description, image_rel_path))
 
 
-def main():
+def main(argv: List[str] | None = None):
     parser = argparse.ArgumentParser(description="Load extracted JSON data into MySQL")
     parser.add_argument("--doc-name", type=str, required=True, help="Document name (used as ID/Filename stem)")
     parser.add_argument("--input-dir", type=Path, default=DEFAULT_INPUT_DIR, help="Directory containing page_XXXX folders")
     parser.add_argument("--init-db", action="store_true", help="Initialize database schema (create tables)")
+    parser.add_argument("--no-packed", action="store_true", help="Ignore artifacts/ bundle and read page_XXXX folders directly")
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     if not args.input_dir.exists():
         print(f"Input directory not found: {args.input_dir}")
@@ -513,16 +465,19 @@ def main():
         doc_id = insert_document(conn, args.doc_name, args.input_dir)
         print(f"Processing Document: {args.doc_name} (ID: {doc_id})")
 
-        page_dirs = sorted([d for d in args.input_dir.iterdir() if d.is_dir() and d.name.startswith("page_")])
-        if not page_dirs:
+        artifacts = ReportArtifacts(args.input_dir, prefer_packed=not args.no_packed)
+        if artifacts.packed:
+            print(f"Reading packed artifacts: {artifacts.store_dir}")
+
+        total_extracted = 0
+        for page in artifacts.iter_pages():
+            load_page(conn, doc_id, page)
+            total_extracted += 1
+        if not total_extracted:
             print("No page directories found. Run structured_extract.py first.")
             return
 
-        for page_dir in page_dirs:
-            load_page(conn, doc_id, page_dir)
-
         # Update total_pages count
-        total_extracted = len(page_dirs)
         with conn.cursor() as cursor:
             cursor.execute("UPDATE documents SET total_pages = %s WHERE id = %s", (total_extracted, doc_id))
         conn.commit()
@@ -0,0 +1,48 @@
+"""page.json 읽기/쓰기 공용 유틸.
+
+표/그림 단계(table_ocr, figure_ocr, table_diff)는 항목마다 page.json을 다시 읽고 쓰는 대신
+페이지 단위로 한 번 읽어 메모리에서 고친 뒤 flush()로 한 번만 저장한다.
+저장은 임시 파일에 쓴 뒤 os.replace로 바꿔치기하므로 중간에 죽어도 page.json이 잘린 채 남지 않는다.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+
+def write_json_atomic(path: Path, data) -> None:
+    """JSON을 같은 폴더의 임시 파일에 쓴 뒤 원자적으로 교체한다."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+class PageMetadata:
+    """page.json 한 개에 대한 누적 수정. 바뀐 내용이 있을 때만 flush()에서 저장한다."""
+
+    def __init__(self, page_json_path: Path):
+        self.path = page_json_path
+        self.data = json.loads(page_json_path.read_text(encoding="utf-8"))
+        self._dirty = False
+
+    def items(self, kind: str) -> list[dict]:
+        """kind: "tables" 또는 "figures"."""
+        return self.data.get(kind, [])
+
+    def update_item(self, kind: str, item_id: str, **fields) -> bool:
+        """id가 item_id인 표/그림 항목에 fields를 반영한다. 항목이 없으면 False."""
+        for item in self.items(kind):
+            if item.get("id") == item_id:
+                if any(item.get(key) != value for key, value in fields.items()):
+                    item.update(fields)
+                    self._dirty = True
+                return True
+        return False
+
+    def flush(self) -> None:
+        if not self._dirty:
+            return
+        write_json_atomic(self.path, self.data)
+        self._dirty = False
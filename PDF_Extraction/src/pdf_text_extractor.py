@@ -3,26 +3,203 @@
 Docling 등의 도구가 인코딩 문제로 PDF를 제대로 읽지 못할 때,
 화면에 보이는 요소를 기반으로 PDF를 재생성(Reconstruction)하여 문제를 해결하는 도구.
 텍스트를 깨끗한 폰트(NanumGothic)로 다시 쓰고, 선/도형/이미지를 복원한다.
+
+보정 필요 여부는 PyMuPDF 텍스트 레이어 검사(`assess_text_layer`)로 전 페이지를 빠르게 판단하고,
+애매한 경우에만 선택적으로 Docling 샘플 변환(`check_docling_compatibility`)을 보조 판단으로 쓴다.
 """
 
 from __future__ import annotations
 
 import argparse
 import logging
+import multiprocessing
 import os
+import tempfile
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Optional, Sequence, Tuple
 
 import fitz  # PyMuPDF
-from docling.datamodel.base_models import InputFormat
-from docling.datamodel.pipeline_options import PdfPipelineOptions
-from docling.document_converter import DocumentConverter, PdfFormatOption
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
+# 텍스트 레이어 검사 기준
+MIN_PAGE_CHARS = 20          # 이보다 글자가 적은 페이지는 비율 판정에서 제외 (표지/사진 페이지)
+BAD_CHAR_RATIO = 0.05        # PUA + U+FFFD 비율이 이 이상이면 깨진 페이지
+ALLOWED_CONTROL_CHARS = {"\n", "\r", "\t"}
+IDENTITY_ENCODINGS = {"Identity-H", "Identity-V"}
+KOREAN_FONT_PATH = "/usr/share/fonts/truetype/nanum/NanumGothic.ttf"
+
+
+@dataclass
+class SanitizeFont:
+    """재구성 텍스트에 쓸 폰트. 한글 폰트 등록에 실패하면 helv로 바꿔 이후 페이지에도 유지한다."""
+
+    path: str = KOREAN_FONT_PATH
+    name: str = "nanum"
+    embedded: bool = True
+
+    @classmethod
+    def detect(cls, verbose: bool = True) -> "SanitizeFont":
+        if os.path.exists(KOREAN_FONT_PATH):
+            return cls()
+        if verbose:
+            print(f"  Warning: Korean font not found at {KOREAN_FONT_PATH}, fallback to helv.")
+        return cls(name="helv", embedded=False)
+
+
+def sanitized_output_path(pdf_path: Path) -> Path:
+    return pdf_path.with_stem(pdf_path.stem + "_sanitized").with_suffix(".pdf")
+
+
+def cached_sanitized_pdf(pdf_path: Path) -> Path | None:
+    """원본보다 새롭고 비어 있지 않은 보정본이 있으면 그 경로 (원본 PDF는 열지 않는다)."""
+    sanitized_path = sanitized_output_path(pdf_path)
+    try:
+        cached = sanitized_path.stat()
+        source = pdf_path.stat()
+    except FileNotFoundError:
+        return None
+    if cached.st_size > 0 and cached.st_mtime >= source.st_mtime:
+        return sanitized_path
+    return None
+
+
+def rebuild_page(src_doc: fitz.Document, clean_doc: fitz.Document, index: int, font: SanitizeFont) -> None:
+    """원본 페이지 하나를 선/도형, 이미지, 깨끗한 폰트 텍스트로 다시 그려 clean_doc 끝에 붙인다."""
+    page = src_doc[index]
+    # Create new page
+    new_page = clean_doc.new_page(width=page.rect.width, height=page.rect.height)
+
+    # --- 1. Reconstruct Drawings (Lines, Rects for Table Borders) ---
+    try:
+        paths = page.get_drawings()
+        shape = new_page.new_shape()
+        for path in paths:
+            color = path.get("color")
+            fill = path.get("fill")
+            width = path.get("width", 1)
+
+            # SMART CONTRAST ENHANCEMENT
+            if color:
+                if max(color) < 0.9:
+                    color = (0, 0, 0)
+
+            for item in path["items"]:
+                if item[0] == "l":
+                    shape.draw_line(item[1], item[2])
+                elif item[0] == "re":
+                    shape.draw_rect(item[1])
+                elif item[0] == "c":
+                    shape.draw_bezier(item[1], item[2], item[3], item[4])
+
+            shape.finish(color=color, fill=fill, width=width)
+
+        shape.commit()
+    except Exception:
+        pass # Suppress minor drawing errors
+
+    # --- 2. Reconstruct Images ---
+    try:
+        image_infos = page.get_image_info(xrefs=True)
+        for img in image_infos:
+            xref = img.get("xref")
+            if xref:
+                try:
+                    base_img = src_doc.extract_image(xref)
+                    if base_img:
+                        new_page.insert_image(img["bbox"], stream=base_img["image"])
+                except Exception:
+                    continue
+    except Exception:
+        pass
+
+    # --- 3. Reconstruct Text (Clean Font) ---
+    # Register Font Per Page if needed (to be safe)
+    if font.embedded:
+        try:
+            new_page.insert_font(fontname=font.name, fontfile=font.path)
+        except Exception:
+            font.name = "helv"
+            font.embedded = False
+
+    text_dict = page.get_text("dict")
+    for block in text_dict["blocks"]:
+        if "lines" in block:
+            for line in block["lines"]:
+                for span in line["spans"]:
+                    try:
+                        clean_text = span["text"]
+                        # Fix specific artifacts
+                        # U+302E (Hangul Single Dot Tone Mark) -> Middle Dot
+                        clean_text = clean_text.replace("\u302e", "·")
+                        # U+2219 (Bullet Operator) -> Middle Dot
+                        clean_text = clean_text.replace("\u2219", "·")
+
+                        new_page.insert_text(
+                            fitz.Point(span["origin"]),
+                            clean_text,
+                            fontsize=span["size"] * 0.9, # Reduce size to prevent overlap (Nanum is wider)
+                            fontname=font.name
+                        )
+                    except Exception:
+                        pass
+
+
+def build_page_range(
+    src_doc: fitz.Document,
+    clean_doc: fitz.Document,
+    start_i: int,
+    end_i: int,
+    rebuild: set[int] | None,
+    font: SanitizeFont,
+) -> None:
+    """[start_i, end_i) 페이지를 clean_doc에 붙인다. rebuild에 없는 페이지는 insert_pdf로 원본을 그대로 복사한다."""
+    i = start_i
+    while i < end_i:
+        if rebuild is None or i in rebuild:
+            rebuild_page(src_doc, clean_doc, i, font)
+            i += 1
+            continue
+        # 연속된 정상 페이지는 한 번에 복사
+        j = i
+        while j + 1 < end_i and (j + 1) not in rebuild:
+            j += 1
+        clean_doc.insert_pdf(src_doc, from_page=i, to_page=j)
+        i = j + 1
+
+
+def plan_sanitize_ranges(start_i: int, end_i: int, targets: list[int], workers: int) -> list[tuple[int, int]]:
+    """재구성 대상 페이지 수가 고르게 나뉘도록 [start_i, end_i)를 연속 구간으로 자른다."""
+    shard_count = max(1, min(workers, len(targets)))
+    per_shard = -(-len(targets) // shard_count)
+    bounds = [start_i]
+    for k in range(1, shard_count):
+        if k * per_shard < len(targets):
+            bounds.append(targets[k * per_shard])
+    bounds.append(end_i)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def _sanitize_range_worker(job: tuple[str, int, int, list[int] | None, str]) -> str:
+    """워커 프로세스: 구간 하나를 별도 PDF 조각으로 저장하고 그 경로를 돌려준다."""
+    pdf_path, start_i, end_i, rebuild, part_path = job
+    font = SanitizeFont.detect(verbose=False)
+    with fitz.open(pdf_path) as src_doc, fitz.open() as clean_doc:
+        build_page_range(src_doc, clean_doc, start_i, end_i, set(rebuild) if rebuild is not None else None, font)
+        clean_doc.save(part_path)
+    return part_path
+
 
-def sanitize_pdf(pdf_path: str | Path, page_range: Optional[Tuple[int, int]] = None) -> Path:
+def sanitize_pdf(
+    pdf_path: str | Path,
+    page_range: Optional[Tuple[int, int]] = None,
+    pages: Sequence[int] | None = None,
+    workers: int = 1,
+) -> Path:
     """
     Rebuilds the PDF by copying text with a clean font (NanumGothic)
     and faithfully reconstructing lines, shapes, and images to support Vision AI.
@@ -30,134 +207,218 @@ def sanitize_pdf(pdf_path: str | Path, page_range: Optional[Tuple[int, int]] = N
     Args:
         pdf_path: Path to source PDF.
         page_range: (start, end) 0-based page indices.
+        pages: 1-based pages to reconstruct. Other pages are copied as-is. None = all pages.
+        workers: Number of processes reconstructing page ranges in parallel.
         
     Returns:
         Path to the sanitized PDF.
     """
     pdf_path = Path(pdf_path)
-    print(f"--- [Sanitization] Starting Full Reconstruction for: {pdf_path.name} ---")
-    
-    src_doc = fitz.open(pdf_path)
-    clean_doc = fitz.open()
-    
-    # Determine output path
-    sanitized_path = pdf_path.with_stem(pdf_path.stem + "_sanitized").with_suffix(".pdf")
-    
-    # Optimization: Reuse existing sanitized PDF if recently created
-    if sanitized_path.exists():
-        print(f"  [Sanitization] Found existing sanitized file: {sanitized_path}. Reusing it.")
-        return sanitized_path
+    sanitized_path = sanitized_output_path(pdf_path)
+
+    # Optimization: Reuse an existing sanitized PDF (newer than the source) without opening the source
+    cached = cached_sanitized_pdf(pdf_path)
+    if cached is not None:
+        print(f"  [Sanitization] Found existing sanitized file: {cached}. Reusing it.")
+        return cached
+
+    mode = "Full Reconstruction" if pages is None else f"Selective Reconstruction ({len(pages)} pages)"
+    print(f"--- [Sanitization] Starting {mode} for: {pdf_path.name} ---")
+
+    with fitz.open(pdf_path) as src_doc:
+        page_count = len(src_doc)
 
     # Determine range
     start_i = page_range[0] if page_range else 0
-    end_i = page_range[1] if page_range else len(src_doc)
+    end_i = page_range[1] if page_range else page_count
     
     # Validations
     start_i = max(0, start_i)
-    end_i = min(len(src_doc), end_i)
-    
-    print(f"  Processing pages {start_i} to {end_i}...")
-
-    # Font configuration
-    font_path = "/usr/share/fonts/truetype/nanum/NanumGothic.ttf"
-    font_name = "nanum"
-    has_font = os.path.exists(font_path)
-    if not has_font:
-         print(f"  Warning: Korean font not found at {font_path}, fallback to helv.")
-         font_name = "helv"
-
-    for i in range(start_i, end_i):
-        page = src_doc[i]
-        # Create new page
-        new_page = clean_doc.new_page(width=page.rect.width, height=page.rect.height)
-        
-        # --- 1. Reconstruct Drawings (Lines, Rects for Table Borders) ---
-        try:
-            paths = page.get_drawings()
-            shape = new_page.new_shape()
-            for path in paths:
-                color = path.get("color")
-                fill = path.get("fill")
-                width = path.get("width", 1)
-                
-                # SMART CONTRAST ENHANCEMENT
-                if color: 
-                    if max(color) < 0.9: 
-                        color = (0, 0, 0)
-
-                for item in path["items"]:
-                    if item[0] == "l": 
-                        shape.draw_line(item[1], item[2])
-                    elif item[0] == "re": 
-                        shape.draw_rect(item[1])
-                    elif item[0] == "c": 
-                        shape.draw_bezier(item[1], item[2], item[3], item[4])
-                        
-                shape.finish(color=color, fill=fill, width=width)
-                
-            shape.commit()
-        except Exception:
-            pass # Suppress minor drawing errors
+    end_i = min(page_count, end_i)
 
-        # --- 2. Reconstruct Images ---
-        try:
-            image_infos = page.get_image_info()
-            for img in image_infos:
-                xref = img.get("xref")
-                if xref:
-                    try:
-                        base_img = src_doc.extract_image(xref)
-                        if base_img:
-                            new_page.insert_image(img["bbox"], stream=base_img["image"])
-                    except Exception:
-                        continue
-        except Exception:
-            pass
+    rebuild = None if pages is None else {p - 1 for p in pages if start_i <= p - 1 < end_i}
+    targets = list(range(start_i, end_i)) if rebuild is None else sorted(rebuild)
+    print(f"  Processing pages {start_i} to {end_i} (rebuilding {len(targets)})...")
 
-        # --- 3. Reconstruct Text (Clean Font) ---
-        # Register Font Per Page if needed (to be safe)
-        if has_font:
-            try:
-                new_page.insert_font(fontname=font_name, fontfile=font_path)
-            except Exception:
-                font_name = "helv"
-        
-        text_dict = page.get_text("dict")
-        for block in text_dict["blocks"]:
-            if "lines" in block:
-                for line in block["lines"]:
-                    for span in line["spans"]:
-                        try:
-                            clean_text = span["text"]
-                            # Fix specific artifacts
-                            # U+302E (Hangul Single Dot Tone Mark) -> Middle Dot
-                            clean_text = clean_text.replace("\u302e", "·")
-                            # U+2219 (Bullet Operator) -> Middle Dot
-                            clean_text = clean_text.replace("\u2219", "·")
-                            
-                            new_page.insert_text(
-                                fitz.Point(span["origin"]), 
-                                clean_text, 
-                                fontsize=span["size"] * 0.9, # Reduce size to prevent overlap (Nanum is wider)
-                                fontname=font_name 
-                            )
-                        except Exception:
-                            pass
-
-    clean_doc.save(sanitized_path)
-    clean_doc.close()
-    src_doc.close()
+    tmp_path = sanitized_path.with_name(sanitized_path.name + ".tmp")
+    ranges = plan_sanitize_ranges(start_i, end_i, targets, workers)
+    if workers > 1 and len(ranges) > 1:
+        print(f"  Using {len(ranges)} worker processes...")
+        with tempfile.TemporaryDirectory(dir=sanitized_path.parent) as tmp_dir:
+            rebuild_list = sorted(rebuild) if rebuild is not None else None
+            jobs = [
+                (str(pdf_path), a, b, rebuild_list, str(Path(tmp_dir) / f"part_{idx:03d}.pdf"))
+                for idx, (a, b) in enumerate(ranges)
+            ]
+            with ProcessPoolExecutor(max_workers=len(jobs), mp_context=multiprocessing.get_context("spawn")) as executor:
+                part_paths = list(executor.map(_sanitize_range_worker, jobs))
+            with fitz.open() as clean_doc:
+                for part_path in part_paths:
+                    with fitz.open(part_path) as part_doc:
+                        clean_doc.insert_pdf(part_doc)
+                clean_doc.save(tmp_path)
+    else:
+        font = SanitizeFont.detect()
+        with fitz.open(pdf_path) as src_doc, fitz.open() as clean_doc:
+            build_page_range(src_doc, clean_doc, start_i, end_i, rebuild, font)
+            clean_doc.save(tmp_path)
+
+    # 저장이 끝난 파일만 보정본 경로에 둔다 (중단 시 잘린 파일을 캐시로 오인하지 않도록).
+    os.replace(tmp_path, sanitized_path)
     print(f"--- [Sanitization] Completed: {sanitized_path} ---")
     return sanitized_path
 
 
-def check_docling_compatibility(pdf_path: Path) -> bool:
+def is_private_use(ch: str) -> bool:
+    code = ord(ch)
+    return 0xE000 <= code <= 0xF8FF or code >= 0xF0000
+
+
+@dataclass
+class PageTextHealth:
+    """한 페이지 텍스트 레이어의 문자 통계."""
+
+    page_no: int
+    chars: int = 0
+    pua: int = 0
+    replacement: int = 0
+    control: int = 0
+    fonts_without_unicode: int = 0
+
+    @property
+    def bad_char_ratio(self) -> float:
+        return (self.pua + self.replacement) / max(1, self.chars)
+
+    @property
+    def status(self) -> str:
+        """ok / bad(문자 단위 증거) / suspect(폰트 인코딩만 의심) / empty(텍스트 거의 없음)."""
+        if self.control:
+            # 제어 문자는 Docling의 'Invalid code point' 오류로 이어지므로 글자 수와 무관하게 깨진 페이지로 본다.
+            return "bad"
+        if self.chars < MIN_PAGE_CHARS:
+            return "empty"
+        if self.bad_char_ratio >= BAD_CHAR_RATIO:
+            return "bad"
+        if self.fonts_without_unicode:
+            return "suspect"
+        return "ok"
+
+
+@dataclass
+class TextLayerReport:
+    pages: list[PageTextHealth] = field(default_factory=list)
+
+    def pages_with_status(self, status: str) -> list[int]:
+        return [page.page_no for page in self.pages if page.status == status]
+
+    @property
+    def bad_pages(self) -> list[int]:
+        return self.pages_with_status("bad")
+
+    @property
+    def suspect_pages(self) -> list[int]:
+        return self.pages_with_status("suspect")
+
+    @property
+    def text_page_count(self) -> int:
+        return sum(1 for page in self.pages if page.status != "empty")
+
+    @property
+    def bad_ratio(self) -> float:
+        return len(self.bad_pages) / max(1, self.text_page_count)
+
+
+def font_lacks_unicode(doc: fitz.Document, font: tuple) -> bool:
+    """ToUnicode 없이 Identity 인코딩이나 Type3로 된 폰트는 글리프를 유니코드로 되돌릴 수 없다."""
+    xref, _ext, font_type, _basefont, _name, encoding = font[:6]
+    if font_type != "Type3" and encoding not in IDENTITY_ENCODINGS:
+        return False
+    kind, _value = doc.xref_get_key(xref, "ToUnicode")
+    return kind == "null"
+
+
+def assess_text_layer(pdf_path: Path) -> TextLayerReport:
+    """PyMuPDF 텍스트 레이어만으로 전 페이지의 문자/폰트 인코딩 상태를 검사한다 (Docling 불필요)."""
+    report = TextLayerReport()
+    font_cache: dict[int, bool] = {}
+    with fitz.open(pdf_path) as doc:
+        for index, page in enumerate(doc):
+            health = PageTextHealth(page_no=index + 1)
+            for ch in page.get_text("text"):
+                if ch.isspace():
+                    if ch not in ALLOWED_CONTROL_CHARS and unicodedata.category(ch) == "Cc":
+                        health.control += 1
+                    continue
+                health.chars += 1
+                if ch == "\ufffd":
+                    health.replacement += 1
+                elif is_private_use(ch):
+                    health.pua += 1
+                elif unicodedata.category(ch) in ("Cc", "Cs"):
+                    health.control += 1
+            for font in page.get_fonts():
+                xref = font[0]
+                if xref not in font_cache:
+                    font_cache[xref] = font_lacks_unicode(doc, font)
+                health.fonts_without_unicode += int(font_cache[xref])
+            report.pages.append(health)
+    return report
+
+
+def summarize_pages(pages: Sequence[int], limit: int = 20) -> str:
+    shown = ", ".join(str(p) for p in pages[:limit])
+    return shown + (f" ... (+{len(pages) - limit})" if len(pages) > limit else "")
+
+
+def pages_to_sanitize(pdf_path: Path, docling_tiebreak: bool = False) -> list[int]:
+    """텍스트 레이어 검사 결과로 재구성할 페이지(1-based)를 정한다. 빈 목록이면 보정 불필요.
+
+    - 문자 단위로 깨진 페이지(bad)는 항상 재구성 대상.
+    - 폰트 인코딩만 의심스러운 페이지(suspect)는 docling_tiebreak=True일 때 Docling 샘플 변환이
+      실패하는 경우에만 포함한다.
     """
-    Docling이 이 PDF를 정상적으로 읽을 수 있는지 평가합니다.
-    - 5개 페이지를 균등하게 샘플링하여 테스트합니다.
+    print(f"[Check] Inspecting PDF text layer for: {pdf_path.name}")
+    report = assess_text_layer(pdf_path)
+    bad_pages = report.bad_pages
+    suspect_pages = report.suspect_pages
+    text_pages = report.text_page_count
+    print(
+        f"  Text pages: {text_pages}/{len(report.pages)}, "
+        f"bad: {len(bad_pages)} ({report.bad_ratio*100:.1f}%), suspect fonts: {len(suspect_pages)}"
+    )
+    if bad_pages:
+        print(f"  ⚠️ Bad pages: {summarize_pages(bad_pages)}")
+
+    if text_pages == 0:
+        print("  ⚠️ No text layer found (scanned PDF?). Sanitization will not help; skipping.")
+        return []
+
+    rebuild = list(bad_pages)
+    if suspect_pages:
+        if docling_tiebreak:
+            print("  Sampling suspect-font pages with Docling as a tie-breaker...")
+            if not check_docling_compatibility(pdf_path, pages=suspect_pages):
+                rebuild.extend(suspect_pages)
+        else:
+            print("  Suspect font encodings only on some pages. Use --docling-check to verify with Docling.")
+
+    if not rebuild:
+        print("  ✅ Text layer looks healthy.")
+    return sorted(rebuild)
+
+
+def check_docling_compatibility(pdf_path: Path, pages: Sequence[int] | None = None) -> bool:
+    """
+    Docling이 이 PDF를 정상적으로 읽을 수 있는지 평가합니다. (텍스트 레이어 검사의 보조 판단용)
+    - 5개 페이지를 균등하게 샘플링하여 테스트합니다. pages를 주면 그 페이지들 중에서 샘플링합니다.
     - 샘플 중 절반 초과가 실패하면 전체 파일이 깨졌다고 간주(False).
     - 절반 이하면 "일부 페이지 오류"로 간주하여 부분 추출 허용(True).
     """
+    # Docling은 보조 판단에서만 쓰므로 필요할 때 가져온다 (import만으로 수 초가 걸림).
+    from docling.datamodel.base_models import InputFormat
+    from docling.datamodel.pipeline_options import PdfPipelineOptions
+    from docling.document_converter import DocumentConverter, PdfFormatOption
+
     print(f"[Check] Verifying Docling compatibility for: {pdf_path.name}")
     
     pipeline_options = PdfPipelineOptions()
@@ -169,17 +430,21 @@ def check_docling_compatibility(pdf_path: Path) -> bool:
     )
     
     try:
-        with fitz.open(pdf_path) as doc:
-            total_pages = len(doc)
-            
+        if pages:
+            candidates = sorted(set(pages))
+        else:
+            with fitz.open(pdf_path) as doc:
+                candidates = list(range(1, len(doc) + 1))
+        total_pages = len(candidates)
+
         # Sample 5 evenly distributed pages
         sample_count = min(5, total_pages)
         if sample_count == 0:
             return False
             
         step = max(1, total_pages // sample_count)
-        test_pages = [1 + i * step for i in range(sample_count)]
-        test_pages[-1] = total_pages # Ensure last page is included
+        test_pages = [candidates[i * step] for i in range(sample_count)]
+        test_pages[-1] = candidates[-1] # Ensure last page is included
         test_pages = sorted(list(set(test_pages))) # Remove duplicates if very short PDF
             
         print(f"  Sampling pages {test_pages} for validation...")
@@ -212,31 +477,50 @@ def check_docling_compatibility(pdf_path: Path) -> bool:
         return False
 
 
-def main() -> int:
+def main(argv: list[str] | None = None) -> int:
     parser = argparse.ArgumentParser(description="PDF Reconstruction Tool for Encoding/Vision Issues")
     parser.add_argument("--pdf", type=Path, required=True, help="Path to the source PDF file")
     parser.add_argument("--force", action="store_true", help="Skip validation and force sanitization")
+    parser.add_argument(
+        "--docling-check",
+        action="store_true",
+        help="Use Docling sample conversion as a tie-breaker for pages with suspect font encodings",
+    )
+    parser.add_argument(
+        "--full-rebuild",
+        action="store_true",
+        help="Reconstruct every page instead of only the broken ones",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="Processes reconstructing page ranges in parallel")
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     if not args.pdf.exists():
         print(f"Error: File not found: {args.pdf}")
         return 1
         
+    # A valid cached output means there is nothing to do (no health check, no source open)
+    cached = cached_sanitized_pdf(args.pdf)
+    if cached is not None:
+        print(f"[Cache] Sanitized PDF is up to date: {cached}")
+        return 0
+
     # Check compatibility unless forced
+    pages: list[int] | None = None
     if not args.force:
-        is_compatible = check_docling_compatibility(args.pdf)
-        if is_compatible:
+        pages = pages_to_sanitize(args.pdf, docling_tiebreak=args.docling_check)
+        if not pages:
             print("\n[Pass] This PDF seems fine. You can skip sanitization.")
             # Note: The user pipeline expects a file. 
             # If we don't sanitize, we don't produce the _sanitized.pdf.
             # Users should use the original file then.
             return 0
-        else:
-            print("\n[Issue] Encoding issues detected. Proceeding with sanitization...")
+        print(f"\n[Issue] Encoding issues detected on {len(pages)} pages. Proceeding with sanitization...")
+        if args.full_rebuild:
+            pages = None
 
     try:
-        result_path = sanitize_pdf(args.pdf)
+        result_path = sanitize_pdf(args.pdf, pages=pages, workers=args.workers)
         print(f"Successfully created: {result_path}")
         return 0
     except Exception as e:
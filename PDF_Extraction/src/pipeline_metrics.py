@@ -0,0 +1,330 @@
+"""파이프라인 단계별 계측(JSON Lines)과 보고서 프로파일.
+
+run_pipeline은 실행할 때 환경변수 PIPELINE_METRICS_PATH(`<report>/metrics.jsonl`)와
+PIPELINE_METRICS_STAGE(현재 단계 이름)를 설정한다. 각 단계 모듈은 처리 건수/GPT 호출·토큰을 `count()`,
+`record_gpt_usage()`로 프로세스 안에 모아 두고, 단계가 끝날 때(또는 워커/서브프로세스 종료 시 atexit) `flush()`로
+한 줄씩 기록한다. 환경변수가 없으면(단계 스크립트를 단독 실행) 아무것도 쓰지 않는다.
+
+runner는 단계마다 시간/CPU/최대 RSS 줄을 남기고, 실행이 끝나면 metrics.jsonl을 모아 `<report>/profile.json`과
+`<report>/profile_history.jsonl`(실행마다 한 줄)을 쓴다. 여러 실행/보고서의 프로파일 비교:
+
+    python src/pipeline_metrics.py data/pages_structured/A data/pages_structured/B/profile.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List
+
+try:
+    import resource
+
+    HAS_RESOURCE = True
+except ImportError:  # Windows
+    HAS_RESOURCE = False
+
+from page_metadata import write_json_atomic
+
+METRICS_ENV = "PIPELINE_METRICS_PATH"
+STAGE_ENV = "PIPELINE_METRICS_STAGE"
+METRICS_NAME = "metrics.jsonl"
+PROFILE_NAME = "profile.json"
+HISTORY_NAME = "profile_history.jsonl"
+# 비교 표에 기본으로 보여 줄 카운터 (나머지는 --all-counters)
+SUMMARY_COUNTERS = ("pages", "tables", "figures", "gpt_calls", "gpt_prompt_tokens", "gpt_completion_tokens")
+# 단계마다 새로 발생하는 비용이라 단계를 넘어 합산해도 되는 카운터 (GPT 호출/토큰/재시도)
+ADDITIVE_PREFIXES = ("gpt_",)
+# 여러 단계가 같은 항목을 다시 세는 처리 건수는 합산하지 않고 만든 단계의 값을 쓴다.
+COUNT_SOURCES = {"pages": "structured", "tables": "structured", "figures": "structured", "vectors": "vector_db"}
+
+_counters: Counter = Counter()
+_lock = threading.Lock()
+
+
+def metrics_path() -> Path | None:
+    value = os.environ.get(METRICS_ENV)
+    return Path(value) if value else None
+
+
+def current_stage() -> str:
+    return os.environ.get(STAGE_ENV) or Path(sys.argv[0]).stem or "unknown"
+
+
+def _append(record: dict) -> None:
+    path = metrics_path()
+    if path is None:
+        return
+    record = {"ts": time.time(), "pid": os.getpid(), "stage": current_stage(), **record}
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    # 한 줄 단위 append라 여러 프로세스가 같은 파일에 써도 줄이 섞이지 않는다.
+    with _lock, path.open("a", encoding="utf-8") as handle:
+        handle.write(line)
+
+
+def count(name: str, value: int = 1) -> None:
+    """처리 건수 누적 (flush 전까지 메모리에만 둔다)."""
+    if not value:
+        return
+    with _lock:
+        _counters[name] += value
+
+
+def record_gpt_usage(response) -> None:
+    """OpenAI 응답 1건의 호출 수/토큰을 누적한다 (chat.completions와 responses 응답 모두)."""
+    count("gpt_calls")
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or getattr(usage, "input_tokens", None) or 0
+    completion_tokens = getattr(usage, "completion_tokens", None) or getattr(usage, "output_tokens", None) or 0
+    count("gpt_prompt_tokens", int(prompt_tokens))
+    count("gpt_completion_tokens", int(completion_tokens))
+
+
+def flush() -> None:
+    """누적 카운터를 한 줄로 기록하고 비운다."""
+    with _lock:
+        if not _counters:
+            return
+        counters = dict(_counters)
+        _counters.clear()
+    _append({"type": "counters", "counters": counters})
+
+
+atexit.register(flush)
+
+
+def peak_rss_mb(children: bool = False) -> float | None:
+    """프로세스(또는 종료된 자식 프로세스 중 최대) 최대 RSS(MB). resource 모듈이 없으면 None."""
+    if not HAS_RESOURCE:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # Linux는 KB, macOS는 byte 단위
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(usage.ru_maxrss / divisor, 1)
+
+
+class StageTimer:
+    """runner가 단계 하나를 감싸 시간/CPU/최대 RSS를 기록한다."""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> "StageTimer":
+        os.environ[STAGE_ENV] = self.stage
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self._rss = peak_rss_mb()
+        self._children_rss = peak_rss_mb(children=True)
+        self.exit_code = 0
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        flush()
+        rss = peak_rss_mb()
+        children_rss = peak_rss_mb(children=True)
+        # RUSAGE_CHILDREN은 실행 시작 후 종료된 자식 전체의 최대값이라 누적값으로 남기고,
+        # 이 단계의 자식이 그 최대값을 올렸을 때만 단계 값으로 본다 (아니면 알 수 없으므로 None).
+        children_grew = children_rss is not None and self._children_rss is not None and children_rss > self._children_rss
+        _append(
+            {
+                "type": "stage",
+                "seconds": round(time.perf_counter() - self._wall, 3),
+                "cpu_seconds": round(time.process_time() - self._cpu, 3),
+                # in-process 실행에서는 프로세스 전체 최대값이라 단계별 증가분도 함께 남긴다.
+                "peak_rss_mb": rss,
+                "rss_growth_mb": round(rss - self._rss, 1) if rss is not None and self._rss is not None else None,
+                "children_peak_rss_mb": children_rss if children_grew else None,
+                "children_peak_rss_mb_cumulative": children_rss,
+                "exit_code": self.exit_code if exc_type is None else 1,
+            }
+        )
+
+
+def start_run(report_dir: Path) -> Path:
+    """새 실행의 metrics.jsonl을 비우고 환경변수를 설정한다 (서브프로세스/워커에도 상속)."""
+    report_dir.mkdir(parents=True, exist_ok=True)
+    path = (report_dir / METRICS_NAME).resolve()
+    path.write_text("", encoding="utf-8")
+    os.environ[METRICS_ENV] = str(path)
+    return path
+
+
+def read_metrics(path: Path) -> List[dict]:
+    records: List[dict] = []
+    if not path.exists():
+        return records
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue  # 중단된 실행이 남긴 잘린 줄
+    return records
+
+
+def build_profile(records: Iterable[dict], run_info: dict) -> dict:
+    """metrics 줄을 단계별로 모은다. 같은 단계의 카운터는 프로세스를 넘어 합산한다.
+
+    totals에는 단계를 넘어 더해도 되는 카운터(ADDITIVE_PREFIXES)만 합산하고, 페이지/표/그림처럼 여러
+    단계가 다시 세는 처리 건수는 COUNT_SOURCES 단계의 값을 그대로 쓴다. 단계별 건수는 stages에 남는다.
+    """
+    stage_keys = (
+        "seconds",
+        "cpu_seconds",
+        "peak_rss_mb",
+        "rss_growth_mb",
+        "children_peak_rss_mb",
+        "children_peak_rss_mb_cumulative",
+        "exit_code",
+    )
+    stages: dict[str, dict] = {}
+    totals: Counter = Counter()
+    for record in records:
+        stage = stages.setdefault(record.get("stage", "unknown"), {"counters": {}})
+        if record.get("type") == "stage":
+            for key in stage_keys:
+                stage[key] = record.get(key)
+        elif record.get("type") == "counters":
+            merged = Counter(stage["counters"])
+            merged.update(record.get("counters", {}))
+            stage["counters"] = dict(merged)
+    for stage in stages.values():
+        totals["seconds"] += stage.get("seconds") or 0
+        totals.update({key: value for key, value in stage["counters"].items() if key.startswith(ADDITIVE_PREFIXES)})
+    summary = dict(totals)
+    for key, source in COUNT_SOURCES.items():
+        value = stages.get(source, {}).get("counters", {}).get(key)
+        if value is not None:
+            summary[key] = value
+    # 최대 RSS는 단계/자식 최대값 중 가장 큰 값 (누적 최대값이라 max로 모아도 된다)
+    peaks = [stage.get("peak_rss_mb") or 0 for stage in stages.values()]
+    peaks += [
+        stage.get("children_peak_rss_mb_cumulative") or stage.get("children_peak_rss_mb") or 0
+        for stage in stages.values()
+    ]
+    summary["seconds"] = round(summary.get("seconds", 0), 3)
+    summary["peak_rss_mb"] = max(peaks, default=0)
+    return {**run_info, "stages": stages, "totals": summary}
+
+
+def finish_run(report_dir: Path, run_info: dict) -> dict:
+    """metrics.jsonl을 모아 profile.json을 쓰고 profile_history.jsonl에 한 줄 추가한다."""
+    flush()
+    profile = build_profile(read_metrics(report_dir / METRICS_NAME), run_info)
+    write_json_atomic(report_dir / PROFILE_NAME, profile)
+    with (report_dir / HISTORY_NAME).open("a", encoding="utf-8") as handle:
+        handle.write(json.dumps(profile, ensure_ascii=False) + "\n")
+    os.environ.pop(METRICS_ENV, None)
+    os.environ.pop(STAGE_ENV, None)
+    return profile
+
+
+def load_profiles(target: Path, last: int | None) -> List[dict]:
+    """보고서 폴더(실행 이력 전체), profile_history.jsonl, profile.json 중 무엇이든 받는다."""
+    if target.is_dir():
+        history = target / HISTORY_NAME
+        target = history if history.exists() else target / PROFILE_NAME
+    if not target.exists():
+        raise FileNotFoundError(f"프로파일을 찾을 수 없습니다: {target}")
+    if target.suffix == ".jsonl":
+        profiles = read_metrics(target)
+        return profiles[-last:] if last else profiles
+    return [json.loads(target.read_text(encoding="utf-8"))]
+
+
+def _format_delta(value, base) -> str:
+    if value is None:
+        return "-"
+    text = f"{value:,.1f}" if isinstance(value, float) else f"{value:,}"
+    if base and value != base and isinstance(base, (int, float)):
+        text += f" ({(value - base) / base:+.0%})"
+    return text
+
+
+def print_comparison(profiles: List[dict], counters: Iterable[str] | None) -> None:
+    """첫 프로파일을 기준으로 단계별 시간/메모리/카운터를 나란히 출력한다."""
+    labels = [f"{p.get('report', '?')}@{p.get('started_at', '?')}" for p in profiles]
+    for idx, label in enumerate(labels):
+        print(f"[{idx}] {label}")
+    stage_names = list(dict.fromkeys(name for p in profiles for name in p.get("stages", {})))
+    rows: List[tuple[str, str]] = []
+    for name in stage_names:
+        rows.append((name, "seconds"))
+        rows.append((name, "peak_rss_mb"))
+        names = counters
+        if names is None:
+            names = sorted({key for p in profiles for key in p.get("stages", {}).get(name, {}).get("counters", {})})
+        rows.extend((name, f"counters.{key}") for key in names)
+    rows.extend([("TOTAL", "seconds"), ("TOTAL", "peak_rss_mb")])
+    rows.extend(("TOTAL", key) for key in (counters or SUMMARY_COUNTERS))
+
+    def lookup(profile: dict, stage: str, key: str):
+        data = profile.get("totals", {}) if stage == "TOTAL" else profile.get("stages", {}).get(stage, {})
+        if key.startswith("counters."):
+            return data.get("counters", {}).get(key.split(".", 1)[1])
+        return data.get(key)
+
+    width = max(len(f"{stage}.{key}") for stage, key in rows) + 2
+    print("".ljust(width) + "".join(f"[{idx}]".rjust(22) for idx in range(len(profiles))))
+    for stage, key in rows:
+        values = [lookup(profile, stage, key) for profile in profiles]
+        if all(value is None for value in values):
+            continue
+        cells = [_format_delta(value, values[0]) for value in values]
+        print(f"{stage}.{key}".ljust(width) + "".join(cell.rjust(22) for cell in cells))
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="run_pipeline 프로파일(profile.json / profile_history.jsonl)을 단계별로 비교 출력.",
+    )
+    parser.add_argument(
+        "profiles",
+        type=Path,
+        nargs="+",
+        help="보고서 폴더, profile.json 또는 profile_history.jsonl. 첫 번째 항목이 비교 기준.",
+    )
+    parser.add_argument(
+        "--last",
+        type=int,
+        default=None,
+        help="보고서 폴더/이력 파일에서 최근 N개 실행만 사용.",
+    )
+    parser.add_argument(
+        "--all-counters",
+        action="store_true",
+        help="단계별 카운터를 모두 출력 (기본은 페이지/표/그림/GPT 호출·토큰만).",
+    )
+    return parser
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+
+    profiles: List[dict] = []
+    for target in args.profiles:
+        try:
+            profiles.extend(load_profiles(target, args.last))
+        except FileNotFoundError as exc:
+            parser.error(str(exc))
+    if not profiles:
+        parser.error("비교할 프로파일이 없습니다.")
+
+    print_comparison(profiles, None if args.all_counters else SUMMARY_COUNTERS)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
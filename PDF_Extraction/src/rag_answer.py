@@ -22,6 +22,7 @@ HF_TOKEN = os.getenv("HF_TOKEN")
 
 # 검색 모듈 경로 추가
 sys.path.append(str(Path(__file__).parent))
+from image_variants import gpt_image_path
 try:
     from search_vector_db import search_vector_db, release_gpu
 except ImportError:
@@ -159,7 +160,8 @@ def main():
     # Top-K 페이지만 참조
     for _, data in list(unique_pages.items())[:args.top_k]:
         if data["image_path"]:
-            img = resize_image_if_needed(Image.open(data["image_path"]), args.image_max_size)
+            # GPT용 압축본(*.gpt.webp)이 있으면 작은 파일을 읽는다 (어차피 image_max_size로 줄임).
+            img = resize_image_if_needed(Image.open(gpt_image_path(data["image_path"])), args.image_max_size)
             user_content.append({"type": "image", "image": img})
             user_content.append({"type": "text", "text": f"\n[Image: {data['info']}]\n"})
         
@@ -1,6 +1,6 @@
 """ESG 보고서 파이프라인 전체 실행 스크립트.
 
-순차 실행 단계
+실행 단계 (의존성 그래프 순서)
 1. PDF 인코딩 보정 여부 체크 (자동)
 2. Docling 구조화 추출 (실패 페이지는 GPT Vision Fallback)
 3. 표 텍스트 추출(OCR/PyMuPDF)
@@ -10,15 +10,27 @@
 7. 벡터 DB 구축 (옵션 --build-vector-db 플래그)
 8. 벡터 검색 테스트 (옵션  --search-queries 플래그)
 
-예시: 실행 파일 이름 명시해줘야함 
+각 단계는 `Stage`(모듈, 인자, 선행 단계)로 정의되며, 기본적으로 한 프로세스 안에서 각 모듈의
+`main(argv)`를 위상 순서대로 호출한다. Docling 변환기, 임베딩 모델, 열린 PDF 같은 무거운 자원은
+`PipelineContext`가 처음 필요할 때 한 번만 로드해 단계 간에 공유한다.
+`--subprocess`를 주면 예전처럼 단계마다 별도 Python 프로세스로 실행한다.
+
+실행마다 단계별 시간/CPU/최대 RSS와 단계가 남긴 처리 건수·GPT 호출/토큰을 `<결과 폴더>/metrics.jsonl`에 모아
+`profile.json`(+ `profile_history.jsonl`)으로 정리한다 (`pipeline_metrics.py`로 실행 간 비교, `--no-profile`로 끔).
+
+예시: 실행 파일 이름 명시해줘야함
     python src/run_pipeline.py --pdf data/input/2024_Samsung_Report.pdf --doc-name Samsung2024 \
         --load-db --build-vector-db --search-queries "hybrid::탄소 배출" "semantic::재생에너지 계획"
 """
 
 import argparse
+import importlib
 import subprocess
 import sys
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Any, Callable, Dict, List
 
 import pypdfium2 as pdfium
 import os
@@ -26,52 +38,386 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-# 실행할 개별 스크립트 경로 정의
+# 개별 단계 모듈이 있는 경로 (in-process import와 --subprocess 실행 모두 여기 기준)
 SRC_DIR = Path(__file__).parent.resolve()
-SCRIPT_PDF_EXTRACTOR = SRC_DIR / "pdf_text_extractor.py"
-SCRIPT_STRUCTURED = SRC_DIR / "structured_extract.py"
-SCRIPT_TABLE_OCR = SRC_DIR / "table_ocr.py"
-SCRIPT_FIGURE_OCR = SRC_DIR / "figure_ocr.py"
-SCRIPT_TABLE_DIFF = SRC_DIR / "table_diff.py"
-SCRIPT_LOAD_DB = SRC_DIR / "load_to_db.py"
-SCRIPT_BUILD_VECTOR = SRC_DIR / "build_vector_db.py"
-SCRIPT_SEARCH_VECTOR = SRC_DIR / "search_vector_db.py"
-
-
-def run_command(cmd: list[str], description: str):
-    """하위 스크립트를 공통 포맷으로 실행."""
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+import pipeline_metrics
+
+EMBEDDING_MODEL = os.getenv("RAG_EMBEDDING_MODEL", "BAAI/bge-m3")
+# cpu: Docling/OCR/임베딩 등 계산 위주, gpt: OpenAI API 호출 위주(I/O), db: MySQL 적재
+STAGE_RESOURCES = ("cpu", "gpt", "db")
+
+
+@dataclass
+class Stage:
+    """파이프라인 단계 하나.
+
+    module의 `main(argv, **공유자원)`을 호출한다. inject는 `main()` 키워드 인자 이름 -> 공유 자원 이름.
+    resource는 단계가 주로 쓰는 자원 종류(STAGE_RESOURCES)로, 여러 보고서를 동시에 돌릴 때 동시 실행 수 제한 기준이 된다.
+    """
+
+    name: str
+    description: str
+    module: str
+    argv: List[str]
+    deps: tuple[str, ...] = ()
+    inject: Dict[str, str] = field(default_factory=dict)
+    resource: str = "cpu"
+
+
+def _load_docling_converter(ctx: "PipelineContext"):
+    from docling.document_converter import DocumentConverter
+
+    return DocumentConverter()
+
+
+def _open_fitz_pdf(ctx: "PipelineContext"):
+    import fitz
+
+    return fitz.open(ctx.pdf_path)
+
+
+def _load_embedding_model(ctx: "PipelineContext"):
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+
+RESOURCE_LOADERS: Dict[str, Callable[["PipelineContext"], Any]] = {
+    "docling_converter": _load_docling_converter,
+    "fitz_pdf": _open_fitz_pdf,
+    "embedding_model": _load_embedding_model,
+}
+RESOURCE_CLOSERS: Dict[str, Callable[[Any], None]] = {
+    "fitz_pdf": lambda doc: doc.close(),
+}
+
+
+class PipelineContext:
+    """단계 간에 공유하는 자원(모델, 열린 PDF)을 지연 로드해 보관한다."""
+
+    def __init__(self, pdf_path: Path):
+        self.pdf_path = pdf_path
+        self._resources: Dict[str, Any] = {}
+
+    def get(self, name: str) -> Any:
+        if name not in self._resources:
+            print(f"📦 [Pipeline] 공유 자원 로드: {name}")
+            self._resources[name] = RESOURCE_LOADERS[name](self)
+        return self._resources[name]
+
+    def close(self) -> None:
+        for name, resource in self._resources.items():
+            closer = RESOURCE_CLOSERS.get(name)
+            if closer is not None:
+                closer(resource)
+        self._resources.clear()
+
+
+def topological_order(stages: List[Stage]) -> List[Stage]:
+    """선행 단계가 먼저 오도록 정렬한다. 의존성이 없는 단계끼리는 선언 순서를 유지한다."""
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        for dep in stage.deps:
+            if dep not in by_name:
+                raise ValueError(f"단계 '{stage.name}'의 선행 단계 '{dep}'가 정의되지 않았습니다.")
+
+    ordered: List[Stage] = []
+    done: set[str] = set()
+    remaining = list(stages)
+    while remaining:
+        ready = [stage for stage in remaining if all(dep in done for dep in stage.deps)]
+        if not ready:
+            cycle = ", ".join(stage.name for stage in remaining)
+            raise ValueError(f"단계 의존성에 순환이 있습니다: {cycle}")
+        for stage in ready:
+            ordered.append(stage)
+            done.add(stage.name)
+            remaining.remove(stage)
+    return ordered
+
+
+def _exit_code(exc: SystemExit) -> int:
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code)
+    return 1
+
+
+def stage_command(stage: Stage) -> List[str]:
+    """단계를 별도 프로세스로 실행할 때의 명령줄."""
+    return [sys.executable, str(SRC_DIR / f"{stage.module}.py"), *stage.argv]
+
+
+def run_stage(stage: Stage, ctx: PipelineContext, use_subprocess: bool = False) -> int:
+    """단계 하나를 공통 포맷으로 실행하고 종료 코드를 돌려준다."""
     print(f"\n{'='*60}")
-    print(f"🚀 [Pipeline] Starting: {description}")
-    print(f"   Command: {' '.join(str(c) for c in cmd)}")
+    print(f"🚀 [Pipeline] Starting: {stage.description}")
+    if use_subprocess:
+        cmd = stage_command(stage)
+        print(f"   Command: {' '.join(str(c) for c in cmd)}")
+        print(f"{'='*60}\n")
+        # Stream output to stdout
+        return subprocess.run(cmd).returncode
+
+    print(f"   Module: {stage.module}.main({' '.join(stage.argv)})")
     print(f"{'='*60}\n")
-    
+    module = importlib.import_module(stage.module)
+    kwargs = {arg: ctx.get(resource) for arg, resource in stage.inject.items()}
     try:
-        # Stream output to stdout
-        result = subprocess.run(cmd, check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"\n❌ [Pipeline] Failed at step: {description}")
-        print(f"   Exit Code: {e.returncode}")
-        print("   Aborting pipeline.")
-        sys.exit(e.returncode)
-    
-    print(f"\n✅ [Pipeline] Completed: {description}\n")
+        result = module.main(stage.argv, **kwargs)
+    except SystemExit as exc:
+        return _exit_code(exc)
+    return int(result or 0)
 
 
-def main():
+def run_stages(stages: List[Stage], ctx: PipelineContext, use_subprocess: bool = False) -> None:
+    for stage in topological_order(stages):
+        with pipeline_metrics.StageTimer(stage.name) as timer:
+            return_code = run_stage(stage, ctx, use_subprocess)
+            timer.exit_code = return_code
+        if return_code != 0:
+            print(f"\n❌ [Pipeline] Failed at step: {stage.description}")
+            print(f"   Exit Code: {return_code}")
+            print("   Aborting pipeline.")
+            sys.exit(return_code)
+        print(f"\n✅ [Pipeline] Completed: {stage.description}\n")
+
+
+def build_stages(
+    args: argparse.Namespace,
+    pdf_path: Path,
+    doc_name: str,
+    page_selection: str,
+    target_page_dir: Path,
+) -> List[Stage]:
+    stages: List[Stage] = []
+
+    # 1. PDF Sanitization (Step 0)
+    # pdf_text_extractor는 문제가 없으면 0을 반환하고, 필요하면 *_sanitized.pdf를 만든다.
+    # structured_extract는 sanitized 파일이 있으면 자동으로 그 파일로 전환하므로 원본 경로를 그대로 넘긴다.
+    if not args.skip_sanitize:
+        stages.append(
+            Stage("sanitize", "Step 0: PDF Sanitization Check", "pdf_text_extractor", ["--pdf", str(pdf_path)])
+        )
+
+    # 2. Structured Extraction (구조화 결과 폴더명을 doc_name으로 고정)
+    # 다중 프로세스 모드는 워커마다 변환기를 따로 만들므로 공유 변환기를 로드하지 않는다.
+    cmd_struct = ["--pdf", str(pdf_path), "--pages", page_selection, "--report-name", doc_name]
+    # 백엔드 auto_pipeline_pages(image_path IS NOT NULL)와 RAG 화면이 모든 페이지의 page.png를 쓰므로 기본은 always.
+    cmd_struct.extend(["--page-image", args.page_images])
+    if args.page_image_scale:
+        cmd_struct.extend(["--page-image-scale", str(args.page_image_scale)])
+    if args.image_variant:
+        cmd_struct.extend(["--image-variant", args.image_variant])
+    if args.max_window_pages is not None:
+        cmd_struct.extend(["--max-window-pages", str(args.max_window_pages)])
+    struct_inject = {"converter": "docling_converter"}
+    if args.extract_workers > 1:
+        cmd_struct.extend(["--workers", str(args.extract_workers)])
+        struct_inject = {}
+    stages.append(
+        Stage(
+            "structured",
+            "Step 1: Docling Structured Extraction",
+            "structured_extract",
+            cmd_struct,
+            deps=tuple(stage.name for stage in stages if stage.name == "sanitize"),
+            inject=struct_inject,
+        )
+    )
+
+    # 3. Table OCR (표 추출은 구조화 폴더를 명시적으로 지정)
+    stages.append(
+        Stage(
+            "table_ocr",
+            "Step 2: Table Text Extraction (OCR/PDF)",
+            "table_ocr",
+            # 표마다 텍스트 레이어가 쓸 만하면 PDF 텍스트, 래스터/깨진 영역만 RapidOCR.
+            # 숫자 diff도 메모리의 결과로 바로 계산하므로 table_diff 단계를 따로 두지 않는다.
+            [
+                "--pages", page_selection,
+                "--structured-dir", str(target_page_dir),
+                "--pdf", str(pdf_path),
+                "--backend", "auto",
+                "--with-diff",
+            ],
+            deps=("structured",),
+            inject={"pdf_doc": "fitz_pdf"},
+            resource="cpu",
+        )
+    )
+
+    # 4. Figure OCR
+    extraction_tail = ["table_ocr"]
+    if not args.skip_gpt:
+        stages.append(
+            Stage(
+                "figure_ocr",
+                "Step 3: Figure Description (GPT)",
+                "figure_ocr",
+                [
+                    "--model", "gpt-4o-mini", "--pages", page_selection, "--structured-dir", str(target_page_dir),
+                    *(["--dedupe"] if args.figure_dedupe else []),
+                ],
+                deps=("structured",),
+                resource="gpt",
+            )
+        )
+        extraction_tail.append("figure_ocr")
+
+    # 묶음 산출물 (옵션): 추출 단계가 모두 끝난 뒤 Parquet + 이미지 zip으로 묶고, DB 적재는 묶음에서 읽는다.
+    if args.pack_artifacts:
+        stages.append(
+            Stage(
+                "pack",
+                "Step 4.5: Pack Report Artifacts",
+                "artifact_store",
+                ["--structured-dir", str(target_page_dir)],
+                deps=tuple(extraction_tail),
+            )
+        )
+        extraction_tail = ["pack"]
+
+    # 6. DB 적재
+    vector_deps = tuple(extraction_tail)
+    if args.load_db:
+        cmd_load = ["--doc-name", doc_name, "--input-dir", str(target_page_dir)]
+        if not args.pack_artifacts:
+            # 이번 실행에서 묶지 않았으면 이전 실행이 남긴 묶음 대신 방금 갱신한 폴더를 읽는다.
+            cmd_load.append("--no-packed")
+        if args.init_db:
+            cmd_load.append("--init-db")
+        stages.append(
+            Stage("load_db", "Step 5: Database Loading", "load_to_db", cmd_load, deps=tuple(extraction_tail), resource="db")
+        )
+        vector_deps = ("load_db",)
+
+    # 7. 벡터 DB 구축 (옵션)
+    build_vector_flag = args.build_vector_db or (args.search_queries is not None and len(args.search_queries) > 0)
+    if build_vector_flag:
+        print("\n💡 벡터 DB는 DB 적재된 데이터를 기반으로 하므로 load_db 실행을 권장합니다.")
+        cmd_vector: List[str] = []
+        if args.reset_vector_db:
+            cmd_vector.append("--reset")
+        if args.resume_vector_db:
+            cmd_vector.append("--resume")
+        if args.remote_host:
+            cmd_vector.extend(["--remote-host", args.remote_host])
+        if args.remote_port:
+            cmd_vector.extend(["--remote-port", str(args.remote_port)])
+        if args.company:
+            cmd_vector.extend(["--company", args.company])
+        if args.year:
+            cmd_vector.extend(["--year", str(args.year)])
+        stages.append(
+            Stage(
+                "vector_db",
+                "Step 6: Vector DB Build",
+                "build_vector_db",
+                cmd_vector,
+                deps=vector_deps,
+                inject={"model": "embedding_model"},
+            )
+        )
+
+    # 8. 벡터 검색 (옵션)
+    for idx, raw_query in enumerate(args.search_queries or [], start=1):
+        if "::" in raw_query:
+            mode, query = raw_query.split("::", 1)
+            mode = mode.strip() or args.search_mode
+        else:
+            mode = args.search_mode
+            query = raw_query
+        query = query.strip()
+        if not query:
+            continue
+        stages.append(
+            Stage(
+                f"search_{idx}",
+                f"Step 7: Vector Search ({mode} :: {query})",
+                "search_vector_db",
+                [query, "--top-k", str(args.search_top_k), "--mode", mode],
+                deps=("vector_db",),
+                inject={"model": "embedding_model"},
+            )
+        )
+
+    return stages
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="ESG 전체 파이프라인 실행기")
     parser.add_argument("--pdf", type=Path, required=True, help="입력 PDF 경로")
     parser.add_argument("--pages", type=str, default=None, help="처리할 페이지 범위 (예: 1-10, 25)")
     parser.add_argument("--doc-name", type=str, default=None, help="결과 폴더/DB에 사용할 문서 이름 (기본: PDF 파일명(stem))")
-    
+
     # Feature Flags
     parser.add_argument("--skip-sanitize", action="store_true", help="Skip the PDF sanitization check step")
     parser.add_argument("--skip-gpt", action="store_true", help="Skip GPT-based figure description")
+    parser.add_argument(
+        "--figure-dedupe",
+        action="store_true",
+        help="figure_ocr --dedupe: dHash와 OCR 텍스트가 모두 같은 그림은 이전 설명을 재사용 (기본 off)",
+    )
     parser.add_argument("--load-db", action="store_true", help="Load results into MySQL database after processing")
     parser.add_argument("--init-db", action="store_true", help="Initialize DB schema before loading (use with --load-db)")
+    parser.add_argument(
+        "--extract-workers",
+        type=int,
+        default=1,
+        help="Docling 구조화 추출을 페이지 분할로 병렬 실행할 프로세스 수 (structured_extract --workers)",
+    )
+    parser.add_argument(
+        "--max-window-pages",
+        type=int,
+        default=None,
+        help="Docling 한 번의 변환에 넘길 최대 페이지 수 (structured_extract --max-window-pages, 0=제한 없음)",
+    )
+    parser.add_argument(
+        "--page-images",
+        choices=("always", "visual", "never"),
+        default="always",
+        help=(
+            "전체 페이지 PNG 저장 범위 (structured_extract --page-image). 기본 always. "
+            "visual은 표/그림 페이지만 저장하므로 백엔드 자동 파이프라인/RAG 화면에서 텍스트 페이지 이미지가 빠진다"
+        ),
+    )
+    parser.add_argument(
+        "--page-image-scale",
+        type=float,
+        default=None,
+        help="전체 페이지 PNG 렌더링 배율 (structured_extract --page-image-scale)",
+    )
+    parser.add_argument(
+        "--image-variant",
+        choices=("webp", "jpeg", "none"),
+        default=None,
+        help="GPT 전송용 이미지 압축본 형식 (structured_extract --image-variant, 기본 webp)",
+    )
+    parser.add_argument(
+        "--pack-artifacts",
+        action="store_true",
+        help="추출 후 보고서 산출물을 artifacts/ (Parquet + images.zip)로 묶음 (pyarrow 필요). DB 적재는 묶음에서 읽음",
+    )
+    parser.add_argument(
+        "--no-profile",
+        action="store_true",
+        help="단계별 계측(metrics.jsonl)과 결과 폴더의 profile.json 작성을 끔",
+    )
+    parser.add_argument(
+        "--subprocess",
+        action="store_true",
+        help="단계마다 별도 Python 프로세스로 실행 (모델/라이브러리 공유 없이 격리 실행)",
+    )
 
     # 추가 기능: 벡터 DB 구축 + 검색 자동화
     parser.add_argument("--build-vector-db", action="store_true", help="테이블/그림 적재 후 벡터 DB도 즉시 구축")
     parser.add_argument("--reset-vector-db", action="store_true", help="벡터 DB를 초기화하고 재구축 (주의)")
+    parser.add_argument("--resume-vector-db", action="store_true", help="벡터 DB 구축 체크포인트에서 이어서 진행")
     parser.add_argument("--remote-host", type=str, default=os.getenv("CHROMA_HOST", None), help="원격 Chroma 서버 호스트 (기본: 환경변수 CHROMA_HOST)")
     parser.add_argument("--remote-port", type=int, default=os.getenv("CHROMA_PORT", None), help="원격 Chroma 서버 포트 (기본: 환경변수 CHROMA_PORT)")
     parser.add_argument("--company", type=str, default=None, help="벡터 DB 파이프라인 진행시 필터링할 회사명")
@@ -89,135 +435,61 @@ def main():
         help="search-queries에 모드가 명시되지 않았을 때 사용할 기본 모드",
     )
     parser.add_argument("--search-top-k", type=int, default=5, help="검색 결과 개수")
-    
+
+    return parser
+
+
+def resolve_page_selection(pdf_path: Path, pages: str | None) -> str:
+    """--pages가 없으면 PDF 전체 범위(1-N)를 돌려준다."""
+    if pages:
+        return pages
+    pdf_doc = pdfium.PdfDocument(str(pdf_path))
+    total_pages = len(pdf_doc)
+    pdf_doc.close()
+    return f"1-{total_pages}"
+
+
+def main():
+    parser = build_arg_parser()
     args = parser.parse_args()
 
     # 0. Validate Input
     if not args.pdf.exists():
         print(f"Error: Input PDF not found: {args.pdf}")
         sys.exit(1)
-        
+
     pdf_path = args.pdf.resolve()
-    
-    # 1. PDF Sanitization (Step 0)
-    # The pdf_text_extractor.py tool handles the check logic internally.
-    # It returns 0 if fine, or creates a sanitized file if needed.
-    # However, structured_extract.py has logic to auto-switch to sanitized file.
-    # WE MUST RUN sanitization check unless skipped.
-    if not args.skip_sanitize:
-        cmd_sanitize = [sys.executable, str(SCRIPT_PDF_EXTRACTOR), "--pdf", str(pdf_path)]
-        # We don't check=True here because the script might return non-zero on error,
-        # but current logic returns 1 on failure. We want to stop if sanitization fails.
-        # But wait, pdf_text_extractor returns 0 on [Pass] as well. So check=True is fine.
-        run_command(cmd_sanitize, "Step 0: PDF Sanitization Check")
-    
-    # Note: structured_extract.py has auto-switch logic, so we just pass the ORIGINAL path.
-    # It will pick up the sanitized file if it exists.
-
-    if args.pages:
-        page_selection = args.pages
-    else:
-        pdf_doc = pdfium.PdfDocument(str(pdf_path))
-        total_pages = len(pdf_doc)
-        pdf_doc.close()
-        page_selection = f"1-{total_pages}"
-
-    # 2. Structured Extraction
-    cmd_struct = [
-        sys.executable,
-        str(SCRIPT_STRUCTURED),
-        "--pdf",
-        str(pdf_path),
-        "--pages",
-        page_selection,
-    ]
-        
-    # 구조화 결과 폴더명을 doc_name으로 고정 (PDF 이름 기반)
-    doc_name = args.doc_name or pdf_path.stem
-    cmd_struct.extend(["--report-name", doc_name])
 
-    run_command(cmd_struct, "Step 1: Docling Structured Extraction")
-    
-    # 3. Table OCR
+    page_selection = resolve_page_selection(pdf_path, args.pages)
+
+    doc_name = args.doc_name or pdf_path.stem
     # Now we know exactly where the pages are: data/pages_structured/{doc_name}
     target_page_dir = Path("data/pages_structured") / doc_name
-    
-    cmd_tocr = [sys.executable, str(SCRIPT_TABLE_OCR)]
-    if page_selection:
-        cmd_tocr.extend(["--pages", page_selection])
-    
-    # 표 추출은 구조화 폴더를 명시적으로 지정
-    cmd_tocr.extend(["--structured-dir", str(target_page_dir)])
-    cmd_tocr.extend(["--pdf", str(pdf_path)]) 
-    
-    run_command(cmd_tocr, "Step 2: Table Text Extraction (OCR/PDF)")
-    
-    # 4. Figure OCR
-    if not args.skip_gpt:
-        cmd_fig = [sys.executable, str(SCRIPT_FIGURE_OCR), "--model", "gpt-4o-mini"]
-        if page_selection:
-            cmd_fig.extend(["--pages", page_selection])
-        cmd_fig.extend(["--structured-dir", str(target_page_dir)]) # Ensure we point to correct folder
-        run_command(cmd_fig, "Step 3: Figure Description (GPT)")
-    
-    # 5. Table Diff
-    cmd_diff = [sys.executable, str(SCRIPT_TABLE_DIFF)]
-    if page_selection:
-        cmd_diff.extend(["--pages", page_selection])
-    cmd_diff.extend(["--structured-dir", str(target_page_dir)])
-    run_command(cmd_diff, "Step 4: Table Validation (Diff)")
-    
-    # 6. DB 적재
-    if args.load_db:
-        cmd_load = [sys.executable, str(SCRIPT_LOAD_DB), "--doc-name", doc_name]
-        if args.init_db:
-            cmd_load.append("--init-db")
-        # Ensure loading script knows where to look
-        cmd_load.extend(["--input-dir", str(target_page_dir)])
-        
-        run_command(cmd_load, "Step 5: Database Loading")
-
-    # 7. 벡터 DB 구축 (옵션)
-    build_vector_flag = args.build_vector_db or (args.search_queries is not None and len(args.search_queries) > 0)
-    if build_vector_flag:
-        print("\n💡 벡터 DB는 DB 적재된 데이터를 기반으로 하므로 load_db 실행을 권장합니다.")
-        cmd_vector = [sys.executable, str(SCRIPT_BUILD_VECTOR)]
-        if args.reset_vector_db:
-            cmd_vector.append("--reset")
-        if args.remote_host:
-            cmd_vector.extend(["--remote-host", args.remote_host])
-        if args.remote_port:
-            cmd_vector.extend(["--remote-port", str(args.remote_port)])
-        if args.company:
-            cmd_vector.extend(["--company", args.company])
-        if args.year:
-            cmd_vector.extend(["--year", str(args.year)])
-        
-        run_command(cmd_vector, "Step 6: Vector DB Build")
 
-    # 8. 벡터 검색 (옵션)
-    if args.search_queries:
-        for raw_query in args.search_queries:
-            if "::" in raw_query:
-                mode, query = raw_query.split("::", 1)
-                mode = mode.strip() or args.search_mode
-            else:
-                mode = args.search_mode
-                query = raw_query
-            query = query.strip()
-            if not query:
-                continue
-            cmd_search = [
-                sys.executable,
-                str(SCRIPT_SEARCH_VECTOR),
-                query,
-                "--top-k",
-                str(args.search_top_k),
-                "--mode",
-                mode,
-            ]
-            desc = f"Step 7: Vector Search ({mode} :: {query})"
-            run_command(cmd_search, desc)
+    stages = build_stages(args, pdf_path, doc_name, page_selection, target_page_dir)
+    if not args.no_profile:
+        pipeline_metrics.start_run(target_page_dir)
+    run_info = {
+        "report": doc_name,
+        "pdf": str(pdf_path),
+        "pages": page_selection,
+        "stages_planned": [stage.name for stage in stages],
+        "subprocess": args.subprocess,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    ctx = PipelineContext(pdf_path)
+    try:
+        run_stages(stages, ctx, use_subprocess=args.subprocess)
+    finally:
+        ctx.close()
+        if not args.no_profile:
+            # 실패한 실행도 어디까지 얼마나 걸렸는지 남긴다.
+            profile = pipeline_metrics.finish_run(target_page_dir, run_info)
+            totals = profile["totals"]
+            print(
+                f"\n📊 [Profile] {totals['seconds']:.1f}s, 최대 RSS {totals['peak_rss_mb']}MB, "
+                f"GPT 호출 {totals.get('gpt_calls', 0)}회 -> {target_page_dir / pipeline_metrics.PROFILE_NAME}"
+            )
 
     print("\n✨ [Pipeline] 모든 단계 완료")
     print(f"   - 결과 폴더: {target_page_dir}")
@@ -25,6 +25,8 @@ try:
 except Exception as exc:  # pylint: disable=broad-except
     raise RuntimeError("키워드 검색을 위해 kiwipiepy가 필요합니다. 'pip install kiwipiepy' 후 다시 실행하세요.") from exc
 
+from kiwi_tokens import TokenCache, load_token_cache, token_forms
+
 KIWI = Kiwi()
 
 try:
@@ -37,6 +39,8 @@ VECTOR_DB_DIR = str(Path(__file__).resolve().parent / "vector_db")
 COLLECTIONS = ["esg_pages", "esg_chunks"]
 EMBEDDING_MODEL_NAME = os.getenv("RAG_EMBEDDING_MODEL", "BAAI/bge-m3")
 MAX_KEYWORD_DOCS = 2000
+# build_vector_db --token-cache가 vector_db/ 아래에 남기는 청크 토큰 캐시
+TOKEN_CACHE_NAME = "chunk_tokens"
 RERANK_CANDIDATES = 50
 SEMANTIC_WEIGHT = 0.6
 KEYWORD_WEIGHT = 0.4
@@ -53,11 +57,28 @@ class Candidate:
     rerank_score: float | None = None
 
 
+_TOKEN_CACHES: Dict[str, Optional[TokenCache]] = {}
+
+
 def tokenize(text: str) -> List[str]:
-    text = (text or "").strip()
-    if not text:
-        return []
-    return [token.form for token in KIWI.tokenize(text) if token.form.strip()]
+    return token_forms(KIWI, text)
+
+
+def get_token_cache(vector_db_path: str | Path | None) -> Optional[TokenCache]:
+    """청크 토큰 캐시를 프로세스당 한 번만 읽는다. 캐시가 없으면 None (모두 Kiwi로 토큰화)."""
+    prefix = Path(vector_db_path or VECTOR_DB_DIR) / TOKEN_CACHE_NAME
+    key = str(prefix)
+    if key not in _TOKEN_CACHES:
+        _TOKEN_CACHES[key] = load_token_cache(prefix)
+    return _TOKEN_CACHES[key]
+
+
+def tokenize_record(record_id: str, text: str, token_cache: Optional[TokenCache]) -> List[str]:
+    if token_cache is not None:
+        tokens = token_cache.get(record_id, text)
+        if tokens is not None:
+            return tokens
+    return tokenize(text)
 
 
 def bm25_scores(corpus_tokens: List[List[str]], query_tokens: List[str], k1: float = 1.5, b: float = 0.75) -> List[float]:
@@ -115,18 +136,26 @@ def semantic_search(collections, model, query: str, top_k: int, metadata_filter:
     return results[:top_k]
 
 
-def keyword_search_full(collections, query: str, top_k: int, metadata_filter: Dict | None) -> List[Candidate]:
+def keyword_search_full(
+    collections,
+    query: str,
+    top_k: int,
+    metadata_filter: Dict | None,
+    token_cache: Optional[TokenCache] = None,
+) -> List[Candidate]:
     query_tokens = tokenize(query)
     if not query_tokens:
         return []
     docs_all = []
+    corpus_tokens = []
     for collection in collections.values():
         data = collection.get(include=["documents", "metadatas"], limit=MAX_KEYWORD_DOCS, where=metadata_filter)
+        ids = data.get("ids") or []
         docs = data.get("documents") or []
         metas = data.get("metadatas") or []
-        for text, meta in zip(docs, metas):
+        for record_id, text, meta in zip(ids, docs, metas):
             docs_all.append((collection.name, text, meta or {}))
-    corpus_tokens = [tokenize(text) for _, text, _ in docs_all]
+            corpus_tokens.append(tokenize_record(record_id, text, token_cache))
     scores = bm25_scores(corpus_tokens, query_tokens)
     ranked = sorted(zip(docs_all, scores), key=lambda x: x[1], reverse=True)[:top_k]
     return [Candidate(name, text, meta, keyword_score=score) for (name, text, meta), score in ranked]
@@ -151,9 +180,28 @@ def aggregate_page_text(cand: Candidate, chunk_collection) -> str:
     return " ".join(texts)
 
 
-def keyword_scores_for_candidates(candidates: List[Candidate], query: str, chunk_collection) -> None:
+def page_tokens(cand: Candidate, chunk_collection, token_cache: Optional[TokenCache]) -> List[str]:
+    """aggregate_page_text와 같은 텍스트의 토큰. 청크는 캐시가 있으면 캐시의 토큰을 쓴다."""
+    tokens = tokenize(cand.document)
+    doc_id = cand.metadata.get("doc_id")
+    page_id = cand.metadata.get("page_id")
+    if not chunk_collection or doc_id is None or page_id is None:
+        return tokens
+    filters = {"$and": [{"doc_id": doc_id}, {"page_id": page_id}]}
+    data = chunk_collection.get(where=filters, include=["documents"])
+    for record_id, text in zip(data.get("ids") or [], data.get("documents") or []):
+        tokens.extend(tokenize_record(record_id, text, token_cache))
+    return tokens
+
+
+def keyword_scores_for_candidates(
+    candidates: List[Candidate],
+    query: str,
+    chunk_collection,
+    token_cache: Optional[TokenCache] = None,
+) -> None:
     query_tokens = tokenize(query)
-    corpus_tokens = [tokenize(aggregate_page_text(cand, chunk_collection)) for cand in candidates]
+    corpus_tokens = [page_tokens(cand, chunk_collection, token_cache) for cand in candidates]
     scores = bm25_scores(corpus_tokens, query_tokens)
     for cand, score in zip(candidates, scores):
         cand.keyword_score = score
@@ -269,6 +317,7 @@ def search_vector_db(
     chroma_host: str | None = None,
     chroma_port: int | None = None,
     verbose: bool = True,
+    model: SentenceTransformer | None = None,
 ):
     client, target = build_chroma_client(
         vector_db_path=vector_db_path,
@@ -284,15 +333,17 @@ def search_vector_db(
             print("❌ 사용 가능한 컬렉션이 없습니다.")
         return []
 
-    model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    if model is None:
+        model = SentenceTransformer(EMBEDDING_MODEL_NAME)
     chunk_collection = collections.get("esg_chunks")
     metadata_filter = build_metadata_filter(filter_company, filter_year)
+    token_cache = get_token_cache(vector_db_path)
 
     if mode == "semantic":
         candidates = semantic_search(collections, model, query, max(top_k, semantic_top_k), metadata_filter)
         apply_combined_score(candidates, use_sem=True, use_kw=False)
     elif mode == "keyword":
-        candidates = keyword_search_full(collections, query, top_k, metadata_filter)
+        candidates = keyword_search_full(collections, query, top_k, metadata_filter, token_cache)
         apply_combined_score(candidates, use_sem=False, use_kw=True)
     else:
         sem_candidates = semantic_search(collections, model, query, semantic_top_k, metadata_filter)
@@ -300,7 +351,7 @@ def search_vector_db(
             if verbose:
                 print("검색 결과가 없습니다 (semantic).")
             return []
-        keyword_scores_for_candidates(sem_candidates, query, chunk_collection)
+        keyword_scores_for_candidates(sem_candidates, query, chunk_collection, token_cache)
         apply_combined_score(sem_candidates, use_sem=True, use_kw=True)
         candidates = sem_candidates
 
@@ -347,7 +398,7 @@ def search_vector_db(
     return results_payload
 
 
-if __name__ == "__main__":
+def main(argv: List[str] | None = None, model: SentenceTransformer | None = None) -> int:
     parser = argparse.ArgumentParser(description="Chroma 기반 ESG Vector 검색기")
     parser.add_argument("query", type=str, help="검색 질의어")
     parser.add_argument("--top-k", type=int, default=5, help="출력할 결과 수")
@@ -363,7 +414,7 @@ if __name__ == "__main__":
     parser.add_argument("--year", type=int, default=None, help="보고서 연도 필터")
     parser.add_argument("--chroma-host", type=str, default=None, help="원격 Chroma host")
     parser.add_argument("--chroma-port", type=int, default=None, help="원격 Chroma port")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     search_vector_db(
         args.query,
@@ -375,4 +426,10 @@ if __name__ == "__main__":
         filter_year=getattr(args, "year", None),
         chroma_host=getattr(args, "chroma_host", None),
         chroma_port=getattr(args, "chroma_port", None),
+        model=model,
     )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
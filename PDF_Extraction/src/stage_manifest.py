@@ -0,0 +1,130 @@
+"""보고서별 단계 실행 기록(manifest.json).
+
+단계/항목(페이지, 표, 그림)마다 입력 해시(원본 PDF·상위 산출물 해시, 단계 버전, 파라미터)와
+생성한 산출물의 해시를 남긴다. 다음 실행에서 입력 해시가 같고 산출물이 그대로 있으면 그 항목을 건너뛴다.
+
+파일 해시는 (크기, mtime) 기준으로 manifest 안에 캐시하므로 바뀌지 않은 대용량 PDF/이미지를 매번 다시 읽지 않는다.
+page.json처럼 여러 단계가 함께 고치는 파일은 `touched`로 기록해 존재 여부만 확인한다.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Iterable
+
+MANIFEST_NAME = "manifest.json"
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def hash_payload(*parts) -> str:
+    """단계 이름/버전/파라미터/입력 해시 등을 묶어 하나의 입력 해시로 만든다."""
+    encoded = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(HASH_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class StageManifest:
+    """`<report_root>/manifest.json`을 읽고 쓴다. 각 단계 스크립트가 시작할 때 열고 끝날 때 save()한다."""
+
+    def __init__(self, report_root: Path):
+        self.root = report_root
+        self.path = report_root / MANIFEST_NAME
+        self.data: dict = {"stages": {}, "files": {}}
+        if self.path.exists():
+            try:
+                loaded = json.loads(self.path.read_text(encoding="utf-8"))
+            except json.JSONDecodeError:
+                print(f"⚠️ manifest를 읽지 못해 새로 만듭니다: {self.path}")
+            else:
+                self.data["stages"] = loaded.get("stages", {})
+                self.data["files"] = loaded.get("files", {})
+        self._dirty = False
+
+    def _file_key(self, path: Path) -> str:
+        try:
+            return str(path.resolve().relative_to(self.root.resolve()))
+        except ValueError:
+            return str(path.resolve())
+
+    def file_digest(self, path: Path) -> str | None:
+        """파일 sha256. 파일이 없으면 None."""
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        key = self._file_key(path)
+        cached = self.data["files"].get(key)
+        if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+            return cached["sha256"]
+        digest = _sha256_file(path)
+        self.data["files"][key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+        self._dirty = True
+        return digest
+
+    def _entry(self, stage: str, key: str) -> dict | None:
+        return self.data["stages"].get(stage, {}).get(key)
+
+    def has_entry(self, stage: str, key: str) -> bool:
+        return self._entry(stage, key) is not None
+
+    def is_fresh(self, stage: str, key: str, input_hash: str) -> bool:
+        """입력 해시가 같고 기록한 산출물이 모두 그대로 있으면 True."""
+        entry = self._entry(stage, key)
+        if entry is None or entry.get("input") != input_hash:
+            return False
+        for rel_path, digest in entry.get("outputs", {}).items():
+            path = self.root / rel_path
+            if digest is None:
+                if not path.exists():
+                    return False
+            elif self.file_digest(path) != digest:
+                return False
+        return True
+
+    def record(
+        self,
+        stage: str,
+        key: str,
+        input_hash: str,
+        outputs: Iterable[Path],
+        touched: Iterable[Path] = (),
+    ) -> None:
+        """항목 실행 결과를 기록한다. touched는 다른 단계도 고치는 파일이라 존재 여부만 본다."""
+        recorded: dict[str, str | None] = {}
+        for path in outputs:
+            digest = self.file_digest(path)
+            if digest is not None:
+                recorded[self._file_key(path)] = digest
+        for path in touched:
+            if path.exists():
+                recorded[self._file_key(path)] = None
+        self.data["stages"].setdefault(stage, {})[key] = {
+            "input": input_hash,
+            "outputs": recorded,
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(self.data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        self._dirty = False
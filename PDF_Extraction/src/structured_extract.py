@@ -7,12 +7,19 @@
 from __future__ import annotations
 
 import argparse
-import base64
+import gc
+import html
 import json
+import multiprocessing
 import os
-from dataclasses import dataclass
-from io import BytesIO
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
 from pathlib import Path
+from types import SimpleNamespace
 from typing import Iterable, List
 
 import pypdfium2 as pdfium
@@ -20,9 +27,21 @@ from docling.datamodel.base_models import ConversionStatus
 from docling.document_converter import DocumentConverter
 from dotenv import load_dotenv
 from openai import OpenAI
-from collections import Counter
-import re
-import html
+
+import pipeline_metrics
+from image_variants import (
+    DEFAULT_VARIANT_FORMAT,
+    DEFAULT_VARIANT_MAX_SIDE,
+    DEFAULT_VARIANT_QUALITY,
+    VARIANT_FORMATS,
+    VariantSpec,
+    build_variant_spec,
+    find_variant,
+    pil_data_url,
+    write_variant,
+)
+from page_metadata import write_json_atomic
+from stage_manifest import StageManifest, hash_payload
 
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
@@ -31,6 +50,14 @@ DEFAULT_OUTPUT_DIR = REPO_ROOT / "data" / "pages_structured"
 GPT_API_KEY_PLACEHOLDER = "PASTE_YOUR_GPT_API_KEY"
 MIN_FIGURE_AREA_RATIO = 0.01
 FIGURE_HEADER_RATIO = 0.12
+# 헤더/푸터 패턴 비교에 쓰는 정규화 라인 앞부분 길이
+PATTERN_PREFIX_LEN = 15
+# Docling 한 번의 convert에 넘기는 최대 페이지 수 (0이면 연속 구간 전체). 큰 보고서의 최대 메모리를 일정하게 유지한다.
+DEFAULT_MAX_WINDOW_PAGES = 40
+# GPT Vision 대체 추출 동시 요청 수
+DEFAULT_FALLBACK_WORKERS = 4
+# 추출 로직/산출물 형식이 바뀌면 올려서 manifest 기록을 무효화한다.
+STAGE_VERSION = "1"
 
 load_dotenv()
 
@@ -53,55 +80,88 @@ def normalize_line(text: str) -> str:
     return text.strip().lower()
 
 
-def analyze_batch_patterns(doc, target_pages: list[int]) -> set[str]:
+def line_prefix_keys(markdown: str) -> set[str]:
+    """페이지 Markdown에서 정규화된 라인의 Prefix 집합을 만든다 ([IMAGE] 라인, 짧은 라인 제외)."""
+    keys: set[str] = set()
+    for line in markdown.split('\n'):
+        line = line.strip()
+        if not line: continue
+        if '[image]' in line.lower(): continue
+
+        norm = normalize_line(line)
+        if len(norm) < 4: continue
+
+        # Use Prefix as key (가변적인 뒷부분 무시)
+        keys.add(norm[:PATTERN_PREFIX_LEN])
+    return keys
+
+
+def select_common_prefixes(page_keys: Iterable[set[str]], page_count: int) -> set[str]:
     """
-    배치 내 공통 헤더/푸터 패턴 식별.
-    - 정규화된 라인의 '앞부분(Prefix)'을 기준으로 빈도 분석.
+    페이지별 Prefix 집합에서 공통 헤더/푸터 패턴을 고른다.
     - 기준: 배치 내 20% 이상 페이지 등장 (최소 3페이지).
     """
-    prefix_counts = Counter()
-    page_count = len(target_pages)
-    
     if page_count < 3:
         return set()
 
-    # Prefix 길이 설정 (가변적인 뒷부분 무시)
-    PREFIX_LEN = 15
-
-    for page_no in target_pages:
-        try:
-            md = doc.export_to_markdown(page_no=page_no, include_annotations=False)
-        except ValueError:
-            continue
-            
-        seen_in_page = set()
-        for line in md.split('\n'):
-            line = line.strip()
-            if not line: continue
-            if '[image]' in line.lower(): continue
-            
-            norm = normalize_line(line)
-            if len(norm) < 4: continue
-            
-            # Use Prefix as key
-            key = norm[:PREFIX_LEN]
-            
-            if key not in seen_in_page:
-                prefix_counts[key] += 1
-                seen_in_page.add(key)
+    prefix_counts = Counter()
+    for keys in page_keys:
+        prefix_counts.update(keys)
 
     # Threshold: 20% or 3 pages
     threshold = max(3, int(page_count * 0.2))
-    
+
     # Return set of "Bad Prefixes"
     common_prefixes = {p for p, count in prefix_counts.items() if count >= threshold}
-    
+
     if common_prefixes:
         print(f"INFO: Detected {len(common_prefixes)} common pattern categories (Threshold: {threshold}/{page_count})")
-        
+
     return common_prefixes
 
 
+def export_page_markdown(doc, page_no: int) -> str:
+    """페이지 Markdown을 한 번만 내보낸다. 패턴 분석과 page.md 저장이 같은 결과를 함께 쓴다."""
+    return doc.export_to_markdown(
+        page_no=page_no,
+        image_placeholder="[IMAGE]",
+        include_annotations=False,
+        page_break_placeholder=None,
+    ).strip()
+
+
+def analyze_batch_patterns(page_markdowns: Iterable[str], page_count: int) -> set[str]:
+    """
+    배치 내 공통 헤더/푸터 패턴 식별.
+    - 정규화된 라인의 '앞부분(Prefix)'을 기준으로 빈도 분석.
+    - 기준: 배치 내 20% 이상 페이지 등장 (최소 3페이지).
+    """
+    if page_count < 3:
+        return set()
+    return select_common_prefixes((line_prefix_keys(md) for md in page_markdowns), page_count)
+
+
+def clean_markdown(markdown: str, clean_patterns: set[str] | None) -> str:
+    """Token Reduction (Strategy 2): 공통 헤더/푸터 Prefix와 일치하는 라인을 제거한다."""
+    if not clean_patterns:
+        return markdown
+
+    cleaned_lines = []
+    for line in markdown.split('\n'):
+        # [IMAGE] 태그는 절대 삭제하지 않음
+        if '[image]' in line.lower():
+            cleaned_lines.append(line)
+            continue
+
+        # 패턴 매칭 확인 (Prefix Match)
+        key = normalize_line(line)[:PATTERN_PREFIX_LEN]
+        if key in clean_patterns:
+            continue # Skip common header/footer
+
+        cleaned_lines.append(line)
+    return "\n".join(cleaned_lines).strip()
+
+
 def infer_default_pdf() -> Path:
     candidates = sorted(DEFAULT_INPUT_DIR.glob("*.pdf"))
     if not candidates:
@@ -157,6 +217,16 @@ def chunk_consecutive(pages: Iterable[int]) -> list[tuple[int, int]]:
     return groups
 
 
+def split_windows(start: int, end: int, max_window_pages: int) -> list[tuple[int, int]]:
+    """연속 구간 [start, end]를 최대 max_window_pages 페이지씩 나눈다 (0 이하이면 나누지 않음)."""
+    if max_window_pages <= 0:
+        return [(start, end)]
+    return [
+        (window_start, min(end, window_start + max_window_pages - 1))
+        for window_start in range(start, end + 1, max_window_pages)
+    ]
+
+
 def bbox_to_dict(bbox) -> dict[str, float]:
     return {
         "left": float(bbox.l),
@@ -255,13 +325,6 @@ def get_pdf_page_size(pdf_doc: pdfium.PdfDocument, page_no: int) -> tuple[float,
     return float(width), float(height)
 
 
-def image_to_data_url(image) -> str:
-    buffer = BytesIO()
-    image.save(buffer, format="PNG")
-    encoded = base64.b64encode(buffer.getvalue()).decode("ascii")
-    return f"data:image/png;base64,{encoded}"
-
-
 def extract_response_text(response) -> str:
     texts: list[str] = []
     for item in getattr(response, "output", []) or []:
@@ -271,34 +334,84 @@ def extract_response_text(response) -> str:
     return "".join(texts).strip()
 
 
-def bbox_to_pixels(
+def bbox_to_crop(
     bbox: dict[str, float],
     page_width: float,
     page_height: float,
-    image_width: int,
-    image_height: int,
-):
-    scale_x = image_width / page_width
-    scale_y = image_height / page_height
-
-    left = max(0, int(round(bbox["left"] * scale_x)))
-    right = min(image_width, int(round(bbox["right"] * scale_x)))
-    top = max(0, int(round((page_height - bbox["top"]) * scale_y)))
-    bottom = min(image_height, int(round((page_height - bbox["bottom"]) * scale_y)))
-
-    if bottom <= top or right <= left:
+) -> tuple[float, float, float, float] | None:
+    """bbox(좌하단 원점, pt)를 pdfium render(crop=...)용 (left, bottom, right, top) 여백으로 바꾼다."""
+    left = max(0.0, bbox["left"])
+    right = min(page_width, bbox["right"])
+    bottom = max(0.0, bbox["bottom"])
+    top = min(page_height, bbox["top"])
+    if right <= left or top <= bottom:
         return None
-    return left, top, right, bottom
+    return left, bottom, page_width - right, page_height - top
 
 
-def crop_region(image, crop_box, output_path: Path) -> Path | None:
-    if crop_box is None:
-        return None
-    region = image.crop(crop_box)
+def render_region(
+    pdf_doc: pdfium.PdfDocument,
+    page_no: int,
+    bbox: dict[str, float],
+    scale: float,
+    output_path: Path,
+    variant: VariantSpec | None = None,
+) -> Path | None:
+    """페이지 전체를 래스터화하지 않고 bbox 영역만 렌더링해 저장한다 (variant가 있으면 GPT용 변형본도)."""
+    page = pdf_doc[page_no - 1]
+    try:
+        page_width, page_height = page.get_size()
+        crop = bbox_to_crop(bbox, page_width, page_height)
+        if crop is None:
+            return None
+        region = page.render(scale=scale, crop=crop).to_pil()
+    finally:
+        page.close()
     region.save(output_path)
+    write_variant(region, output_path, variant)
     return output_path
 
 
+def select_figure_regions(
+    page_pictures: list,
+    page_no: int,
+    page_width: float,
+    page_height: float,
+) -> list[tuple[str, object, dict[str, float]]]:
+    """Docling 그림 중 아이콘(면적 비율 미만)/헤더 영역을 bbox만으로 걸러 (figure_id, picture, bbox)를 돌려준다.
+
+    렌더링 전에 호출하므로 걸러진 그림은 이미지 작업이 전혀 없다. figure_id는 원래 순번을 유지한다.
+    """
+    header_cutoff = page_height * (1 - FIGURE_HEADER_RATIO) if page_height else None
+    page_area = max(1e-3, page_width * page_height)
+    regions: list[tuple[str, object, dict[str, float]]] = []
+    for idx, picture in enumerate(page_pictures, start=1):
+        bbox = bbox_to_dict(picture.prov[0].bbox)
+        figure_id = f"figure_{idx:03d}"
+        width = max(0.0, bbox["right"] - bbox["left"])
+        height = max(0.0, bbox["top"] - bbox["bottom"])
+        area_ratio = (width * height) / page_area
+        if area_ratio < MIN_FIGURE_AREA_RATIO:
+            print(
+                f"[SKIP ICON] page {page_no} {figure_id} (area ratio={area_ratio:.4f})"
+            )
+            continue
+        if header_cutoff and bbox["bottom"] >= header_cutoff:
+            print(f"[SKIP HEADER] page {page_no} {figure_id} (header zone)")
+            continue
+        regions.append((figure_id, picture, bbox))
+    return regions
+
+
+def should_save_page_image(mode: str, has_visuals: bool) -> bool:
+    """always: 모든 페이지, visual: 표/그림이 있거나 시각 검토가 필요한 페이지만, never: 저장 안 함."""
+    if mode == "always":
+        return True
+    if mode == "visual":
+        return has_visuals
+    return False
+
+
 def summarize_with_gpt(page_payload: dict, api_key: str | None, model_name: str) -> str:
     """GPT 호출 자리. API 키를 설정한 뒤 원하는 로직으로 교체하세요."""
 
@@ -350,6 +463,7 @@ def summarize_with_gpt(page_payload: dict, api_key: str | None, model_name: str)
         )
     except Exception as exc:  # pragma: no cover - runtime safeguard
         return f"GPT 호출 실패: {exc}"
+    pipeline_metrics.record_gpt_usage(response)
 
     output_fragments: list[str] = []
     for item in getattr(response, "output", []) or []:
@@ -371,54 +485,45 @@ def process_page(
     gpt_model: str,
     visual_threshold: float,
     clean_patterns: set[str] = None,
-):
+    page_image_mode: str = "always",
+    page_image_scale: float | None = None,
+    raw_markdown: str | None = None,
+    variant: VariantSpec | None = None,
+    picture_review: str = "all",
+) -> str:
+    """페이지 산출물을 저장하고, 헤더/푸터 정리 전 원본 Markdown을 돌려준다.
+
+    raw_markdown을 넘기면(패턴 분석 때 이미 내보낸 결과) Docling Markdown export를 다시 하지 않는다.
+
+    표/그림 이미지는 해당 영역만 render_scale로 렌더링하고, 전체 페이지 이미지는 page_image_mode에 따라
+    page_image_scale(없으면 render_scale)로 필요할 때만 저장한다. variant가 있으면 이미지마다 GPT용 변형본을 함께 저장한다.
+
+    그림은 렌더링 전에 bbox만으로 아이콘/헤더를 거른다. picture_review가 "all"(기본)이면 기존처럼 Docling 그림이
+    하나라도 있으면 시각 검토 대상으로 표시하고, "qualifying"이면 걸러지고 남은 그림이 있을 때만 표시한다.
+    """
     page_dir = output_root / f"page_{page_no:04d}"
     tables_dir = page_dir / "tables"
     figures_dir = page_dir / "figures"
     tables_dir.mkdir(parents=True, exist_ok=True)
-    figures_dir.mkdir(parents=True, exist_ok=True)
 
-    raw_markdown = doc.export_to_markdown(
-        page_no=page_no,
-        image_placeholder="[IMAGE]",
-        include_annotations=False,
-        page_break_placeholder=None,
-    ).strip()
+    if raw_markdown is None:
+        raw_markdown = export_page_markdown(doc, page_no)
 
     # Apply Token Reduction (Strategy 2)
-    if clean_patterns:
-        cleaned_lines = []
-        PREFIX_LEN = 15
-        
-        for line in raw_markdown.split('\n'):
-            # [IMAGE] 태그는 절대 삭제하지 않음
-            if '[image]' in line.lower():
-                cleaned_lines.append(line)
-                continue
-            
-            # 패턴 매칭 확인 (Prefix Match)
-            norm = normalize_line(line)
-            key = norm[:PREFIX_LEN]
-            
-            if key in clean_patterns:
-                continue # Skip common header/footer
-            
-            cleaned_lines.append(line)
-        markdown = "\n".join(cleaned_lines).strip()
-    else:
-        markdown = raw_markdown
+    markdown = clean_markdown(raw_markdown, clean_patterns)
 
     page_md_path = page_dir / "page.md"
     page_md_path.write_text(markdown, encoding="utf-8")
 
-    page_image = render_page_image(pdf_doc, page_no, render_scale)
-    page_image_path = page_dir / "page.png"
-    page_image.save(page_image_path)
-
     page_size = doc.pages[page_no].size
     page_width = float(page_size.width)
     page_height = float(page_size.height)
 
+    page_pictures = [p for p in doc.pictures if any(prov.page_no == page_no for prov in p.prov)]
+    figure_regions = select_figure_regions(page_pictures, page_no, page_width, page_height)
+    if figure_regions or (picture_review == "all" and page_pictures):
+        figures_dir.mkdir(parents=True, exist_ok=True)
+
     text_blocks = collect_text_blocks(doc, page_no)
 
     tables_meta: list[dict[str, object]] = []
@@ -439,9 +544,8 @@ def process_page(
         json_path = tables_dir / f"{table_id}.json"
         json_path.write_text(json.dumps(table_json, ensure_ascii=False, indent=2), encoding="utf-8")
 
-        crop_box = bbox_to_pixels(bbox, page_width, page_height, page_image.width, page_image.height)
         image_path = tables_dir / f"{table_id}.png"
-        saved_image = crop_region(page_image, crop_box, image_path)
+        saved_image = render_region(pdf_doc, page_no, bbox, render_scale, image_path, variant)
 
         tables_meta.append(
             {
@@ -457,26 +561,9 @@ def process_page(
 
     figures_meta: list[dict[str, object]] = []
     figure_area = 0.0
-    header_cutoff = page_height * (1 - FIGURE_HEADER_RATIO) if page_height else None
-    page_pictures = [p for p in doc.pictures if any(prov.page_no == page_no for prov in p.prov)]
-    for idx, picture in enumerate(page_pictures, start=1):
-        bbox = bbox_to_dict(picture.prov[0].bbox)
-        figure_id = f"figure_{idx:03d}"
-        width = max(0.0, bbox["right"] - bbox["left"])
-        height = max(0.0, bbox["top"] - bbox["bottom"])
-        page_area = max(1e-3, page_width * page_height)
-        area_ratio = (width * height) / page_area
-        if area_ratio < MIN_FIGURE_AREA_RATIO:
-            print(
-                f"[SKIP ICON] page {page_no} {figure_id} (area ratio={area_ratio:.4f})"
-            )
-            continue
-        if header_cutoff and bbox["bottom"] >= header_cutoff:
-            print(f"[SKIP HEADER] page {page_no} {figure_id} (header zone)")
-            continue
-        crop_box = bbox_to_pixels(bbox, page_width, page_height, page_image.width, page_image.height)
+    for figure_id, picture, bbox in figure_regions:
         image_path = figures_dir / f"{figure_id}.png"
-        saved_image = crop_region(page_image, crop_box, image_path)
+        saved_image = render_region(pdf_doc, page_no, bbox, render_scale, image_path, variant)
 
         caption_texts: list[str] = []
         for ref in picture.captions:
@@ -493,10 +580,25 @@ def process_page(
                 "bbox": bbox,
             }
         )
-        figure_area += width * height
+        figure_area += max(0.0, bbox["right"] - bbox["left"]) * max(0.0, bbox["top"] - bbox["bottom"])
 
     visual_density = (table_area + figure_area) / (page_width * page_height)
-    needs_visual_review = visual_density >= visual_threshold or bool(page_pictures)
+    has_pictures = bool(page_pictures) if picture_review == "all" else bool(figure_regions)
+    needs_visual_review = visual_density >= visual_threshold or has_pictures
+
+    page_image_path = None
+    has_visuals = bool(tables_meta or figures_meta) or needs_visual_review
+    if should_save_page_image(page_image_mode, has_visuals):
+        page_image = render_page_image(pdf_doc, page_no, page_image_scale or render_scale)
+        page_image_path = page_dir / "page.png"
+        page_image.save(page_image_path)
+        write_variant(page_image, page_image_path, variant)
+        pipeline_metrics.count("page_images")
+
+    pipeline_metrics.count("pages")
+    pipeline_metrics.count("tables", len(tables_meta))
+    pipeline_metrics.count("figures", len(figures_meta))
+    pipeline_metrics.count("figures_filtered", len(page_pictures) - len(figure_regions))
 
     summary_path = None
     if enable_gpt:
@@ -516,18 +618,21 @@ def process_page(
         "page_number": page_no,
         "markdown": markdown,
         "markdown_path": str(page_md_path.relative_to(output_root)),
-        "page_image_path": str(page_image_path.relative_to(output_root)),
+        "page_image_path": str(page_image_path.relative_to(output_root)) if page_image_path else None,
         "page_dimensions": {"width": page_width, "height": page_height},
         "tables": tables_meta,
         "figures": figures_meta,
         "needs_visual_review": needs_visual_review,
         "visual_density": visual_density,
         "summary_path": str(summary_path.relative_to(output_root)) if summary_path else None,
+        # 정리 전 라인 Prefix: 다음 실행에서 이 페이지를 건너뛰어도 헤더/푸터 통계에 포함시키기 위해 남긴다.
+        "prefix_keys": sorted(line_prefix_keys(raw_markdown)),
     }
 
     page_json_path = page_dir / "page.json"
-    page_json_path.write_text(json.dumps(page_payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    write_json_atomic(page_json_path, page_payload)
     print(f"페이지 {page_no} 처리 완료 -> {page_json_path}")
+    return raw_markdown
 
 
 def build_markdown_from_gpt(data: dict) -> str:
@@ -594,38 +699,46 @@ def write_gpt_tables(
     return meta
 
 
-def process_page_with_gpt_fallback(
+@dataclass
+class FallbackPage:
+    """GPT Vision 대체 추출 대기 페이지. pdfium 렌더링은 메인 스레드에서 끝내 두고 요청만 워커로 넘긴다."""
+
+    page_no: int
+    page_dir: Path
+    page_image_path: Path
+    data_url: str
+    page_width: float
+    page_height: float
+
+
+def prepare_gpt_fallback(
     pdf_doc: pdfium.PdfDocument,
     page_no: int,
     output_root: Path,
     render_scale: float,
-    gpt_api_key: str | None,
-    gpt_model: str,
-):
-    if page_no <= 10:
-        print(f"⚠️ Docling이 페이지 {page_no}를 처리하지 못했습니다. 초기 페이지이므로 건너뜁니다.")
-        return
-
-    if not gpt_api_key or gpt_api_key == GPT_API_KEY_PLACEHOLDER:
-        print(
-            f"⚠️ Docling이 페이지 {page_no}를 처리하지 못했지만 GPT API Key가 없어 대체 추출을 건너뜁니다."
-        )
-        return
-
-    print(f"🤖 [Fallback] GPT Vision으로 페이지 {page_no} 내용을 재구성합니다.")
-    client = OpenAI(api_key=gpt_api_key)
-
+    variant: VariantSpec | None = None,
+) -> FallbackPage:
     page_dir = output_root / f"page_{page_no:04d}"
-    tables_dir = page_dir / "tables"
-    figures_dir = page_dir / "figures"
-    tables_dir.mkdir(parents=True, exist_ok=True)
-    figures_dir.mkdir(parents=True, exist_ok=True)
+    (page_dir / "tables").mkdir(parents=True, exist_ok=True)
+    (page_dir / "figures").mkdir(parents=True, exist_ok=True)
 
     page_image = render_page_image(pdf_doc, page_no, render_scale)
     page_image_path = page_dir / "page.png"
     page_image.save(page_image_path)
+    write_variant(page_image, page_image_path, variant)
 
-    data_url = image_to_data_url(page_image)
+    page_width, page_height = get_pdf_page_size(pdf_doc, page_no)
+    return FallbackPage(
+        page_no=page_no,
+        page_dir=page_dir,
+        page_image_path=page_image_path,
+        data_url=pil_data_url(page_image, variant),
+        page_width=page_width,
+        page_height=page_height,
+    )
+
+
+def request_gpt_fallback(client, page: FallbackPage, gpt_model: str) -> dict:
     prompt = (
         "당신은 ESG 보고서를 분석하는 전문가입니다. "
         "제공되는 페이지 이미지를 바탕으로 핵심 내용을 JSON 형식으로 추출하세요. "
@@ -651,34 +764,40 @@ def process_page_with_gpt_fallback(
                 "content": [
                     {
                         "type": "input_text",
-                        "text": f"ESG 보고서 {page_no}페이지입니다. 지시한 JSON으로만 답변하세요.",
+                        "text": f"ESG 보고서 {page.page_no}페이지입니다. 지시한 JSON으로만 답변하세요.",
                     },
-                    {"type": "input_image", "image_url": data_url},
+                    {"type": "input_image", "image_url": page.data_url},
                 ],
             },
         ],
         temperature=0.2,
         max_output_tokens=800,
     )
+    if not isinstance(client, StubFallbackClient):
+        pipeline_metrics.record_gpt_usage(response)
 
     raw_text = extract_response_text(response)
     try:
-        extraction = json.loads(raw_text)
+        return json.loads(raw_text)
     except json.JSONDecodeError:
-        extraction = {
+        return {
             "summary": raw_text.strip(),
             "key_points": [],
             "tables": [],
             "figures": [],
         }
 
+
+def write_gpt_fallback(page: FallbackPage, extraction: dict, output_root: Path) -> None:
+    pipeline_metrics.count("fallback_pages")
+    page_dir = page.page_dir
     page_md = page_dir / "page.md"
     markdown_text = build_markdown_from_gpt(extraction)
     if not markdown_text:
         markdown_text = "GPT 추출 결과를 파싱하지 못했습니다."
     page_md.write_text(markdown_text, encoding="utf-8")
 
-    tables_meta = write_gpt_tables(extraction.get("tables", []), tables_dir, output_root)
+    tables_meta = write_gpt_tables(extraction.get("tables", []), page_dir / "tables", output_root)
     figures_meta: list[dict] = []
     for idx, caption in enumerate(extraction.get("figures", []) or [], start=1):
         if not caption:
@@ -687,22 +806,20 @@ def process_page_with_gpt_fallback(
             {
                 "id": f"figure_{idx:03d}",
                 "caption": caption,
-                "image_path": str(page_image_path.relative_to(output_root)),
+                "image_path": str(page.page_image_path.relative_to(output_root)),
                 "source": "gpt_fallback",
             }
         )
 
-    page_width, page_height = get_pdf_page_size(pdf_doc, page_no)
-
     raw_json_path = page_dir / "gpt_raw.json"
     raw_json_path.write_text(json.dumps(extraction, ensure_ascii=False, indent=2), encoding="utf-8")
 
     page_payload = {
-        "page_number": page_no,
+        "page_number": page.page_no,
         "markdown": markdown_text,
         "markdown_path": str(page_md.relative_to(output_root)),
-        "page_image_path": str(page_image_path.relative_to(output_root)),
-        "page_dimensions": {"width": page_width, "height": page_height},
+        "page_image_path": str(page.page_image_path.relative_to(output_root)),
+        "page_dimensions": {"width": page.page_width, "height": page.page_height},
         "tables": tables_meta,
         "figures": figures_meta,
         "needs_visual_review": True,
@@ -713,8 +830,456 @@ def process_page_with_gpt_fallback(
     }
 
     page_json_path = page_dir / "page.json"
-    page_json_path.write_text(json.dumps(page_payload, ensure_ascii=False, indent=2), encoding="utf-8")
-    print(f"✅ [Fallback] 페이지 {page_no}를 GPT로 재구성했습니다 -> {page_json_path}")
+    write_json_atomic(page_json_path, page_payload)
+    print(f"✅ [Fallback] 페이지 {page.page_no}를 GPT로 재구성했습니다 -> {page_json_path}")
+
+
+class StubFallbackClient:
+    """네트워크 없이 fallback 경로를 점검할 때 쓰는 OpenAI 대용 (responses.create 응답 형태만 흉내 낸다)."""
+
+    def __init__(self):
+        self.responses = self
+
+    def create(self, model: str, input: list[dict], **kwargs):
+        prompt_text = input[-1]["content"][0]["text"]
+        payload = {"summary": f"[stub:{model}] {prompt_text}", "key_points": [], "tables": [], "figures": []}
+        text = json.dumps(payload, ensure_ascii=False)
+        return SimpleNamespace(output=[SimpleNamespace(content=[SimpleNamespace(type="output_text", text=text)])])
+
+
+class RateLimiter:
+    """분당 요청 수 제한. 스레드끼리 시작 시각을 고르게 나눠 갖는다 (0이면 제한 없음)."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_at)
+            self._next_at = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class GptFallbackPool:
+    """Docling이 처리하지 못한 페이지를 모아 스레드 풀에서 GPT Vision으로 재구성한다.
+
+    submit()은 페이지 이미지만 렌더링하고 바로 돌아오므로 Docling 변환은 계속 진행된다.
+    close()에서 남은 요청을 모두 기다린다. 실패한 페이지는 page.json을 만들지 않아 다음 실행에서 다시 시도된다.
+    """
+
+    def __init__(
+        self,
+        output_root: Path,
+        render_scale: float,
+        gpt_api_key: str | None,
+        gpt_model: str,
+        workers: int = DEFAULT_FALLBACK_WORKERS,
+        per_minute: float = 0,
+        stub: bool = False,
+        variant: VariantSpec | None = None,
+    ):
+        self.output_root = output_root
+        self.render_scale = render_scale
+        self.gpt_api_key = gpt_api_key
+        self.gpt_model = gpt_model
+        self.workers = max(1, workers)
+        self.stub = stub
+        self.variant = variant
+        self._limiter = RateLimiter(per_minute)
+        self._client = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._futures: dict[Future, int] = {}
+        # 이번 실행에서 page.json을 실제로 쓴 페이지 (매니페스트 기록 대상)
+        self.written: list[int] = []
+
+    def submit(self, pdf_doc: pdfium.PdfDocument, page_no: int) -> None:
+        if page_no <= 10:
+            print(f"⚠️ Docling이 페이지 {page_no}를 처리하지 못했습니다. 초기 페이지이므로 건너뜁니다.")
+            return
+
+        if not self.stub and (not self.gpt_api_key or self.gpt_api_key == GPT_API_KEY_PLACEHOLDER):
+            print(
+                f"⚠️ Docling이 페이지 {page_no}를 처리하지 못했지만 GPT API Key가 없어 대체 추출을 건너뜁니다."
+            )
+            return
+
+        print(f"🤖 [Fallback] GPT Vision으로 페이지 {page_no} 내용을 재구성합니다.")
+        page = prepare_gpt_fallback(pdf_doc, page_no, self.output_root, self.render_scale, self.variant)
+        if self._executor is None:
+            self._client = StubFallbackClient() if self.stub else OpenAI(api_key=self.gpt_api_key)
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="gpt-fallback")
+        self._futures[self._executor.submit(self._run, page)] = page_no
+
+    def _run(self, page: FallbackPage) -> None:
+        self._limiter.wait()
+        extraction = request_gpt_fallback(self._client, page, self.gpt_model)
+        write_gpt_fallback(page, extraction, self.output_root)
+
+    def close(self) -> None:
+        if self._executor is None:
+            return
+        for future, page_no in self._futures.items():
+            try:
+                future.result()
+            except Exception as exc:
+                print(f"⚠️ [Fallback] 페이지 {page_no} GPT 재구성 실패: {exc}")
+            else:
+                self.written.append(page_no)
+        self._executor.shutdown()
+        self._executor = None
+        self._futures.clear()
+
+
+@dataclass
+class ExtractJob:
+    """한 프로세스가 변환할 페이지 묶음과 공통 옵션 (워커 프로세스로 넘길 수 있도록 직렬화 가능한 값만 둔다)."""
+
+    pdf_path: Path
+    pages: list[int]
+    output_root: Path
+    render_scale: float
+    gpt_api_key: str | None
+    enable_gpt: bool
+    gpt_model: str
+    visual_threshold: float
+    page_image_mode: str = "always"
+    page_image_scale: float | None = None
+    max_window_pages: int = DEFAULT_MAX_WINDOW_PAGES
+    fallback_workers: int = DEFAULT_FALLBACK_WORKERS
+    fallback_rpm: float = 0
+    fallback_stub: bool = False
+    image_variant: str = DEFAULT_VARIANT_FORMAT
+    variant_max_side: int = DEFAULT_VARIANT_MAX_SIDE
+    variant_quality: int = DEFAULT_VARIANT_QUALITY
+    picture_review: str = "all"
+    # 매니페스트로 건너뛴 같은 대상 범위 페이지의 라인 Prefix (헤더/푸터 패턴 통계에만 쓰고 다시 변환하지 않음)
+    context_keys: dict[int, list[str]] = field(default_factory=dict)
+
+    @property
+    def variant_spec(self) -> VariantSpec | None:
+        return build_variant_spec(self.image_variant, self.variant_max_side, self.variant_quality)
+
+
+@dataclass
+class ExtractResult:
+    """변환 결과. page_keys는 defer_cleaning일 때만 채운다."""
+
+    page_keys: dict[int, list[str]] = field(default_factory=dict)
+    # 이번 실행에서 page.json을 쓴 페이지 (Docling 실패 후 대체 추출도 못 한 페이지는 빠진다)
+    written: list[int] = field(default_factory=list)
+
+
+def extract_page_ranges(
+    converter: DocumentConverter,
+    pdf_doc: pdfium.PdfDocument,
+    job: ExtractJob,
+    defer_cleaning: bool = False,
+) -> ExtractResult:
+    """job.pages를 연속 구간별로 Docling 변환해 page_XXXX 폴더에 저장한다.
+
+    연속 구간이 job.max_window_pages보다 길면 윈도우 단위로 나눠 변환하고, 윈도우마다 Docling 문서를 해제한다.
+    이때 페이지별 라인 Prefix는 윈도우를 넘어 모아 두었다가 구간이 끝나면 구간 전체 기준 패턴으로 한 번에 정리한다.
+
+    defer_cleaning=True면 헤더/푸터 정리를 하지 않고 Docling 페이지별 라인 Prefix를 page_keys로 돌려준다.
+    (샤드로 나눠 처리할 때 구간 전체 기준으로 패턴을 다시 계산하기 위함)
+
+    job.context_keys(매니페스트로 건너뛴 페이지)가 있으면 연속 구간은 건너뛴 페이지까지 포함해 나누고,
+    패턴 통계에도 그 페이지들의 Prefix를 더한다. 변환/정리는 job.pages에만 한다.
+
+    Docling이 처리하지 못한 페이지는 GptFallbackPool로 넘겨 변환과 동시에 재구성하고, 끝나기 전에 모두 기다린다.
+    결과의 written에는 이번 실행에서 page.json을 쓴 페이지만 담는다.
+    """
+    fallback_pool = GptFallbackPool(
+        job.output_root,
+        job.render_scale,
+        job.gpt_api_key,
+        job.gpt_model,
+        workers=job.fallback_workers,
+        per_minute=job.fallback_rpm,
+        stub=job.fallback_stub,
+        variant=job.variant_spec,
+    )
+    try:
+        result = _extract_page_ranges(converter, pdf_doc, job, fallback_pool, defer_cleaning)
+    finally:
+        fallback_pool.close()
+    result.written.extend(fallback_pool.written)
+    return result
+
+
+def _extract_page_ranges(
+    converter: DocumentConverter,
+    pdf_doc: pdfium.PdfDocument,
+    job: ExtractJob,
+    fallback_pool: GptFallbackPool,
+    defer_cleaning: bool,
+) -> ExtractResult:
+    target_pages = set(job.pages)
+    extract_result = ExtractResult()
+    for start, end in chunk_consecutive(target_pages | set(job.context_keys)):
+        group = [p for p in job.pages if start <= p <= end]
+        if not group:
+            continue
+        context = {p: keys for p, keys in job.context_keys.items() if start <= p <= end}
+        windows = [
+            window
+            for run_start, run_end in chunk_consecutive(group)
+            for window in split_windows(run_start, run_end, job.max_window_pages)
+        ]
+        if len(windows) > 1:
+            print(f"🪟 [Window] {start}-{end} 구간을 {len(windows)}개 윈도우로 나눠 변환합니다.")
+        # 윈도우로 나눴거나 건너뛴 페이지가 섞인 구간은 구간 전체 기준 패턴으로 끝에서 한 번에 정리한다.
+        windowed = len(windows) > 1 or bool(context)
+
+        group_keys: dict[int, list[str]] = {}
+        for window_start, window_end in windows:
+            result = converter.convert(job.pdf_path, page_range=(window_start, window_end))
+            if result.status not in {ConversionStatus.SUCCESS, ConversionStatus.PARTIAL_SUCCESS}:
+                errors = ", ".join(err.error_message for err in result.errors)
+                raise RuntimeError(f"Docling 변환 실패 ({window_start}-{window_end}): {result.status}. {errors}")
+            if result.document is None:
+                raise RuntimeError("Docling 문서가 반환되지 않았습니다.")
+
+            # 페이지별 Markdown은 한 번만 내보내 패턴 분석과 page.md 저장에 함께 쓴다.
+            current_batch_pages = [p for p in range(window_start, window_end + 1) if p in target_pages]
+            raw_pages: dict[int, str] = {}
+            for page_no in current_batch_pages:
+                try:
+                    _ = result.document.pages[page_no]
+                except Exception:
+                    continue
+                raw_pages[page_no] = export_page_markdown(result.document, page_no)
+
+            # Analyze patterns for this batch (윈도우로 나눈 구간은 구간이 끝난 뒤 정리)
+            clean_patterns = None
+            if not defer_cleaning and not windowed:
+                clean_patterns = analyze_batch_patterns(raw_pages.values(), len(current_batch_pages))
+
+            for page_no in current_batch_pages:
+                if page_no in raw_pages:
+                    process_page(
+                        result.document,
+                        pdf_doc,
+                        page_no,
+                        job.output_root,
+                        job.render_scale,
+                        job.gpt_api_key,
+                        job.enable_gpt,
+                        job.gpt_model,
+                        job.visual_threshold,
+                        clean_patterns,
+                        job.page_image_mode,
+                        job.page_image_scale,
+                        raw_markdown=raw_pages[page_no],
+                        variant=job.variant_spec,
+                        picture_review=job.picture_review,
+                    )
+                    extract_result.written.append(page_no)
+                    if defer_cleaning or windowed:
+                        group_keys[page_no] = sorted(line_prefix_keys(raw_pages[page_no]))
+                else:
+                    fallback_pool.submit(pdf_doc, page_no)
+
+            # 다음 윈도우 변환 전에 Docling 문서(페이지 이미지·레이아웃 모델 결과)를 놓아 준다.
+            del result, raw_pages
+            gc.collect()
+
+        if defer_cleaning:
+            extract_result.page_keys.update(group_keys)
+        elif windowed:
+            clean_page_groups(job.output_root, group, group_keys, context)
+    return extract_result
+
+
+def plan_page_shards(pages: list[int], workers: int) -> list[list[int]]:
+    """정렬된 페이지 목록을 워커 수만큼 크기가 고른(차이 최대 1) 연속 구간으로 나눈다."""
+    shard_count = max(1, min(workers, len(pages)))
+    base, extra = divmod(len(pages), shard_count)
+    shards: list[list[int]] = []
+    start = 0
+    for idx in range(shard_count):
+        size = base + (1 if idx < extra else 0)
+        shards.append(pages[start:start + size])
+        start += size
+    return shards
+
+
+def _extract_shard(job: ExtractJob) -> ExtractResult:
+    """워커 프로세스 진입점: 프로세스마다 DocumentConverter/PDF 핸들을 따로 만든다."""
+    converter = DocumentConverter()
+    pdf_doc = pdfium.PdfDocument(str(job.pdf_path))
+    try:
+        return extract_page_ranges(converter, pdf_doc, job, defer_cleaning=True)
+    finally:
+        pdf_doc.close()
+
+
+def apply_clean_patterns(output_root: Path, page_no: int, clean_patterns: set[str]) -> None:
+    """정리 없이 저장된 페이지의 page.md / page.json markdown을 공통 패턴 기준으로 다시 쓴다."""
+    page_dir = output_root / f"page_{page_no:04d}"
+    page_json_path = page_dir / "page.json"
+    payload = json.loads(page_json_path.read_text(encoding="utf-8"))
+    raw_markdown = payload.get("markdown") or ""
+    markdown = clean_markdown(raw_markdown, clean_patterns)
+    if markdown == raw_markdown:
+        return
+    payload["markdown"] = markdown
+    (page_dir / "page.md").write_text(markdown, encoding="utf-8")
+    write_json_atomic(page_json_path, payload)
+
+
+def clean_page_groups(
+    output_root: Path,
+    pages: list[int],
+    page_keys: dict[int, list[str]],
+    context_keys: dict[int, list[str]] | None = None,
+) -> None:
+    """연속 구간마다 페이지별 Prefix를 합쳐 공통 패턴을 고르고, 이미 저장된 페이지에 적용한다.
+
+    context_keys(이번에 다시 추출하지 않은 페이지)는 구간 나누기와 패턴 통계에만 포함하고 다시 쓰지 않는다.
+    """
+    context_keys = context_keys or {}
+    all_pages = sorted(set(pages) | set(context_keys))
+    for start, end in chunk_consecutive(all_pages):
+        group = [p for p in all_pages if start <= p <= end]
+        docling_pages = [p for p in group if p in page_keys]
+        key_sets = [set(page_keys[p]) for p in docling_pages]
+        key_sets += [set(context_keys[p]) for p in group if p in context_keys]
+        clean_patterns = select_common_prefixes(key_sets, len(group))
+        if not clean_patterns:
+            continue
+        for page_no in docling_pages:
+            apply_clean_patterns(output_root, page_no, clean_patterns)
+
+
+def plan_shard_jobs(job: ExtractJob, shards: list[list[int]]) -> list[ExtractJob]:
+    """샤드별 작업. GPT 대체 추출의 동시 요청 수/분당 요청 수는 프로세스마다 따로 적용되므로 샤드 수로 나눠,
+    전체 합이 --fallback-workers/--fallback-rpm을 넘지 않게 한다 (동시 요청 수는 샤드당 최소 1)."""
+    count = len(shards)
+    return [
+        replace(
+            job,
+            pages=shard,
+            context_keys={},
+            fallback_workers=max(1, job.fallback_workers // count),
+            fallback_rpm=job.fallback_rpm / count if job.fallback_rpm > 0 else 0,
+        )
+        for shard in shards
+    ]
+
+
+def extract_with_workers(job: ExtractJob, workers: int) -> list[int]:
+    """페이지를 샤드로 나눠 프로세스 풀에서 변환한 뒤, 연속 구간 단위로 헤더/푸터 정리를 한 번에 적용한다.
+
+    이번 실행에서 page.json을 쓴 페이지 목록을 돌려준다.
+    """
+    shards = plan_page_shards(job.pages, workers)
+    print(f"🧩 [Workers] {len(job.pages)}페이지를 {len(shards)}개 프로세스로 나눠 처리합니다.")
+    # 프로세스마다 Docling/torch 스레드를 나눠 써서 코어 과다 할당을 막는다. 스폰되는 워커만 이 값을 물려받도록
+    # 풀이 끝나면 환경변수를 되돌린다 (run_pipeline이 in-process로 실행할 때 이후 단계에 남지 않게).
+    previous_threads = os.environ.get("OMP_NUM_THREADS")
+    if previous_threads is None:
+        os.environ["OMP_NUM_THREADS"] = str(max(1, (os.cpu_count() or 1) // len(shards)))
+
+    page_keys: dict[int, list[str]] = {}
+    written: list[int] = []
+    try:
+        with ProcessPoolExecutor(max_workers=len(shards), mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [executor.submit(_extract_shard, shard_job) for shard_job in plan_shard_jobs(job, shards)]
+            for future in futures:
+                shard_result = future.result()
+                page_keys.update(shard_result.page_keys)
+                written.extend(shard_result.written)
+    finally:
+        if previous_threads is None:
+            os.environ.pop("OMP_NUM_THREADS", None)
+
+    # Cross-shard pass: 단일 프로세스 실행과 같은 연속 구간 기준으로 패턴을 계산한다.
+    clean_page_groups(job.output_root, job.pages, page_keys, job.context_keys)
+    return written
+
+
+def load_prefix_keys(output_root: Path, pages: Iterable[int]) -> dict[int, list[str]]:
+    """건너뛴 페이지의 정리 전 라인 Prefix를 page.json에서 읽는다.
+
+    prefix_keys가 없는 이전 산출물은 저장된(정리된) markdown으로 다시 계산하고, GPT 대체 페이지는
+    Docling 페이지처럼 구간 길이에만 포함되도록 빈 목록으로 둔다.
+    """
+    keys: dict[int, list[str]] = {}
+    for page_no in pages:
+        page_json_path = output_root / f"page_{page_no:04d}" / "page.json"
+        try:
+            payload = json.loads(page_json_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            keys[page_no] = []
+            continue
+        if payload.get("gpt_fallback"):
+            keys[page_no] = []
+        elif "prefix_keys" in payload:
+            keys[page_no] = payload["prefix_keys"]
+        else:
+            keys[page_no] = sorted(line_prefix_keys(payload.get("markdown") or ""))
+    return keys
+
+
+def page_input_hash(job: ExtractJob, pdf_digest: str | None, page_no: int) -> str:
+    params = {
+        "render_scale": job.render_scale,
+        "visual_threshold": job.visual_threshold,
+        "gpt_summary": job.gpt_model if job.enable_gpt else None,
+        "page_image": job.page_image_mode,
+        "page_image_scale": job.page_image_scale,
+        "picture_review": job.picture_review,
+    }
+    if job.fallback_stub:
+        params["fallback_stub"] = True
+    if job.variant_spec:
+        params["image_variant"] = asdict(job.variant_spec)
+    return hash_payload("structured", STAGE_VERSION, pdf_digest, page_no, params)
+
+
+def page_output_paths(output_root: Path, payload: dict) -> list[Path]:
+    """page.json이 가리키는 이 단계 산출물 경로 목록 (page.json 자체는 제외)."""
+    rel_paths = [
+        payload.get("markdown_path"),
+        payload.get("page_image_path"),
+        payload.get("summary_path"),
+        payload.get("gpt_raw_path"),
+    ]
+    for table in payload.get("tables", []):
+        rel_paths.extend([table.get("markdown_path"), table.get("json_path"), table.get("image_path")])
+    for figure in payload.get("figures", []):
+        rel_paths.append(figure.get("image_path"))
+    paths = [output_root / rel for rel in dict.fromkeys(rel_paths) if rel]
+    # GPT용 변형본은 page.json에 적지 않고 원본 옆 이름 규칙으로 찾는다.
+    variants = [find_variant(path) for path in paths if path.suffix == ".png"]
+    return paths + [path for path in variants if path]
+
+
+def record_pages(manifest: StageManifest, job: ExtractJob, pdf_digest: str | None, written: Iterable[int]) -> None:
+    """이번 실행에서 page.json을 쓴 페이지만 기록한다.
+
+    Docling과 대체 추출이 모두 실패한 페이지는 이전 실행(다른 PDF/설정)의 page.json이 남아 있어도 기록하지 않아
+    다음 실행에서 다시 시도한다.
+    """
+    for page_no in sorted(set(written)):
+        page_json_path = job.output_root / f"page_{page_no:04d}" / "page.json"
+        if not page_json_path.exists():
+            continue
+        payload = json.loads(page_json_path.read_text(encoding="utf-8"))
+        manifest.record(
+            "structured",
+            f"page_{page_no:04d}",
+            page_input_hash(job, pdf_digest, page_no),
+            page_output_paths(job.output_root, payload),
+            touched=[page_json_path],
+        )
 
 
 def build_arg_parser() -> argparse.ArgumentParser:
@@ -751,6 +1316,69 @@ def build_arg_parser() -> argparse.ArgumentParser:
         default=2.0,
         help="PDF 이미지를 렌더링할 배율(기본 2.0=약 144DPI).",
     )
+    parser.add_argument(
+        "--max-window-pages",
+        type=int,
+        default=DEFAULT_MAX_WINDOW_PAGES,
+        help="Docling 한 번의 변환에 넘길 최대 페이지 수 (0=연속 구간 전체). 헤더/푸터 패턴은 윈도우를 넘어 구간 전체 기준으로 계산.",
+    )
+    parser.add_argument(
+        "--fallback-workers",
+        type=int,
+        default=DEFAULT_FALLBACK_WORKERS,
+        help="Docling 실패 페이지를 GPT Vision으로 재구성할 동시 요청 수.",
+    )
+    parser.add_argument(
+        "--fallback-rpm",
+        type=int,
+        default=0,
+        help="GPT Vision 대체 추출 분당 최대 요청 수 (0=제한 없음).",
+    )
+    parser.add_argument(
+        "--fallback-stub",
+        action="store_true",
+        help="GPT 호출 없이 고정 응답으로 대체 추출 경로를 실행 (오프라인 점검용).",
+    )
+    parser.add_argument(
+        "--page-image",
+        choices=("always", "visual", "never"),
+        default="always",
+        help="전체 페이지 PNG 저장 범위. visual=표/그림이 있거나 시각 검토가 필요한 페이지만 (표/그림 이미지는 항상 영역만 렌더링).",
+    )
+    parser.add_argument(
+        "--page-image-scale",
+        type=float,
+        default=None,
+        help="전체 페이지 PNG 렌더링 배율. 생략하면 --render-scale과 같다 (페이지 요약/뷰어용이면 1.0 정도로 충분).",
+    )
+    parser.add_argument(
+        "--image-variant",
+        choices=(*VARIANT_FORMATS, "none"),
+        default=DEFAULT_VARIANT_FORMAT,
+        help="페이지/표/그림 PNG 옆에 함께 저장할 GPT 전송용 압축본 형식 (*.gpt.webp 등). none이면 만들지 않음.",
+    )
+    parser.add_argument(
+        "--variant-max-side",
+        type=int,
+        default=DEFAULT_VARIANT_MAX_SIDE,
+        help="GPT용 압축본의 최대 긴 변(px). 0이면 원본 크기 유지.",
+    )
+    parser.add_argument(
+        "--variant-quality",
+        type=int,
+        default=DEFAULT_VARIANT_QUALITY,
+        help="GPT용 압축본 품질 (1-100).",
+    )
+    parser.add_argument(
+        "--picture-review",
+        choices=("qualifying", "all"),
+        default="all",
+        help=(
+            "그림 때문에 시각 검토(needs_visual_review, visual 모드 페이지 PNG, figures 폴더) 대상이 되는 기준. "
+            "all(기본)=Docling 그림이 하나라도 있으면, qualifying=아이콘/헤더를 거르고 남은 그림이 있을 때만. "
+            "qualifying은 MySQL pages.needs_review 의미가 바뀌므로 하위 조회 기준을 확인한 뒤 사용."
+        ),
+    )
     parser.add_argument(
         "--visual-threshold",
         type=float,
@@ -780,10 +1408,22 @@ def build_arg_parser() -> argparse.ArgumentParser:
         default=None,
         help="pages_structured 하위에 생성할 보고서 폴더 이름. 생략하면 PDF 파일명을 기반으로 자동 생성.",
     )
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="manifest 기록과 무관하게 대상 페이지를 모두 다시 추출.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="페이지를 나눠 병렬 변환할 프로세스 수. 프로세스마다 DocumentConverter를 따로 로드한다(기본 1=단일 프로세스).",
+    )
     return parser
 
 
-def main(argv: List[str] | None = None) -> int:
+def main(argv: List[str] | None = None, converter: DocumentConverter | None = None) -> int:
+    """converter를 넘기면(파이프라인 공유 자원) 단일 프로세스 모드에서 재사용한다. --workers 모드는 프로세스별로 새로 만든다."""
     parser = build_arg_parser()
     args = parser.parse_args(argv)
 
@@ -843,53 +1483,60 @@ def main(argv: List[str] | None = None) -> int:
         or GPT_API_KEY_PLACEHOLDER
     )
 
-    converter = DocumentConverter()
-    try:
-        for start, end in chunk_consecutive(target_pages):
-            result = converter.convert(pdf_path, page_range=(start, end))
-            if result.status not in {ConversionStatus.SUCCESS, ConversionStatus.PARTIAL_SUCCESS}:
-                errors = ", ".join(err.error_message for err in result.errors)
-                raise RuntimeError(f"Docling 변환 실패 ({start}-{end}): {result.status}. {errors}")
-            if result.document is None:
-                raise RuntimeError("Docling 문서가 반환되지 않았습니다.")
-
-            # Analyze patterns for this batch
-            current_batch_pages = [p for p in range(start, end + 1) if p in target_pages]
-            clean_patterns = analyze_batch_patterns(result.document, current_batch_pages)
+    job = ExtractJob(
+        pdf_path=pdf_path,
+        pages=target_pages,
+        output_root=output_root,
+        render_scale=args.render_scale,
+        gpt_api_key=gpt_api_key,
+        enable_gpt=args.gpt_summary,
+        gpt_model=args.gpt_model,
+        visual_threshold=args.visual_threshold,
+        page_image_mode=args.page_image,
+        page_image_scale=args.page_image_scale,
+        max_window_pages=args.max_window_pages,
+        fallback_workers=args.fallback_workers,
+        fallback_rpm=args.fallback_rpm,
+        fallback_stub=args.fallback_stub,
+        image_variant=args.image_variant,
+        variant_max_side=args.variant_max_side,
+        variant_quality=args.variant_quality,
+        picture_review=args.picture_review,
+    )
 
-            for page_no in range(start, end + 1):
-                if page_no not in target_pages:
-                    continue
-                has_docling_page = True
-                try:
-                    _ = result.document.pages[page_no]
-                except Exception:
-                    has_docling_page = False
+    manifest = StageManifest(output_root)
+    pdf_digest = manifest.file_digest(pdf_path)
+    if not args.overwrite:
+        pending = [
+            page_no for page_no in target_pages
+            if not manifest.is_fresh("structured", f"page_{page_no:04d}", page_input_hash(job, pdf_digest, page_no))
+        ]
+        pending_set = set(pending)
+        skipped = [page_no for page_no in target_pages if page_no not in pending_set]
+        if skipped:
+            print(f"[SKIP] 입력이 바뀌지 않은 {len(skipped)}개 페이지는 다시 추출하지 않습니다 (--overwrite로 강제).")
+        # 헤더/푸터 패턴은 건너뛴 페이지까지 포함한 전체 대상 범위 기준으로 계산한다.
+        context_keys = load_prefix_keys(output_root, skipped) if pending and skipped else {}
+        job = replace(job, pages=pending, context_keys=context_keys)
+    if not job.pages:
+        pdf_doc.close()
+        manifest.save()
+        return 0
 
-                if has_docling_page:
-                    process_page(
-                        result.document,
-                        pdf_doc,
-                        page_no,
-                        output_root,
-                        args.render_scale,
-                        gpt_api_key,
-                        args.gpt_summary,
-                        args.gpt_model,
-                        args.visual_threshold,
-                        clean_patterns,
-                    )
-                else:
-                    process_page_with_gpt_fallback(
-                        pdf_doc,
-                        page_no,
-                        output_root,
-                        args.render_scale,
-                        gpt_api_key,
-                        args.gpt_model,
-                    )
+    try:
+        if args.workers > 1 and len(job.pages) > 1:
+            pdf_doc.close()
+            written = extract_with_workers(job, args.workers)
+        else:
+            if converter is None:
+                converter = DocumentConverter()
+            try:
+                written = extract_page_ranges(converter, pdf_doc, job).written
+            finally:
+                pdf_doc.close()
+        record_pages(manifest, job, pdf_digest, written)
     finally:
-        pdf_doc.close()
+        manifest.save()
 
     return 0
 
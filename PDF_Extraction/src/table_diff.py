@@ -1,4 +1,8 @@
-"""Docling 표 JSON과 RapidOCR 결과를 비교해 숫자 차이를 기록하는 스크립트."""
+"""Docling 표 JSON과 RapidOCR 결과를 비교해 숫자 차이를 기록하는 스크립트.
+
+파이프라인에서는 table_ocr.py --with-diff가 OCR 직후 메모리에 있는 결과로 같은 diff를 계산하므로,
+이 스크립트는 diff만 다시 돌리고 싶을 때 쓰는 단독 도구다. 두 경로는 같은 manifest 항목을 공유한다.
+"""
 
 from __future__ import annotations
 
@@ -8,14 +12,18 @@ import re
 from pathlib import Path
 from typing import Iterable, List
 
+import pipeline_metrics
+from page_metadata import PageMetadata
+from stage_manifest import StageManifest, hash_payload
+
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 DEFAULT_STRUCTURED_DIR = REPO_ROOT / "data" / "pages_structured"
 NUMBER_PATTERN = re.compile(r"[-+]?\d+(?:,\d{3})*(?:\.\d+)?%?")
+STAGE_VERSION = "1"
 
 
-def load_numbers_from_doc_table(table_json_path: Path) -> list[str]:
-    data = json.loads(table_json_path.read_text(encoding="utf-8"))
+def numbers_in_cells(data: dict) -> list[str]:
     numbers: list[str] = []
     for row in data.get("cells", []):
         for cell in row:
@@ -24,8 +32,7 @@ def load_numbers_from_doc_table(table_json_path: Path) -> list[str]:
     return numbers
 
 
-def load_numbers_from_ocr(ocr_json_path: Path) -> list[str]:
-    entries = json.loads(ocr_json_path.read_text(encoding="utf-8"))
+def numbers_in_entries(entries: list[dict]) -> list[str]:
     numbers: list[str] = []
     for entry in entries:
         text = entry.get("text") or ""
@@ -33,6 +40,14 @@ def load_numbers_from_ocr(ocr_json_path: Path) -> list[str]:
     return numbers
 
 
+def load_numbers_from_doc_table(table_json_path: Path) -> list[str]:
+    return numbers_in_cells(json.loads(table_json_path.read_text(encoding="utf-8")))
+
+
+def load_numbers_from_ocr(ocr_json_path: Path) -> list[str]:
+    return numbers_in_entries(json.loads(ocr_json_path.read_text(encoding="utf-8")))
+
+
 def normalize_number(token: str) -> str:
     # remove thousand separators but keep % sign if present
     token = token.replace(",", "")
@@ -80,17 +95,71 @@ def parse_pages_arg(expr: str, available: Iterable[int]) -> list[int]:
     return final
 
 
-def update_page_metadata(page_json_path: Path, table_id: str, diff_rel_path: str, diff_summary: dict) -> None:
-    data = json.loads(page_json_path.read_text(encoding="utf-8"))
-    changed = False
-    for table in data.get("tables", []):
-        if table.get("id") == table_id:
-            table["diff_path"] = diff_rel_path
-            table["diff_summary"] = diff_summary
-            changed = True
-            break
-    if changed:
-        page_json_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+def compare_pages(structured_dir: Path, target_pages: list[int], manifest: StageManifest, overwrite: bool) -> None:
+    for page_no in target_pages:
+        page_dir = structured_dir / f"page_{page_no:04d}"
+        page_json_path = page_dir / "page.json"
+        tables_dir = page_dir / "tables"
+        if not tables_dir.exists():
+            continue
+
+        # page.json 수정은 페이지 단위로 모아 한 번만 저장한다.
+        page_meta = PageMetadata(page_json_path)
+        try:
+            compare_page_tables(structured_dir, page_meta, manifest, overwrite)
+        finally:
+            page_meta.flush()
+
+
+def compare_page_tables(structured_dir: Path, page_meta: PageMetadata, manifest: StageManifest, overwrite: bool) -> None:
+    for table in page_meta.items("tables"):
+        json_rel = table.get("json_path")
+        ocr_rel = table.get("ocr_path")
+        if not json_rel or not ocr_rel:
+            continue
+        diff_table(
+            structured_dir, page_meta, table["id"], structured_dir / json_rel, structured_dir / ocr_rel, manifest, overwrite
+        )
+
+
+def diff_table(
+    structured_dir: Path,
+    page_meta: PageMetadata,
+    table_id: str,
+    table_json_path: Path,
+    ocr_json_path: Path,
+    manifest: StageManifest,
+    overwrite: bool,
+    ocr_entries: list[dict] | None = None,
+) -> None:
+    """표 1개의 diff.json을 만들고 page.json 표 메타데이터에 연결한다.
+
+    ocr_entries를 넘기면(table_ocr --with-diff) ocr.json을 다시 읽지 않고 그 결과로 비교한다.
+    """
+    diff_path = table_json_path.with_suffix(".diff.json")
+    rel_diff_path = diff_path.relative_to(structured_dir)
+    input_hash = hash_payload(
+        "table_diff",
+        STAGE_VERSION,
+        manifest.file_digest(table_json_path),
+        manifest.file_digest(ocr_json_path),
+    )
+    if not overwrite and manifest.is_fresh("table_diff", str(rel_diff_path), input_hash):
+        diff = json.loads(diff_path.read_text(encoding="utf-8"))
+        page_meta.update_item("tables", table_id, diff_path=str(rel_diff_path), diff_summary=diff)
+        print(f"[SKIP] {diff_path} (입력 변경 없음)")
+        return
+    doc_nums = load_numbers_from_doc_table(table_json_path)
+    if ocr_entries is None:
+        ocr_nums = load_numbers_from_ocr(ocr_json_path)
+    else:
+        ocr_nums = numbers_in_entries(ocr_entries)
+    diff = compare_numbers(doc_nums, ocr_nums)
+    diff_path.write_text(json.dumps(diff, ensure_ascii=False, indent=2), encoding="utf-8")
+    page_meta.update_item("tables", table_id, diff_path=str(rel_diff_path), diff_summary=diff)
+    manifest.record("table_diff", str(rel_diff_path), input_hash, [diff_path])
+    pipeline_metrics.count("table_diffs")
+    print(f"숫자 비교 완료: {table_json_path.name} -> {diff_path.name}")
 
 
 def build_arg_parser() -> argparse.ArgumentParser:
@@ -112,7 +181,7 @@ def build_arg_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--overwrite",
         action="store_true",
-        help="기존 diff.json이 있어도 재계산.",
+        help="manifest 기록상 입력이 바뀌지 않은 표도 diff.json을 재계산.",
     )
     return parser
 
@@ -134,32 +203,11 @@ def main(argv: List[str] | None = None) -> int:
     else:
         target_pages = available
 
-    for page_no in target_pages:
-        page_dir = structured_dir / f"page_{page_no:04d}"
-        page_json_path = page_dir / "page.json"
-        tables_dir = page_dir / "tables"
-        if not tables_dir.exists():
-            continue
-
-        page_data = json.loads(page_json_path.read_text(encoding="utf-8"))
-        for table in page_data.get("tables", []):
-            json_rel = table.get("json_path")
-            ocr_rel = table.get("ocr_path")
-            if not json_rel or not ocr_rel:
-                continue
-            table_json_path = structured_dir / json_rel
-            ocr_json_path = structured_dir / ocr_rel
-            diff_path = table_json_path.with_suffix(".diff.json")
-            if diff_path.exists() and not args.overwrite:
-                print(f"[SKIP] {diff_path} (이미 존재)")
-                continue
-            doc_nums = load_numbers_from_doc_table(table_json_path)
-            ocr_nums = load_numbers_from_ocr(ocr_json_path)
-            diff = compare_numbers(doc_nums, ocr_nums)
-            diff_path.write_text(json.dumps(diff, ensure_ascii=False, indent=2), encoding="utf-8")
-            rel_diff_path = diff_path.relative_to(structured_dir)
-            update_page_metadata(page_json_path, table["id"], str(rel_diff_path), diff)
-            print(f"숫자 비교 완료: {table_json_path.name} -> {diff_path.name}")
+    manifest = StageManifest(structured_dir)
+    try:
+        compare_pages(structured_dir, target_pages, manifest, args.overwrite)
+    finally:
+        manifest.save()
 
     return 0
 
@@ -1,15 +1,21 @@
 """표 영역 텍스트 추출 유틸.
 
 RapidOCR를 이용해 이미지에서 직접 OCR 하거나, PyMuPDF로 PDF 텍스트를 그대로
-가져오는 두 가지 방식을 지원한다.
+가져오는 두 가지 방식을 지원한다. `auto`는 표마다 PDF 텍스트 레이어를 먼저 보고,
+글자가 없거나(래스터/아웃라인 표) 깨진 글리프가 많을 때만 RapidOCR를 쓴다.
 """
 
 from __future__ import annotations
 
 import argparse
 import json
+import multiprocessing
+import unicodedata
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, Iterator, List
 
 import fitz
 from rapidocr import RapidOCR
@@ -17,12 +23,22 @@ from rapidocr import RapidOCR
 # Add src to path to allow importing sibling modules if run from root
 import sys
 sys.path.append(str(Path(__file__).parent))
+import pipeline_metrics
+from page_metadata import PageMetadata
+from pdf_text_extractor import BAD_CHAR_RATIO, is_private_use
+from stage_manifest import StageManifest, hash_payload
+from table_diff import diff_table
 
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 DEFAULT_STRUCTURED_DIR = REPO_ROOT / "data" / "pages_structured"
 DEFAULT_INPUT_DIR = REPO_ROOT / "data" / "input"
 PDF_WORD_TOLERANCE = 2.0
+STAGE_VERSION = "1"
+# 프로세스 풀에 한 번에 넘기는 표 이미지 수
+DEFAULT_OCR_CHUNK_SIZE = 4
+# auto 백엔드: 텍스트 레이어 글자 수가 Docling 셀 글자 수의 이 비율보다 적으면 래스터/아웃라인 표로 보고 OCR
+MIN_TEXT_LAYER_COVERAGE = 0.5
 
 
 def infer_default_pdf() -> Path:
@@ -122,28 +138,116 @@ def serialize_ocr_output(out) -> list[dict[str, object]]:
     return entries
 
 
-def process_table_image(
-    ocr: RapidOCR,
-    image_path: Path,
-    output_json: Path,
-) -> list[dict[str, object]]:
-    out = ocr(str(image_path))
-    entries = serialize_ocr_output(out)
-    output_json.write_text(json.dumps(entries, ensure_ascii=False, indent=2), encoding="utf-8")
-    return entries
-
-
-def update_page_metadata(page_json_path: Path, table_id: str, ocr_rel_path: str, preview: str) -> None:
-    data = json.loads(page_json_path.read_text(encoding="utf-8"))
-    updated = False
-    for table in data.get("tables", []):
-        if table.get("id") == table_id:
-            table["ocr_path"] = ocr_rel_path
-            table["ocr_preview"] = preview
-            updated = True
-            break
-    if updated:
-        page_json_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+@dataclass
+class OcrTask:
+    """RapidOCR로 처리할 표 이미지 1건과 결과를 되돌려 쓸 위치."""
+
+    page_no: int
+    table_id: str
+    image_path: Path
+    ocr_json_path: Path
+    page_meta: PageMetadata
+    manifest_key: str
+    input_hash: str
+    table_json_path: Path | None = None
+
+
+def build_rapidocr(rec_batch_size: int | None = None) -> RapidOCR:
+    """rec_batch_size를 주면 한 표 안에서 검출된 텍스트 라인을 그 크기 묶음으로 인식한다."""
+    if rec_batch_size:
+        return RapidOCR(params={"Rec.rec_batch_num": rec_batch_size})
+    return RapidOCR()
+
+
+_WORKER_OCR: RapidOCR | None = None
+
+
+def _init_ocr_worker(rec_batch_size: int | None) -> None:
+    global _WORKER_OCR
+    _WORKER_OCR = build_rapidocr(rec_batch_size)
+
+
+def _ocr_chunk(image_paths: list[str]) -> list[list[dict[str, object]]]:
+    """워커 프로세스 진입점: 프로세스별 RapidOCR 인스턴스로 표 이미지 묶음을 처리한다."""
+    return [serialize_ocr_output(_WORKER_OCR(path)) for path in image_paths]
+
+
+def iter_ocr_results(
+    tasks: list[OcrTask],
+    ocr: RapidOCR | None,
+    workers: int,
+    rec_batch_size: int | None,
+    chunk_size: int = DEFAULT_OCR_CHUNK_SIZE,
+) -> Iterator[tuple[OcrTask, list[dict[str, object]]]]:
+    """tasks 순서(페이지 순) 그대로 OCR 결과를 돌려준다. workers > 1이면 RapidOCR 프로세스 풀을 쓴다."""
+    if workers <= 1 or len(tasks) <= 1:
+        if ocr is None:
+            ocr = build_rapidocr(rec_batch_size)
+        for task in tasks:
+            yield task, serialize_ocr_output(ocr(str(task.image_path)))
+        return
+
+    chunk_size = max(1, chunk_size)
+    chunks = [tasks[idx:idx + chunk_size] for idx in range(0, len(tasks), chunk_size)]
+    worker_count = min(workers, len(chunks))
+    print(f"🧩 [OCR] 표 이미지 {len(tasks)}개를 {worker_count}개 프로세스로 나눠 처리합니다.")
+    # 프로세스마다 onnxruntime 스레드를 나눠 써서 코어 과다 할당을 막는다. 워커를 띄우는 동안만 설정하고
+    # 풀이 끝나면 되돌려 in-process runner의 이후 단계에 남지 않게 한다.
+    previous_threads = os.environ.get("OMP_NUM_THREADS")
+    if previous_threads is None:
+        os.environ["OMP_NUM_THREADS"] = str(max(1, (os.cpu_count() or 1) // worker_count))
+    try:
+        with ProcessPoolExecutor(
+            max_workers=worker_count,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_ocr_worker,
+            initargs=(rec_batch_size,),
+        ) as executor:
+            results = executor.map(_ocr_chunk, [[str(task.image_path) for task in chunk] for chunk in chunks])
+            for chunk, chunk_entries in zip(chunks, results):
+                yield from zip(chunk, chunk_entries)
+    finally:
+        if previous_threads is None:
+            os.environ.pop("OMP_NUM_THREADS", None)
+
+
+def link_table_text(
+    page_meta: PageMetadata,
+    table_id: str,
+    entries: list[dict[str, object]],
+    ocr_rel_path: str,
+) -> None:
+    """page.json 표 메타데이터에 ocr.json 경로와 미리보기를 연결한다 (저장은 페이지 단위 flush)."""
+    preview = " ".join(item["text"] for item in entries[:5]) if entries else ""
+    page_meta.update_item("tables", table_id, ocr_path=ocr_rel_path, ocr_preview=preview)
+
+
+def write_table_text(
+    entries: list[dict[str, object]],
+    ocr_json_path: Path,
+    page_meta: PageMetadata,
+    table_id: str,
+    structured_dir: Path,
+) -> None:
+    """ocr.json을 저장하고 page.json 표 메타데이터에 연결한다."""
+    ocr_json_path.write_text(json.dumps(entries, ensure_ascii=False, indent=2), encoding="utf-8")
+    link_table_text(page_meta, table_id, entries, str(ocr_json_path.relative_to(structured_dir)))
+
+
+def diff_table_text(
+    entries: list[dict[str, object]],
+    table_json_path: Path | None,
+    ocr_json_path: Path,
+    page_meta: PageMetadata,
+    table_id: str,
+    structured_dir: Path,
+    manifest: StageManifest,
+    overwrite: bool,
+) -> None:
+    """--with-diff: 방금 만든(또는 재사용한) 텍스트 결과로 바로 Docling 표와 숫자를 비교한다."""
+    if table_json_path is None or not table_json_path.exists():
+        return
+    diff_table(structured_dir, page_meta, table_id, table_json_path, ocr_json_path, manifest, overwrite, entries)
 
 
 def bbox_to_pdf_rect(bbox: dict[str, float], page_height: float) -> tuple[float, float, float, float]:
@@ -203,6 +307,41 @@ def extract_table_text_with_pymupdf(
     return entries
 
 
+def count_text_chars(text: str) -> int:
+    return sum(1 for ch in text if not ch.isspace())
+
+
+def docling_cell_chars(table_json_path: Path | None) -> int | None:
+    """Docling 표 셀 텍스트의 글자 수 (공백 제외). 표 JSON이 없으면 None."""
+    if table_json_path is None or not table_json_path.exists():
+        return None
+    data = json.loads(table_json_path.read_text(encoding="utf-8"))
+    return sum(count_text_chars(cell.get("text") or "") for row in data.get("cells", []) for cell in row)
+
+
+def text_layer_problem(entries: list[dict[str, object]], expected_chars: int | None = None) -> str | None:
+    """PyMuPDF 단어 목록이 표 텍스트로 쓸 만하지 않으면 그 이유를, 쓸 만하면 None을 돌려준다.
+
+    글자 수는 절대 기준이 아니라 Docling 셀 글자 수(expected_chars)에 견주어 본다. 숫자 몇 개짜리 작은 표도
+    텍스트 레이어가 셀 내용을 담고 있으면 그대로 쓰고, 셀 정보가 없으면 텍스트 레이어가 비었을 때만 OCR로 넘긴다.
+    """
+    chars = bad = 0
+    for entry in entries:
+        for ch in str(entry["text"]):
+            if ch.isspace():
+                continue
+            chars += 1
+            if ch == "\ufffd" or is_private_use(ch) or unicodedata.category(ch) in ("Cc", "Cs"):
+                bad += 1
+    if not chars:
+        return "텍스트 레이어 없음"
+    if expected_chars and chars < expected_chars * MIN_TEXT_LAYER_COVERAGE:
+        return f"텍스트 레이어 글자 {chars}자 (Docling 셀 {expected_chars}자)"
+    if bad / chars >= BAD_CHAR_RATIO:
+        return f"깨진 글리프 {bad}/{chars}"
+    return None
+
+
 def build_arg_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="pages_structured 내 표 이미지를 RapidOCR로 텍스트화한다.",
@@ -222,24 +361,49 @@ def build_arg_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--overwrite",
         action="store_true",
-        help="이미 존재하는 ocr.json이 있어도 다시 생성.",
+        help="manifest 기록상 입력이 바뀌지 않은 표도 ocr.json을 다시 생성.",
     )
     parser.add_argument(
         "--backend",
-        choices=("pymupdf", "rapidocr"),
+        choices=("pymupdf", "rapidocr", "auto"),
         default="pymupdf",
-        help="텍스트 추출 방식. 기본값은 PyMuPDF로 PDF 텍스트를 그대로 사용.",
+        help="텍스트 추출 방식. 기본값은 PyMuPDF로 PDF 텍스트를 그대로 사용. auto는 표마다 텍스트 레이어가 쓸 만하면 PyMuPDF, 아니면 RapidOCR.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="--backend rapidocr/auto일 때 RapidOCR 프로세스 수. 모든 페이지의 표 이미지를 모아 나눠 처리하고 결과는 페이지 순서대로 기록.",
+    )
+    parser.add_argument(
+        "--rec-batch-size",
+        type=int,
+        default=None,
+        help="RapidOCR 인식기 배치 크기 (Rec.rec_batch_num). 생략하면 RapidOCR 기본값.",
     )
     parser.add_argument(
         "--pdf",
         type=Path,
         default=None,
-        help="--backend pymupdf일 때 사용할 원본 PDF 경로. 생략하면 data/input의 첫 PDF를 사용.",
+        help="--backend pymupdf/auto일 때 사용할 원본 PDF 경로. 생략하면 data/input의 첫 PDF를 사용.",
+    )
+    parser.add_argument(
+        "--with-diff",
+        action="store_true",
+        help="텍스트 추출 직후 메모리의 결과로 Docling 표와 숫자를 비교해 diff.json도 기록 (table_diff.py를 따로 돌리지 않아도 됨).",
     )
     return parser
 
 
-def main(argv: List[str] | None = None) -> int:
+def main(
+    argv: List[str] | None = None,
+    ocr: RapidOCR | None = None,
+    pdf_doc: fitz.Document | None = None,
+) -> int:
+    """ocr/pdf_doc을 넘기면(파이프라인 공유 자원) 새로 만들지 않고, 넘겨받은 pdf_doc은 닫지 않는다.
+
+    RapidOCR 백엔드는 먼저 모든 페이지의 표 이미지를 모은 뒤 한 번에 OCR한다 (--workers > 1이면 프로세스 풀).
+    """
     parser = build_arg_parser()
     args = parser.parse_args(argv)
 
@@ -259,8 +423,9 @@ def main(argv: List[str] | None = None) -> int:
     else:
         target_pages = available_pages
 
-    pdf_doc = None
-    if args.backend == "pymupdf":
+    uses_pdf = args.backend in ("pymupdf", "auto")
+    owns_pdf = False
+    if uses_pdf and pdf_doc is None:
         if args.pdf is None:
             pdf_path = infer_default_pdf()
             print(f"기본 PDF 사용: {pdf_path}")
@@ -269,9 +434,16 @@ def main(argv: List[str] | None = None) -> int:
             if not pdf_path.exists():
                 parser.error(f"PDF를 찾을 수 없습니다: {pdf_path}")
         pdf_doc = fitz.open(pdf_path)
-    else:
-        ocr = RapidOCR()
+        owns_pdf = True
 
+    manifest = StageManifest(structured_dir)
+    pdf_digest = None
+    if uses_pdf and pdf_doc is not None and pdf_doc.name:
+        pdf_digest = manifest.file_digest(Path(pdf_doc.name))
+
+    ocr_tasks: list[OcrTask] = []
+    # OCR 결과를 기다리는 페이지의 page.json은 마지막 결과가 들어올 때까지 열어 두고 한 번만 저장한다.
+    pending_pages: dict[int, PageMetadata] = {}
     try:
         for page_no in target_pages:
             page_dir = structured_dir / f"page_{page_no:04d}"
@@ -280,12 +452,13 @@ def main(argv: List[str] | None = None) -> int:
             if not tables_dir.exists() or not page_json_path.exists():
                 continue
 
-            page_data = json.loads(page_json_path.read_text(encoding="utf-8"))
-            tables = page_data.get("tables", [])
+            page_meta = PageMetadata(page_json_path)
+            page_data = page_meta.data
+            tables = page_meta.items("tables")
             if not tables:
                 continue
 
-            if args.backend == "pymupdf":
+            if uses_pdf:
                 if pdf_doc is None:
                     parser.error("PyMuPDF 백엔드를 사용하려면 PDF 문서를 열 수 있어야 합니다.")
                 page_index = page_no - 1
@@ -309,34 +482,86 @@ def main(argv: List[str] | None = None) -> int:
                     continue
                 image_path = structured_dir / image_rel
                 ocr_json_path = image_path.with_suffix(".ocr.json")
-                if ocr_json_path.exists() and not args.overwrite:
-                    print(f"[SKIP] {ocr_json_path} (이미 존재)")
+                table_json_path = structured_dir / table["json_path"] if table.get("json_path") else None
+                relative_ocr_path = ocr_json_path.relative_to(structured_dir)
+                source = {}
+                if uses_pdf:
+                    source.update({"pdf": pdf_digest, "page": page_no, "bbox": bbox, "page_height": page_height})
+                if args.backend != "pymupdf":
+                    source["image"] = manifest.file_digest(image_path)
+                if args.backend == "auto" and table_json_path is not None and table_json_path.exists():
+                    # auto 판정이 Docling 셀 글자 수에 의존하므로 표 JSON도 입력으로 본다.
+                    source["cells"] = manifest.file_digest(table_json_path)
+                input_hash = hash_payload("table_ocr", STAGE_VERSION, args.backend, source)
+                manifest_key = str(relative_ocr_path)
+                if not args.overwrite and manifest.is_fresh("table_ocr", manifest_key, input_hash):
+                    # 구조화 단계가 page.json을 다시 썼을 수 있으므로 메타데이터만 다시 연결한다.
+                    entries = json.loads(ocr_json_path.read_text(encoding="utf-8"))
+                    link_table_text(page_meta, table_id, entries, str(relative_ocr_path))
+                    print(f"[SKIP] {ocr_json_path} (입력 변경 없음)")
+                    pipeline_metrics.count("tables_skipped")
+                    if args.with_diff:
+                        diff_table_text(
+                            entries, table_json_path, ocr_json_path, page_meta, table_id,
+                            structured_dir, manifest, args.overwrite,
+                        )
                     continue
 
-                if args.backend == "pymupdf" and pdf_page is not None:
+                entries = None
+                if uses_pdf:
                     entries = extract_table_text_with_pymupdf(pdf_page, bbox, page_height)
-                else:
+                    if args.backend == "auto":
+                        problem = text_layer_problem(entries, docling_cell_chars(table_json_path))
+                        if problem and image_path.exists():
+                            print(f"[AUTO] {table_id} (페이지 {page_no}) -> RapidOCR ({problem})")
+                            entries = None
+
+                if entries is None:
                     if not image_path.exists():
                         print(f"[SKIP] {image_path} (이미지 없음)")
                         continue
-                    entries = process_table_image(ocr, image_path, ocr_json_path)
+                    # 이미지 OCR은 모아서 한 번에 처리한다.
+                    ocr_tasks.append(
+                        OcrTask(
+                            page_no, table_id, image_path, ocr_json_path, page_meta, manifest_key, input_hash,
+                            table_json_path,
+                        )
+                    )
+                    pending_pages[page_no] = page_meta
+                    continue
 
-                # Save standard OCR result
-                if args.backend == "pymupdf":
-                    ocr_json_path.write_text(
-                        json.dumps(entries, ensure_ascii=False, indent=2),
-                        encoding="utf-8",
+                write_table_text(entries, ocr_json_path, page_meta, table_id, structured_dir)
+                manifest.record("table_ocr", manifest_key, input_hash, [ocr_json_path])
+                print(f"텍스트 추출 완료(PDF): {table_id} -> {ocr_json_path}")
+                pipeline_metrics.count("tables")
+                if args.with_diff:
+                    diff_table_text(
+                        entries, table_json_path, ocr_json_path, page_meta, table_id,
+                        structured_dir, manifest, args.overwrite,
                     )
-                
-                # Update metadata with OCR path
-                preview = " ".join(item["text"] for item in entries[:5]) if entries else ""
-                relative_ocr_path = ocr_json_path.relative_to(structured_dir)
-                update_page_metadata(page_json_path, table_id, str(relative_ocr_path), preview)
-                
-                origin = "PDF" if args.backend == "pymupdf" else "RapidOCR"
-                print(f"텍스트 추출 완료({origin}): {table_id} -> {ocr_json_path}")
+
+            if page_no not in pending_pages:
+                page_meta.flush()
+
+        # 결과는 페이지 순서대로 오므로 다음 페이지로 넘어갈 때 이전 페이지 page.json을 저장한다.
+        for task, entries in iter_ocr_results(ocr_tasks, ocr, args.workers, args.rec_batch_size):
+            for done_page in [p for p in pending_pages if p < task.page_no]:
+                pending_pages.pop(done_page).flush()
+            write_table_text(entries, task.ocr_json_path, task.page_meta, task.table_id, structured_dir)
+            manifest.record("table_ocr", task.manifest_key, task.input_hash, [task.ocr_json_path])
+            print(f"텍스트 추출 완료(RapidOCR): {task.table_id} -> {task.ocr_json_path}")
+            pipeline_metrics.count("tables")
+            pipeline_metrics.count("tables_ocr")
+            if args.with_diff:
+                diff_table_text(
+                    entries, task.table_json_path, task.ocr_json_path, task.page_meta, task.table_id,
+                    structured_dir, manifest, args.overwrite,
+                )
     finally:
-        if pdf_doc is not None:
+        for page_meta in pending_pages.values():
+            page_meta.flush()
+        manifest.save()
+        if owns_pdf:
             pdf_doc.close()
 
     return 0
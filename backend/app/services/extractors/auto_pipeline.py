@@ -10,7 +10,7 @@ from sqlalchemy import text
 from openai import OpenAI
 from dotenv import load_dotenv
 from ...database import engine
-from .gpt_vision import encode_image
+from .gpt_vision import image_data_url
 
 load_dotenv()
 openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
@@ -88,7 +88,7 @@ def score_tables_for_relevance(tables: List[Dict]) -> List[Dict]:
     for table in tables:
         try:
             # 이미지 인코딩
-            image_base64 = encode_image(Path(table['image_path']))
+            image_url = image_data_url(Path(table['image_path']))
 
             # GPT-4o-mini로 빠르게 점수 매기기 + 카테고리 분류
             prompt = """이 표가 ESG 데이터 추출에 필요한 정보를 포함하고 있는지 0-100 점수로 평가하고, 카테고리를 분류하세요.
@@ -127,7 +127,7 @@ def score_tables_for_relevance(tables: List[Dict]) -> List[Dict]:
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/png;base64,{image_base64}",
+                                    "url": image_url,
                                     "detail": "low"
                                 }
                             }
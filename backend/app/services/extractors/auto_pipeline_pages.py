@@ -10,7 +10,7 @@ from sqlalchemy import text
 from openai import OpenAI
 from dotenv import load_dotenv
 from ...database import engine
-from .gpt_vision import encode_image
+from .gpt_vision import image_data_url
 
 load_dotenv()
 openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
@@ -137,7 +137,7 @@ def pass_3_expert_verification(candidate_pools: Dict[str, List[Dict]]) -> List[D
         print(f"[{category.upper()}] 후보 페이지 {len(pages)}개 GPT 검증 시작...")
         for page_item in pages:
             try:
-                image_base64 = encode_image(Path(page_item['image_path']))
+                image_url = image_data_url(Path(page_item['image_path']))
                 
                 sys_prompt = prompts[category] + '\n출력 형식 (오직 JSON만): {"is_valid_data_table": true/false, "reason": "이유", "score": 0~100}'
                 
@@ -148,7 +148,7 @@ def pass_3_expert_verification(candidate_pools: Dict[str, List[Dict]]) -> List[D
                         {"role": "system", "content": "You must respond with a valid JSON object only."},
                         {"role": "user", "content": [
                             {"type": "text", "text": sys_prompt},
-                            {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_base64}", "detail": "high"}}
+                            {"type": "image_url", "image_url": {"url": image_url, "detail": "high"}}
                         ]}
                     ],
                     max_tokens=200,
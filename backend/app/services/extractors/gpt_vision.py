@@ -3,8 +3,8 @@ GPT-4V 이미지 분석 기반 배출량 추출
 """
 import os
 import re
+import sys
 import json
-import base64
 from pathlib import Path
 from typing import Optional, Dict, List
 from sqlalchemy import text
@@ -12,6 +12,18 @@ from openai import OpenAI
 from dotenv import load_dotenv
 from ...database import engine
 
+# GPT 전송용 압축본(table_001.gpt.webp 등) 이름/MIME 규칙은 PDF_Extraction/src/image_variants.py 한 곳에만 둔다.
+try:
+    from image_variants import image_data_url
+except ModuleNotFoundError:
+    # backend/main.py가 이미 PDF_Extraction/src를 sys.path 맨 앞에 넣어 검색 모듈을 쓰므로 새로 노출되는 모듈은 없다.
+    # main.py를 거치지 않고 이 모듈만 쓰는 경우(스크립트/워커)를 위한 대비이며, 뒤에 붙여(append) 이름이 겹치면
+    # backend 쪽 모듈이 먼저 잡히게 하고, 여기서는 image_variants만 가져온다.
+    _pdf_src = Path(__file__).resolve().parent.parent.parent.parent.parent / "PDF_Extraction" / "src"
+    if str(_pdf_src) not in sys.path:
+        sys.path.append(str(_pdf_src))
+    from image_variants import image_data_url
+
 load_dotenv()
 openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
@@ -80,12 +92,6 @@ def get_page_image_path(page_id: int) -> Optional[Path]:
     return abs_path if abs_path.exists() else None
 
 
-def encode_image(image_path: Path) -> str:
-    """이미지를 base64로 인코딩"""
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
-
-
 def get_table_texts(table_id: int) -> List[str]:
     """표의 모든 텍스트를 DB에서 가져오기 (옵션 3용)"""
     sql = """
@@ -136,9 +142,9 @@ def extract_with_gpt_vision(doc_id: int, tables: List[Dict], use_table_texts: bo
             print(f"[GPT-Vision] Table {table_id} 이미지 없음, 건너뜀")
             continue
 
-        # 이미지를 base64로 인코딩
+        # 이미지를 data URL로 인코딩 (GPT용 압축본 우선)
         try:
-            image_base64 = encode_image(image_path)
+            image_url = image_data_url(image_path)
         except Exception as e:
             print(f"[GPT-Vision] Table {table_id} 이미지 인코딩 오류: {e}")
             continue
@@ -251,7 +257,7 @@ def extract_with_gpt_vision(doc_id: int, tables: List[Dict], use_table_texts: bo
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/png;base64,{image_base64}",
+                                    "url": image_url,
                                     "detail": "auto"  # auto: GPT가 자동으로 적절한 해상도 선택
                                 }
                             }
@@ -415,7 +421,7 @@ def extract_with_gpt_vision_pages(doc_id: int, pages_list: List[Dict], model: st
             continue
 
         try:
-            image_base64 = encode_image(image_path)
+            image_url = image_data_url(image_path)
             markdown_text = page_item.get('full_markdown', '')
         except Exception as e:
             continue
@@ -474,7 +480,7 @@ Scope 2              71,856    1,146    <-- ✅ 71856 + 1146 산수 결과인 '7
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/png;base64,{image_base64}",
+                                    "url": image_url,
                                     "detail": "high"
                                 }
                             }
@@ -592,7 +598,7 @@ def extract_revenue_with_vision(tables: List[Dict]) -> Optional[Dict]:
             continue
 
         try:
-            image_base64 = encode_image(image_path)
+            image_url = image_data_url(image_path)
 
             prompt = """이 표에서 **매출액(Revenue)** 데이터와 그 단위를 함께 찾아주세요.
 
@@ -621,7 +627,7 @@ def extract_revenue_with_vision(tables: List[Dict]) -> Optional[Dict]:
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/png;base64,{image_base64}",
+                                    "url": image_url,
                                     "detail": "auto"
                                 }
                             }
@@ -675,7 +681,7 @@ def extract_energy_with_vision(tables: List[Dict]) -> Optional[Dict]:
             continue
 
         try:
-            image_base64 = encode_image(image_path)
+            image_url = image_data_url(image_path)
 
             prompt = """이 표에서 **에너지 집약도(Energy Intensity)** 데이터와 그 단위를 함께 찾아주세요.
 
@@ -700,7 +706,7 @@ def extract_energy_with_vision(tables: List[Dict]) -> Optional[Dict]:
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/png;base64,{image_base64}",
+                                    "url": image_url,
                                     "detail": "auto"
                                 }
                             }
@@ -764,7 +770,7 @@ def extract_revenue_with_vision_pages(pages_list: List[Dict], model: str = "gpt-
             continue
 
         try:
-            image_base64 = encode_image(image_path)
+            image_url = image_data_url(image_path)
             markdown_text = page_item.get('full_markdown', '')
 
             prompt = """당신은 데이터 추출 전문가입니다. 이 페이지 이미지의 핵심 재무 표에서 **매출액(Revenue)** 데이터와 그 표에 명시된 '단위'를 찾아주세요.
@@ -797,7 +803,7 @@ def extract_revenue_with_vision_pages(pages_list: List[Dict], model: str = "gpt-
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/png;base64,{image_base64}",
+                                    "url": image_url,
                                     "detail": "high"
                                 }
                             }
@@ -857,7 +863,7 @@ def extract_energy_with_vision_pages(pages_list: List[Dict], model: str = "gpt-4
             continue
 
         try:
-            image_base64 = encode_image(image_path)
+            image_url = image_data_url(image_path)
             markdown_text = page_item.get('full_markdown', '')
 
             prompt = """당신은 데이터 추출 전문가입니다. 이 페이지 이미지의 환경 데이터 표에서 **에너지 집약도(Energy Intensity)** 수치 및 단위를 확실하게 추출해주세요.
@@ -888,7 +894,7 @@ def extract_energy_with_vision_pages(pages_list: List[Dict], model: str = "gpt-4
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/png;base64,{image_base64}",
+                                    "url": image_url,
                                     "detail": "high"
                                 }
                             }